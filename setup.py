@@ -4,6 +4,7 @@ import sys
 from fnmatch import fnmatchcase
 from distutils.util import convert_path
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py as _build_py
 
 
 def read(*parts):
@@ -107,6 +108,19 @@ def find_package_data(
                 out.setdefault(package, []).append(prefix + name)
     return out
 
+
+class build_py(_build_py):
+    """
+    Leave out sqlserver_ado.aio, which uses async syntax, on Python versions
+    before 3.5, so that it is not byte-compiled there. Nothing else in the
+    package imports it.
+    """
+    def find_package_modules(self, package, package_dir):
+        modules = _build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 5):
+            modules = [m for m in modules if (m[0], m[1]) != ('sqlserver_ado', 'aio')]
+        return modules
+
 setup(
     name="django-mssql",
     version=find_version("sqlserver_ado", "__init__.py"),
@@ -128,6 +142,7 @@ setup(
         'Topic :: Internet :: WWW/HTTP',
     ],
     zip_safe=False,
+    cmdclass={'build_py': build_py},
     install_requires=[
     ],
 )
@@ -25,10 +25,22 @@ adOpenKeyset        = 1
 adOpenStatic        = 3
 adOpenUnspecified   = -1
 
+# LockTypeEnum
+adLockBatchOptimistic = 4
+adLockOptimistic      = 3
+adLockPessimistic     = 2
+adLockReadOnly        = 1
+adLockUnspecified     = -1
+
 # CommandTypeEnum
 adCmdText = 1
 adCmdStoredProc = 4
 
+# ExecuteOptionEnum
+adAsyncExecute     = 0x10
+adAsyncFetch       = 0x20
+adExecuteNoRecords = 0x80
+
 # ParameterDirectionEnum
 adParamInput       = 1
 adParamInputOutput = 3
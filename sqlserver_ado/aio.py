@@ -0,0 +1,300 @@
+"""
+asyncio interface to the dbapi module. Requires Python 3.5 or newer.
+
+ADO objects belong to the COM apartment of the thread that created them. An
+ApartmentExecutor owns a fixed number of threads, each with its own COM
+apartment. Every AsyncConnection is bound to one of these threads, which
+makes all COM calls for the connection and its cursors, so the event loop
+never blocks on the database.
+
+    conn = await aio.connect(connection_string)
+    cursor = conn.cursor()
+    await cursor.execute('SELECT [name] FROM [sys].[tables]')
+    async for row in cursor:
+        ...
+    await conn.close()
+"""
+from __future__ import absolute_import, unicode_literals
+
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import queue
+import threading
+
+from . import dbapi as Database
+
+__all__ = [
+    'ApartmentExecutor',
+    'AsyncConnection',
+    'AsyncCursor',
+    'connect',
+    'get_default_executor',
+]
+
+# Number of apartment threads of the executor used by connect() when no
+# executor is given.
+defaultApartmentThreads = 4
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def get_default_executor():
+    """Return the process wide ApartmentExecutor, creating it if needed."""
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ApartmentExecutor(defaultApartmentThreads)
+        return _default_executor
+
+
+class _ApartmentThread(threading.Thread):
+    """A thread with its own COM apartment that runs calls from a queue."""
+    def __init__(self, name):
+        super(_ApartmentThread, self).__init__(name=name, daemon=True)
+        self.calls = queue.Queue()
+        # Number of connections bound to this thread
+        self.connections = 0
+
+    def run(self):
+        Database._co_initialize()
+        try:
+            while True:
+                call = self.calls.get()
+                if call is None:
+                    return
+                future, func = call
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = func()
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            Database._co_uninitialize()
+
+
+class ApartmentExecutor(object):
+    """
+    Runs dbapi calls on max_workers threads, each with its own COM apartment.
+
+    Each thread runs one call at a time, so at most max_workers calls run
+    at once. Connections are spread over the threads, and the calls of
+    connections that share a thread wait for each other.
+    """
+    def __init__(self, max_workers=defaultApartmentThreads):
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        self._threads = [
+            _ApartmentThread('sqlserver_ado-apartment-%d' % i)
+            for i in range(max_workers)
+        ]
+        self._lock = threading.Lock()
+        self._shutdown = False
+        for thread in self._threads:
+            thread.start()
+
+    def _bind(self):
+        """Return the thread with the fewest connections, for a new connection."""
+        with self._lock:
+            thread = min(self._threads, key=lambda t: t.connections)
+            thread.connections += 1
+            return thread
+
+    def _unbind(self, thread):
+        with self._lock:
+            thread.connections -= 1
+
+    def run(self, thread, func, *args, **kwargs):
+        """Return an asyncio future for the result of func(*args, **kwargs) on thread."""
+        if self._shutdown:
+            raise RuntimeError('cannot run calls after shutdown')
+        future = concurrent.futures.Future()
+        thread.calls.put((future, functools.partial(func, *args, **kwargs)))
+        return asyncio.wrap_future(future)
+
+    def shutdown(self, wait=True):
+        """Stop the threads once they have run the calls already queued."""
+        self._shutdown = True
+        for thread in self._threads:
+            thread.calls.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+async def connect(*args, executor=None, **kwargs):
+    """
+    Open a connection on a thread of executor, or of the default executor,
+    and return an AsyncConnection. The arguments are passed to
+    dbapi.connect.
+    """
+    if executor is None:
+        executor = get_default_executor()
+    thread = executor._bind()
+    try:
+        connection = await executor.run(thread, Database.connect, *args, **kwargs)
+    except BaseException:
+        executor._unbind(thread)
+        raise
+    return AsyncConnection(connection, executor, thread)
+
+
+class AsyncConnection(object):
+    """A dbapi Connection whose methods run on its apartment thread."""
+    def __init__(self, connection, executor, thread):
+        self.connection = connection
+        self._executor = executor
+        self._thread = thread
+
+    def _run(self, func, *args, **kwargs):
+        return self._executor.run(self._thread, func, *args, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def closed(self):
+        return self.connection is None
+
+    def cursor(self):
+        """Return a new AsyncCursor on this connection."""
+        if self.connection is None:
+            raise Database.InterfaceError('Connection is closed.')
+        return AsyncCursor(self, self.connection.cursor())
+
+    async def commit(self):
+        await self._run(self.connection.commit)
+
+    async def rollback(self):
+        await self._run(self.connection.rollback)
+
+    async def set_autocommit(self, value):
+        await self._run(self.connection.set_autocommit, value)
+
+    async def close(self):
+        """Close the connection and release its apartment thread."""
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        try:
+            await self._executor.run(self._thread, connection.close)
+        finally:
+            self._executor._unbind(self._thread)
+
+
+class AsyncCursor(object):
+    """A dbapi Cursor whose methods run on the apartment thread of its connection."""
+    def __init__(self, connection, cursor):
+        self.connection = connection
+        self.cursor = cursor
+        self._rows = collections.deque()
+
+    def _run(self, func, *args, **kwargs):
+        return self.connection._run(func, *args, **kwargs)
+
+    def _run_and_describe(self, func, *args):
+        """
+        Run func, then read the description of the new recordset on the
+        apartment thread, as the cursor reads it lazily over COM.
+        """
+        def call():
+            result = func(*args)
+            self.cursor.description
+            return result
+        return self._run(call)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """
+        Return the next row of the current recordset. Rows are fetched in
+        blocks of the cursor's fetch_chunk_size (or arraysize, if larger).
+        """
+        if not self._rows:
+            size = max(self.cursor.arraysize, self.cursor.fetch_chunk_size)
+            self._rows.extend(await self._run(self.cursor.fetchmany, size))
+            if not self._rows:
+                raise StopAsyncIteration
+        return self._rows.popleft()
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def arraysize(self):
+        return self.cursor.arraysize
+
+    @arraysize.setter
+    def arraysize(self, value):
+        self.cursor.arraysize = value
+
+    @property
+    def return_value(self):
+        return self.cursor.return_value
+
+    @property
+    def output_parameters(self):
+        return self.cursor.output_parameters
+
+    async def execute(self, operation, parameters=None):
+        self._rows.clear()
+        await self._run_and_describe(self.cursor.execute, operation, parameters)
+        return self
+
+    async def executemany(self, operation, seq_of_parameters):
+        self._rows.clear()
+        await self._run_and_describe(self.cursor.executemany, operation, seq_of_parameters)
+        return self
+
+    async def callproc(self, procname, parameters=None):
+        self._rows.clear()
+        return await self._run_and_describe(self.cursor.callproc, procname, parameters)
+
+    async def fetchone(self):
+        if self._rows:
+            return self._rows.popleft()
+        return await self._run(self.cursor.fetchone)
+
+    async def fetchmany(self, size=None):
+        if size is None:
+            size = self.cursor.arraysize
+        rows = []
+        while self._rows and len(rows) < size:
+            rows.append(self._rows.popleft())
+        if len(rows) < size:
+            rows.extend(await self._run(self.cursor.fetchmany, size - len(rows)))
+        return rows
+
+    async def fetchall(self):
+        rows = list(self._rows)
+        self._rows.clear()
+        rows.extend(await self._run(self.cursor.fetchall))
+        return rows
+
+    async def nextset(self):
+        self._rows.clear()
+        return await self._run_and_describe(self.cursor.nextset)
+
+    async def close(self):
+        self._rows.clear()
+        await self._run(self.cursor.close)
@@ -12,10 +12,14 @@ from django.db.utils import IntegrityError
 
 from . import dbapi as Database
 
+from .ado_consts import (adLockBatchOptimistic, adLockOptimistic, adLockPessimistic,
+    adLockReadOnly, adOpenDynamic, adOpenForwardOnly, adOpenKeyset, adOpenStatic,
+    adUseClient, adUseServer)
 from .introspection import DatabaseIntrospection
 from .creation import DatabaseCreation
 from .features import DatabaseFeatures
 from .operations import DatabaseOperations
+from .pool import get_pool
 from .schema import DatabaseSchemaEditor
 
 
@@ -30,6 +34,43 @@ def is_ip_address(value):
     return True
 
 
+# ADO consts for the cursor_location, cursor_type and lock_type OPTIONS
+_cursor_options = {
+    'cursor_location': {
+        'server': adUseServer,
+        'client': adUseClient,
+    },
+    'cursor_type': {
+        'forward_only': adOpenForwardOnly,
+        'static': adOpenStatic,
+        'keyset': adOpenKeyset,
+        'dynamic': adOpenDynamic,
+    },
+    'lock_type': {
+        'read_only': adLockReadOnly,
+        'pessimistic': adLockPessimistic,
+        'optimistic': adLockOptimistic,
+        'batch_optimistic': adLockBatchOptimistic,
+    },
+}
+
+
+def _cursor_option(options, name):
+    """
+    Return the ADO const for the cursor option name in options, or None if
+    it is not set.
+    """
+    value = options.get(name, None)
+    if value is None:
+        return None
+    try:
+        return _cursor_options[name][value]
+    except KeyError:
+        raise ImproperlyConfigured(
+            "Unknown %s %r. It must be one of: %s." % (
+                name, value, ', '.join(sorted(_cursor_options[name]))))
+
+
 def connection_string_from_settings():
     from django.conf import settings
     db_settings = getattr(settings, 'DATABASES', {}).get('default', None)
@@ -194,6 +235,20 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         except ValueError:
             self.cast_avg_to_float = False
 
+        self.use_xml_bulk_insert = bool(options.get('use_xml_bulk_insert', False))
+        self.packed_in_list_threshold = int(options.get('packed_in_list_threshold', 1000))
+
+        if options.get('use_pool', False):
+            idle_timeout = options.get('pool_idle_timeout', 300)
+            self.pool_options = {
+                'min_size': int(options.get('pool_min_size', 0)),
+                'max_idle': int(options.get('pool_max_idle', 5)),
+                'idle_timeout': None if idle_timeout is None else int(idle_timeout),
+            }
+        else:
+            self.pool_options = None
+        self.pool = None
+
         if 'use_legacy_date_fields' in options:
             warnings.warn(
                 "The `use_legacy_date_fields` setting is no longer supported. "
@@ -206,6 +261,7 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         self.client = BaseDatabaseClient(self)
         self.creation = DatabaseCreation(self)
         self.introspection = DatabaseIntrospection(self)
+        self.introspection.use_catalog_snapshot = bool(options.get('use_catalog_snapshot', False))
         self.validation = BaseDatabaseValidation(self)
 
     def get_connection_params(self):
@@ -220,39 +276,55 @@ class DatabaseWrapper(BaseDatabaseWrapper):
             # if _nodb_connection, connect to master
             settings_dict['NAME'] = 'master'
 
-        autocommit = settings_dict.get('OPTIONS', {}).get('autocommit', False)
+        options = settings_dict.get('OPTIONS', {})
+        autocommit = options.get('autocommit', False)
         return {
             'connection_string': make_connection_string(settings_dict),
             'timeout': self.command_timeout,
             'use_transactions': not autocommit,
+            'fetch_chunk_size': options.get('fetch_chunk_size', None),
+            'command_cache_size': options.get('command_cache_size', None),
+            'typed_parameters': bool(options.get('use_typed_parameters', False)),
+            'stable_sql_text': bool(options.get('use_stable_sql_text', False)),
+            'cache_procedure_parameters': bool(options.get('cache_procedure_parameters', False)),
+            'cursor_location': _cursor_option(options, 'cursor_location'),
+            'cursor_type': _cursor_option(options, 'cursor_type'),
+            'lock_type': _cursor_option(options, 'lock_type'),
+            'cache_size': options.get('cache_size', None),
         }
 
     def get_new_connection(self, conn_params):
-        """Opens a connection to the database."""
+        """Opens a connection to the database, or takes one from the pool."""
         self.__connection_string = conn_params.get('connection_string', '')
+        if self.pool_options is not None:
+            self.pool = get_pool(conn_params, validate=self._is_usable, **self.pool_options)
+            return self.pool.acquire()
         conn = Database.connect(**conn_params)
         return conn
 
+    def _close(self):
+        if self.pool is not None and self.connection is not None:
+            with self.wrap_database_errors:
+                return self.pool.release(self.connection)
+        return super(DatabaseWrapper, self)._close()
+
     def init_connection_state(self):
         """Initializes the database connection settings."""
         # if 'mars connection=true' in self.__connection_string.lower():
         #     # Issue #41 - Cannot use MARS with savepoints
         #     self.features.uses_savepoints = False
-        # cache the properties on the connection
-        self.connection.adoConnProperties = dict([(x.Name, x.Value) for x in self.connection.adoConn.Properties])
-
-        try:
-            sql_version = int(self.__get_dbms_version().split('.', 2)[0])
-        except (IndexError, ValueError):
+        # The connection properties and server version are read once per
+        # connection string by Database.connect.
+        sql_version = self.connection.server_version
+        if sql_version is None:
             warnings.warn(
                 "Unable to determine MS SQL server version. Only SQL 2012 or "
                 "newer is supported.", DeprecationWarning)
-        else:
-            if sql_version < VERSION_SQL2012:
-                warnings.warn(
-                    "This version of MS SQL server is no longer tested with "
-                    "django-mssql and not officially supported/maintained.",
-                    DeprecationWarning)
+        elif sql_version < VERSION_SQL2012:
+            warnings.warn(
+                "This version of MS SQL server is no longer tested with "
+                "django-mssql and not officially supported/maintained.",
+                DeprecationWarning)
 
     def create_cursor(self):
         """Creates a cursor. Assumes that a connection is established."""
@@ -262,15 +334,6 @@ class DatabaseWrapper(BaseDatabaseWrapper):
     def _set_autocommit(self, value):
         self.connection.set_autocommit(value)
 
-    def __get_dbms_version(self, make_connection=True):
-        """
-        Returns the 'DBMS Version' string, or ''. If a connection to the database has not already
-        been established, a connection will be made when `make_connection` is True.
-        """
-        if not self.connection and make_connection:
-            self.connect()
-        return self.connection.adoConnProperties.get('DBMS Version', '') if self.connection else ''
-
     def disable_constraint_checking(self):
         """
         Turn off constraint checking for every table
@@ -325,11 +388,16 @@ class DatabaseWrapper(BaseDatabaseWrapper):
             })
 
     def is_usable(self):
+        return self._is_usable(self.connection)
+
+    @staticmethod
+    def _is_usable(connection):
+        """Return True if the dbapi connection can still execute queries."""
         try:
             # Use a mssql cursor directly, bypassing Django's utilities.
-            with self.connection.cursor() as cursor:
+            with connection.cursor() as cursor:
                 cursor.execute("SELECT 1")
-        except self.Database.Error:
+        except Database.Error:
             return False
         else:
             return True
@@ -3,6 +3,10 @@ from __future__ import absolute_import, unicode_literals
 import re
 
 from django.db.models.sql import compiler
+from django.db.models.sql.datastructures import Join
+from django.utils import six
+
+from . import dbapi as Database
 
 # query_class returns the base class to use for Django queries.
 # The custom 'SqlServerQuery' class derives from django.db.models.sql.query.Query
@@ -26,6 +30,24 @@ _re_data_type_terminator = re.compile(
 
 _re_constant = re.compile(r'\s*\(?\s*\d+\s*\)?\s*')
 
+# The start of a select statement, after which TOP is inserted
+_re_select = re.compile(r'^SELECT(?: DISTINCT)?', re.IGNORECASE)
+
+# Query context keys of the hints added by models.query.mssql_hints
+query_options_context = 'mssql_options'
+table_hints_context = 'mssql_table_hints'
+
+
+class _SubquerySQL(six.text_type):
+    """
+    The SQL of a subquery, with the query options that were left off it.
+    SQLAggregateCompiler adds them to the statement that selects from it.
+    """
+    def __new__(cls, sql, options):
+        obj = super(_SubquerySQL, cls).__new__(cls, sql)
+        obj.options = options
+        return obj
+
 
 class SQLCompiler(compiler.SQLCompiler):
 
@@ -46,7 +68,11 @@ class SQLCompiler(compiler.SQLCompiler):
                 subquery=subquery,
             )
 
-            if has_limit_offset:
+            if has_limit_offset and not self.query.low_mark and self.query.high_mark is not None:
+                # A slice from the start only needs TOP, which unlike
+                # OFFSET/FETCH does not require an ORDER BY.
+                sql = _re_select.sub(lambda m: '%s TOP %d' % (m.group(0), self.query.high_mark), sql, 1)
+            elif has_limit_offset:
                 if ' order by ' not in sql.lower():
                     # Must have an ORDER BY to slice using OFFSET/FETCH. If
                     # there is none, use the first column, which is typically a
@@ -55,6 +81,15 @@ class SQLCompiler(compiler.SQLCompiler):
                 sql += ' OFFSET %d ROWS' % (self.query.low_mark or 0)
                 if self.query.high_mark is not None:
                     sql += ' FETCH NEXT %d ROWS ONLY' % (self.query.high_mark - self.query.low_mark)
+
+            # OPTION must end the statement, so it is left off subqueries.
+            # The query that selects from the subquery adds it instead.
+            options = self.query.get_context(query_options_context)
+            if options:
+                if subquery or with_col_aliases:
+                    sql = _SubquerySQL(sql, options)
+                else:
+                    sql += ' OPTION (%s)' % ', '.join(options)
         finally:
             if not has_limit_offset:
                 # remove in case query is ever reused
@@ -70,6 +105,27 @@ class SQLCompiler(compiler.SQLCompiler):
             return (None, [], [])
         return super(SQLCompiler, self).get_ordering()
 
+    def get_from_clause(self):
+        result, params = super(SQLCompiler, self).get_from_clause()
+        table_hints = self.query.get_context(table_hints_context)
+        if not table_hints:
+            return result, params
+        # The clauses of the aliases come first in result, in the same order
+        clauses = [
+            self.query.alias_map[alias] for alias in self.query.tables
+            if self.query.alias_refcount[alias] and alias in self.query.alias_map
+        ]
+        for i, clause in enumerate(clauses):
+            hints = table_hints.get(clause.table_name)
+            if not hints:
+                continue
+            hint = ' WITH (%s)' % ', '.join(hints)
+            if isinstance(clause, Join):
+                result[i] = result[i].replace(' ON (', hint + ' ON (', 1)
+            else:
+                result[i] += hint
+        return result, params
+
     def collapse_group_by(self, expressions, having):
         expressions = super(SQLCompiler, self).collapse_group_by(expressions, having)
         # MSSQL doesn't support having constants in the GROUP BY clause. Django
@@ -91,9 +147,148 @@ class SQLInsertCompiler(compiler.SQLInsertCompiler, SQLCompiler):
         if not hasattr(self, 'return_id'):
             self.return_id = False
 
-        result = super(SQLInsertCompiler, self).as_sql(*args, **kwargs)
+        if self.return_id and len(self.query.objs) > 1:
+            return self._as_bulk_return_ids_sql()
+        rows = self._insert_rows(self.query.fields) if self._can_xml_bulk_insert() else None
+        if rows is not None and Database.can_write_xml(v for row in rows for v in row):
+            result = [self._as_xml_bulk_sql(rows)]
+        else:
+            result = self._as_values_sql(*args, **kwargs)
         return [self._fix_insert(x[0], x[1]) for x in result]
 
+    def _as_values_sql(self, *args, **kwargs):
+        """
+        Return the INSERT ... VALUES statements of the objects, split to stay
+        within the row and parameter limits. The batches of bulk_batch_size
+        are larger with use_xml_bulk_insert, but not every batch can be
+        inserted as XML.
+        """
+        objs = self.query.objs
+        batch_size = min(Database._max_parameters // (len(self.query.fields) or 1), Database._max_insert_rows)
+        if len(objs) <= batch_size:
+            return super(SQLInsertCompiler, self).as_sql(*args, **kwargs)
+        result = []
+        try:
+            for start in range(0, len(objs), batch_size):
+                self.query.objs = objs[start:start + batch_size]
+                result.extend(super(SQLInsertCompiler, self).as_sql(*args, **kwargs))
+        finally:
+            self.query.objs = objs
+        return result
+
+    def _can_xml_bulk_insert(self):
+        """
+        Return True if the objects can be inserted as an XML document with
+        dbapi.bulk_insert_sql. Enabled with the 'use_xml_bulk_insert' option.
+        """
+        fields = getattr(self.query, 'fields', None)
+        return (
+            self.connection.use_xml_bulk_insert and
+            not self.return_id and
+            len(self.query.objs) > 1 and
+            bool(fields) and
+            not any(hasattr(f, 'get_placeholder') for f in fields) and
+            all(f.db_type(self.connection) for f in fields)
+        )
+
+    def _insert_rows(self, fields):
+        """Return the list of database values of fields for each object."""
+        return [
+            [
+                f.get_db_prep_save(
+                    getattr(obj, f.attname) if self.query.raw else f.pre_save(obj, True),
+                    connection=self.connection
+                ) for f in fields
+            ]
+            for obj in self.query.objs
+        ]
+
+    def _as_xml_bulk_sql(self, rows):
+        qn = self.connection.ops.quote_name
+        opts = self.query.get_meta()
+        fields = self.query.fields
+        column_types = [_re_data_type_terminator.split(f.db_type(self.connection))[0] for f in fields]
+        sql = Database.bulk_insert_sql(qn(opts.db_table), [qn(f.column) for f in fields], column_types)
+        return sql, (Database.bulk_insert_document(rows, column_types),)
+
+    def _as_bulk_return_ids_sql(self):
+        """
+        Return a list of (sql, params) that insert the objects and select
+        their primary keys in the order of the objects.
+
+        The rows are inserted with a MERGE that never matches, because unlike
+        INSERT its OUTPUT clause can refer to the source rows. Each row
+        carries its index, which is output next to the inserted primary key
+        and used to order the returned keys.
+        """
+        qn = self.connection.ops.quote_name
+        meta = self.query.get_meta()
+        fields = self.query.fields
+        rows = self._insert_rows(fields)
+        pk_col = qn(meta.pk.column)
+        pk_db_type = _re_data_type_terminator.split(meta.pk.db_type(self.connection))[0]
+
+        columns = [qn(f.column) for f in fields]
+        if columns:
+            insert = 'INSERT ({columns}) VALUES ({values})'.format(
+                columns=', '.join(columns),
+                values=', '.join('[sqlserver_ado_src].{0}'.format(c) for c in columns),
+            )
+        else:
+            insert = 'INSERT DEFAULT VALUES'
+
+        # Split the objects to stay within the parameter limit
+        batch_size = min(Database._max_parameters // (len(fields) or 1), Database._max_insert_rows)
+        result = []
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = ', '.join(
+                '({0})'.format(', '.join(
+                    [self.placeholder(f, v) for f, v in zip(fields, row)] + [str(start + i)]
+                ))
+                for i, row in enumerate(batch)
+            )
+            sql = (
+                'SET NOCOUNT ON;'
+                'DECLARE @sqlserver_ado_return_id table ([sqlserver_ado_idx] int, {pk_col} {pk_type});'
+                'MERGE INTO {table} USING (VALUES {values}) AS [sqlserver_ado_src]({src_columns}) ON 1 = 0 '
+                'WHEN NOT MATCHED THEN {insert} '
+                'OUTPUT [sqlserver_ado_src].[sqlserver_ado_idx], INSERTED.{pk_col} INTO @sqlserver_ado_return_id;'
+                'SELECT {pk_col} FROM @sqlserver_ado_return_id ORDER BY [sqlserver_ado_idx]'
+            ).format(
+                pk_col=pk_col,
+                pk_type=pk_db_type,
+                table=qn(meta.db_table),
+                values=values,
+                src_columns=', '.join(columns + ['[sqlserver_ado_idx]']),
+                insert=insert,
+            )
+            params = [v for row in batch for v in row]
+            if meta.has_auto_field and meta.auto_field in fields:
+                sql = self._identity_insert(sql)
+            result.append((sql, params))
+        return result
+
+    def _identity_insert(self, sql):
+        """Wrap the passed SQL with IDENTITY_INSERT statements."""
+        return 'SET IDENTITY_INSERT {table} ON;{sql};SET IDENTITY_INSERT {table} OFF'.format(
+            table=self.connection.ops.quote_name(self.query.get_meta().db_table),
+            sql=sql,
+        )
+
+    def execute_sql(self, return_id=False):
+        if not (return_id and len(self.query.objs) > 1):
+            return super(SQLInsertCompiler, self).execute_sql(return_id)
+        # Django only asks for the ids of a single object, unless the
+        # backend can_return_ids_from_bulk_insert.
+        self.return_id = return_id
+        ids = []
+        with self.connection.cursor() as cursor:
+            for sql, params in self.as_sql():
+                cursor.execute(sql, params)
+                ids.extend(self.connection.ops.fetch_returned_insert_ids(cursor))
+        return ids
+
     def _fix_insert(self, sql, params):
         """
         Wrap the passed SQL with IDENTITY_INSERT statements and apply
@@ -122,11 +317,7 @@ class SQLInsertCompiler(compiler.SQLInsertCompiler, SQLCompiler):
                 )
                 params = []
             elif auto_in_fields:
-                # wrap with identity insert
-                sql = 'SET IDENTITY_INSERT {table} ON;{sql};SET IDENTITY_INSERT {table} OFF'.format(
-                    table=quoted_table,
-                    sql=sql,
-                )
+                sql = self._identity_insert(sql)
 
         # mangle SQL to return ID from insert
         # http://msdn.microsoft.com/en-us/library/ms177564.aspx
@@ -166,4 +357,11 @@ class SQLUpdateCompiler(compiler.SQLUpdateCompiler, SQLCompiler):
 
 
 class SQLAggregateCompiler(compiler.SQLAggregateCompiler, SQLCompiler):
-    pass
+    def as_sql(self):
+        sql, params = super(SQLAggregateCompiler, self).as_sql()
+        # Aggregates of sliced or distinct querysets select from a subquery,
+        # such as qs.mssql_hints('RECOMPILE').distinct().count()
+        options = getattr(self.query.subquery, 'options', None)
+        if options:
+            sql += ' OPTION (%s)' % ', '.join(options)
+        return sql, params
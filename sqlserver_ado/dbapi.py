@@ -29,12 +29,18 @@ from __future__ import absolute_import, unicode_literals
 
 import time
 import datetime
+import hashlib
 import re
+import threading
 import uuid
+import weakref
 
 import decimal
 
+from base64 import b64encode
+from collections import OrderedDict, namedtuple
 from pprint import pformat
+from xml.sax.saxutils import escape as xml_escape
 
 from django.conf import settings
 from django.db.utils import (IntegrityError as DjangoIntegrityError,
@@ -42,17 +48,18 @@ from django.db.utils import (IntegrityError as DjangoIntegrityError,
 
 from django.utils import six
 from django.utils import timezone
-
-from .ado_consts import (adBigInt, adBinary, adBoolean, adBSTR, adChapter,
-    adChar, adCmdStoredProc, adCmdText, adCurrency, adDate, adDBDate, adDBTime,
-    adDBTimeStamp, adDecimal, adDouble, adError, adFileTime, adFldMayBeNull,
-    adGUID, adInteger, adLongVarBinary, adLongVarChar, adLongVarWChar,
-    adNumeric, ado_error_TIMEOUT, ado_type_name, adoErrors, adParamInput,
-    adParamInputOutput, adParamUnknown, adSingle, adSmallInt, adStateClosed,
-    adTinyInt, adTypeNames, adUnsignedBigInt, adUnsignedInt, adUnsignedSmallInt,
-    adUnsignedTinyInt, adUseServer, adVarBinary, adVarChar, adVarNumeric,
-    adVarWChar, adWChar, adXactAbortRetaining, adXactCommitRetaining,
-    adXactReadCommitted)
+from django.utils.encoding import force_bytes
+
+from .ado_consts import (adAsyncExecute, adBigInt, adBinary, adBoolean,
+    adBSTR, adChapter, adChar, adCmdStoredProc, adCmdText, adCurrency, adDate,
+    adDBDate, adDBTime, adDBTimeStamp, adDecimal, adDouble, adError, adFileTime,
+    adFldMayBeNull, adGUID, adInteger, adLongVarBinary, adLongVarChar,
+    adLockReadOnly, adLongVarWChar, adNumeric, ado_error_TIMEOUT, ado_type_name,
+    adoErrors, adOpenForwardOnly, adParamInput, adParamInputOutput, adParamUnknown, adSingle, adSmallInt,
+    adStateClosed, adStateExecuting, adTinyInt, adTypeNames, adUnsignedBigInt,
+    adUnsignedInt, adUnsignedSmallInt, adUnsignedTinyInt, adUseServer,
+    adVarBinary, adVarChar, adVarNumeric, adVarWChar, adWChar,
+    adXactAbortRetaining, adXactCommitRetaining, adXactReadCommitted)
 
 # DB API default values
 apilevel = '2.0'
@@ -72,6 +79,69 @@ defaultIsolationLevel = adXactReadCommitted
 # It may be one of the "adUse..." consts.
 defaultCursorLocation = adUseServer
 
+# Cursor and lock type of the recordsets opened by a cursor. They may be
+# overridden per connection with the cursor_type and lock_type arguments of
+# connect, and per cursor with its cursor_type and lock_type attributes. A
+# forward-only, read-only cursor is the "firehose" cursor that Command.Execute
+# opens, and streams rows without server side cursor overhead.
+defaultCursorType = adOpenForwardOnly
+defaultLockType = adLockReadOnly
+
+# Number of rows fetched per round trip when iterating over a cursor. It may
+# be overridden per connection with the fetch_chunk_size argument of connect.
+defaultFetchChunkSize = 100
+
+# Number of prepared commands cached per connection. It may be overridden per
+# connection with the command_cache_size argument of connect. 0 disables the
+# cache.
+defaultCommandCacheSize = 0
+
+# Number of rows sent per statement by bulk_insert. All rows of a statement
+# are sent as a single XML document parameter.
+defaultBulkInsertBatchSize = 10000
+
+# SQL Server accepts at most 2100 parameters per request and 1000 rows per
+# VALUES clause. executemany sizes its multi-row INSERT batches to fit both.
+_max_parameters = 2100
+_max_insert_rows = 1000
+
+# String parameters up to this size are declared as nvarchar(4000) with
+# stable_sql_text. Longer ones are sent as nvarchar(max).
+_max_stable_string_size = 4000
+
+# Operations rewritten for ADO, keyed by the operation and the replacement
+# of each parameter. The cache is emptied when it reaches the maximum size.
+_rewritten_operations = {}
+_max_rewritten_operations = 1000
+
+# Cursor descriptions, keyed by the connection, the command text, the
+# position of the result set in the results of the command and the type, name
+# and size of its columns. The cache is emptied when it reaches the maximum
+# size.
+_descriptions = {}
+_max_descriptions = 1000
+
+# Cursor._description before the description of its recordset has been read
+_unread = object()
+
+# Column name of the @@ROWCOUNT select that execute_batch appends to each
+# statement to mark the end of its results.
+_batch_rowcount_column = 'sqlserver_ado_batch_rowcount'
+_batch_rowcount_sql = 'SELECT @@ROWCOUNT AS [{0}]'.format(_batch_rowcount_column)
+
+# Seconds between checks for the completion of statements run by
+# Connection.execute_parallel.
+_parallel_poll_interval = 0.001
+
+_re_mars_connection = re.compile(r'\bmars connection\s*=\s*(true|yes)\b', re.IGNORECASE)
+
+# Matches a single row "INSERT ... VALUES (...)" statement, which executemany
+# can send as a multi-row INSERT.
+_re_insert_values = re.compile(
+    r'^(?P<insert>\s*INSERT\s.+?\sVALUES\s*)(?P<row>\([^;]*\))\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+
 # Used for COM to Python date conversions.
 _ordinal_1899_12_31 = datetime.date(1899, 12, 31).toordinal() - 1
 _milliseconds_per_day = 24 * 60 * 60 * 1000
@@ -94,6 +164,74 @@ class MultiMap(object):
         return self.storage.get(key, self.default)
 
 
+class CommandCache(object):
+    """
+    A least recently used cache of prepared ADO Command objects, keyed by
+    the final SQL text and the ADO types of its parameters.
+
+    A cursor checks a Command out of the cache while its results may still
+    be read, and checks it back in with release. A Command that is checked
+    out is not handed to another cursor, as rebinding its parameters would
+    disturb the open recordset of the first cursor.
+
+    hits, misses and evictions count the cache activity since the cache
+    was created.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._commands = OrderedDict()
+        # Keys of the Commands checked out by a cursor
+        self._checked_out = set()
+
+    def __len__(self):
+        return len(self._commands)
+
+    def __contains__(self, key):
+        return key in self._commands
+
+    def get(self, key):
+        """
+        Check out the Command cached for key. Return None if there is none,
+        or if another cursor has it checked out.
+        """
+        if key in self._checked_out:
+            self.misses += 1
+            return None
+        cmd = self._commands.pop(key, None)
+        if cmd is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Re-insert to mark it as the most recently used
+        self._commands[key] = cmd
+        self._checked_out.add(key)
+        return cmd
+
+    def put(self, key, cmd):
+        """
+        Cache cmd for key, checked out by the cursor that created it,
+        evicting the least recently used Commands.
+        """
+        self._commands[key] = cmd
+        self._checked_out.add(key)
+        while len(self._commands) > self.max_size:
+            evicted_key, evicted = self._commands.popitem(last=False)
+            self._checked_out.discard(evicted_key)
+            self.evictions += 1
+
+    def release(self, key, cmd):
+        """Check cmd back in, if it is still the Command cached for key."""
+        if self._commands.get(key) is cmd:
+            self._checked_out.discard(key)
+
+    def clear(self):
+        self._commands.clear()
+        self._checked_out.clear()
+
+
 def standardErrorHandler(connection, cursor, errorclass, errorvalue):
     err = (errorclass, errorvalue)
     if connection is not None:
@@ -172,27 +310,52 @@ def mask_connection_string_password(s, mask='******'):
     return re.sub(_re_find_password, '\g<1>=%s;' % mask, s)
 
 
-def connect(connection_string, timeout=30, use_transactions=None):
+def connect(connection_string, timeout=30, use_transactions=None, fetch_chunk_size=None,
+            command_cache_size=None, typed_parameters=False, stable_sql_text=False,
+            cache_procedure_parameters=False, cursor_location=None, cursor_type=None,
+            lock_type=None, cache_size=None):
     """Connect to a database.
 
     connection_string -- An ADODB formatted connection string, see:
         http://www.connectionstrings.com/?carrier=sqlserver2005
     timeout -- A command timeout value, in seconds (default 30 seconds)
+    fetch_chunk_size -- Rows fetched per round trip when iterating over a
+        cursor (default defaultFetchChunkSize)
+    command_cache_size -- Number of prepared commands to cache on the
+        connection (default defaultCommandCacheSize)
+    typed_parameters -- Bind Decimal and datetime parameters as adNumeric and
+        adDBTimeStamp instead of strings (default False)
+    stable_sql_text -- Bind empty string parameters, and None once the type
+        of its parameter is known, instead of inlining them, so the SQL text
+        does not depend on the values (default False)
+    cache_procedure_parameters -- Build the parameters of callproc from
+        the cached parameters of earlier calls of the procedure, instead of
+        asking the server for them on every call (default False)
+    cursor_location -- One of the adUse... consts (default
+        defaultCursorLocation)
+    cursor_type -- One of the adOpen... consts (default defaultCursorType)
+    lock_type -- One of the adLock... consts (default defaultLockType)
+    cache_size -- Rows the provider buffers per round trip while fetching
+        from a recordset, or None (default) to match the fetch size
     """
-    # Inner imports to make this module importable on non-Windows platforms.
-    import pythoncom
-    import win32com.client
     try:
-        pythoncom.CoInitialize()
-        c = win32com.client.Dispatch('ADODB.Connection')
+        _co_initialize()
+        c = _dispatch('ADODB.Connection')
         c.CommandTimeout = timeout
         c.ConnectionString = connection_string
         c.Open()
+        properties, server_version = _connection_info(c, connection_string)
         if use_transactions is None:
-            useTransactions = _use_transactions(c)
+            useTransactions = _use_transactions(properties)
         else:
             useTransactions = use_transactions
-        return Connection(c, useTransactions)
+        conn = Connection(c, useTransactions, fetch_chunk_size, command_cache_size, typed_parameters,
+                          stable_sql_text, cache_procedure_parameters, cursor_location, cursor_type,
+                          lock_type, cache_size)
+        conn.adoConnProperties = properties
+        conn.server_version = server_version
+        conn.connection_key = mask_connection_string_password(connection_string)
+        return conn
     except Exception as e:
         raise OperationalError(e,
             "Error opening connection: {0}".format(
@@ -201,12 +364,171 @@ def connect(connection_string, timeout=30, use_transactions=None):
         )
 
 
-def _use_transactions(c):
-    """Return True if the given ADODB.Connection supports transactions."""
-    for prop in c.Properties:
-        if prop.Name == 'Transaction DDL':
-            return prop.Value > 0
-    return False
+def _rewrite_operation(operation, replacements):
+    """
+    Return operation with its '%s' markers replaced by replacements, which
+    are '?' for bound parameters and SQL literals for inlined ones.
+    """
+    key = (operation, replacements)
+    try:
+        return _rewritten_operations[key]
+    except KeyError:
+        pass
+    sql = operation % replacements if replacements else operation
+    # Django will pass down many '%%' values. Need to convert these back to
+    # a single '%'. This will break raw SQL that includes '%%' as part of an
+    # inlined value. Those queries should use params.
+    sql = sql.replace('%%', '%')
+    if len(_rewritten_operations) >= _max_rewritten_operations:
+        _rewritten_operations.clear()
+    _rewritten_operations[key] = sql
+    return sql
+
+
+def _co_initialize():
+    """Initialize COM for the calling thread."""
+    # Inner import to make this module importable on non-Windows platforms.
+    import pythoncom
+    pythoncom.CoInitialize()
+
+
+def _co_uninitialize():
+    """Release COM for the calling thread, balancing a _co_initialize call."""
+    # Inner import to make this module importable on non-Windows platforms.
+    import pythoncom
+    pythoncom.CoUninitialize()
+
+
+def _dispatch(prog_id):
+    """Create the COM object registered as prog_id."""
+    # Inner import to make this module importable on non-Windows platforms.
+    import win32com.client
+    return win32com.client.Dispatch(prog_id)
+
+
+def _use_transactions(properties):
+    """Return True if an ADODB.Connection with the given properties supports transactions."""
+    return (properties.get('Transaction DDL') or 0) > 0
+
+
+# Cache of (ADO Connection properties, server major version) keyed by a
+# hash of the connection string. Reading the properties walks every ADO
+# property over COM, so it is done once per connection string. The password
+# is part of the key, as different logins may see different properties.
+_connection_info_cache = {}
+
+
+def _connection_info_key(connection_string):
+    return hashlib.sha256(force_bytes(connection_string)).hexdigest()
+
+
+def _connection_info(adoConn, connection_string):
+    """
+    Return a tuple of a dict of the properties of the open adoConn and the
+    major version of the server, or None if it cannot be determined. Each
+    call returns its own copy of the properties.
+    """
+    key = _connection_info_key(connection_string)
+    info = _connection_info_cache.get(key)
+    if info is None:
+        properties = dict((p.Name, p.Value) for p in adoConn.Properties)
+        try:
+            server_version = int(properties.get('DBMS Version', '').split('.', 2)[0])
+        except (AttributeError, IndexError, ValueError):
+            server_version = None
+        info = _connection_info_cache[key] = (properties, server_version)
+    properties, server_version = info
+    return dict(properties), server_version
+
+
+def clear_connection_info_cache(connection_string=None):
+    """
+    Forget the cached connection properties and server version for
+    connection_string, or for all connection strings if it is None. The next
+    connection will read them from the server again.
+    """
+    if connection_string is None:
+        _connection_info_cache.clear()
+    else:
+        _connection_info_cache.pop(_connection_info_key(connection_string), None)
+
+
+class ProcedureParameterCache(object):
+    """
+    The parameters of stored procedures, as lists of (name, type,
+    direction, size, precision, scale), keyed by the connection string with
+    its password masked and the procedure name.
+
+    refreshes counts the calls of Parameters.Refresh made to fill the cache,
+    and avoided the calls that the cache saved. The cache is shared by the
+    connections of all threads, so every access holds the lock.
+    """
+    def __init__(self):
+        self.refreshes = 0
+        self.avoided = 0
+        self._procedures = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._procedures)
+
+    def get(self, connection_key, procname):
+        """Return the cached parameters of procname, or None."""
+        with self._lock:
+            parameters = self._procedures.get((connection_key, procname))
+            if parameters is None:
+                self.refreshes += 1
+            else:
+                self.avoided += 1
+        return parameters
+
+    def put(self, connection_key, procname, parameters):
+        """Cache the list of ADO Parameters of procname."""
+        parameters = [
+            (p.Name, p.Type, p.Direction, p.Size, p.Precision, p.NumericScale)
+            for p in parameters
+        ]
+        with self._lock:
+            self._procedures[(connection_key, procname)] = parameters
+
+    def clear(self, connection_key=None, procname=None):
+        """
+        Forget the parameters of procname, or of all procedures, for
+        connection_key, or for all connections.
+        """
+        with self._lock:
+            for key in list(self._procedures):
+                if connection_key is not None and key[0] != connection_key:
+                    continue
+                if procname is not None and key[1] != procname:
+                    continue
+                del self._procedures[key]
+
+
+# Parameters of the stored procedures called on connections that
+# cache_procedure_parameters, shared by all connections of the process.
+procedure_parameter_cache = ProcedureParameterCache()
+
+
+def clear_description_cache():
+    """
+    Forget the cached cursor descriptions. Call this after the columns of a
+    table are changed other than with the schema editor, so that queries of
+    it describe the new columns.
+    """
+    _descriptions.clear()
+
+
+def clear_procedure_parameter_cache(connection_string=None, procname=None):
+    """
+    Forget the cached parameters of procname, or of all stored procedures,
+    for connection_string, or for all connection strings if it is None. Call
+    this after altering a stored procedure.
+    """
+    if connection_string is not None:
+        connection_string = mask_connection_string_password(connection_string)
+    procedure_parameter_cache.clear(connection_string, procname)
 
 
 def format_parameters(parameters, show_value=False):
@@ -267,47 +589,380 @@ def format_decimal_as_string(value):
     return ''.join(reversed(result))
 
 
-def _configure_parameter(p, value):
-    """Configure the given ADO Parameter 'p' with the Python 'value'."""
-    if p.Direction not in [adParamInput, adParamInputOutput, adParamUnknown]:
-        return
+# Characters escaped in XML attribute values, in addition to &, < and >.
+# Whitespace is escaped because the XML parser normalizes it to spaces.
+_xml_attribute_entities = {
+    '"': '&quot;',
+    '\t': '&#9;',
+    '\n': '&#10;',
+    '\r': '&#13;',
+}
 
-    if isinstance(value, six.string_types):
-        p.Value = value
-        p.Size = len(value)
+_re_binary_type = re.compile(r'^\s*(var)?binary\b', re.IGNORECASE)
 
-    elif isinstance(value, six.memoryview):
-        p.Size = len(value)
-        p.AppendChunk(value)
+# Date and time data types, with the scale of their fractional seconds
+_re_time_type = re.compile(
+    r'^\s*(?P<type>datetime2|datetimeoffset|time|datetime|smalldatetime)\b\s*(?:\(\s*(?P<scale>\d+)\s*\))?',
+    re.IGNORECASE,
+)
 
-    elif isinstance(value, decimal.Decimal):
-        p.Type = adBSTR
-        p.Value = format_decimal_as_string(value)
+# Characters that XML 1.0 documents cannot contain
+_re_xml_invalid = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def bulk_insert_sql(table, columns, column_types):
+    """
+    Return the SQL to insert the rows of an XML document, created by
+    bulk_insert_document, into table. The document is the only parameter.
+
+    table -- The quoted table name.
+    columns -- The quoted column names.
+    column_types -- The SQL Server data type of each column, e.g. 'nvarchar(50)'.
+    """
+    values = []
+    for i, column_type in enumerate(column_types):
+        if _re_binary_type.match(column_type):
+            path = 'xs:base64Binary(@c{0})'.format(i)
+        else:
+            path = '@c{0}'.format(i)
+        values.append("[r].value('{0}', '{1}')".format(path, column_type))
+    return (
+        'INSERT INTO {table} ({columns}) SELECT {values} '
+        'FROM (SELECT CAST(%s AS xml)) AS [d]([x]) '
+        "CROSS APPLY [d].[x].nodes('/r') AS [n]([r])"
+    ).format(
+        table=table,
+        columns=', '.join(columns),
+        values=', '.join(values),
+    )
+
+
+def bulk_insert_document(rows, column_types=None):
+    """
+    Return the rows as an XML document with an 'r' element per row and a
+    'c<index>' attribute per column. None values are left out, which the
+    server reads as NULL.
+
+    column_types -- The SQL Server data type of each column. Datetime and
+        time values are written with the fractional seconds of their
+        column, e.g. milliseconds for 'datetime'.
+
+    The strings of the rows must not contain characters that XML cannot
+    represent, see can_write_xml.
+    """
+    digits = [_fractional_digits(t) for t in column_types or ()]
+    parts = []
+    for row in rows:
+        parts.append('<r')
+        for i, value in enumerate(row):
+            if value is not None:
+                text = _xml_value(value, digits[i] if i < len(digits) else None)
+                parts.append(' c%d="%s"' % (i, xml_escape(text, _xml_attribute_entities)))
+        parts.append('/>')
+    return ''.join(parts)
+
+
+def can_write_xml(values):
+    """
+    Return True if none of the string values contains a character that an
+    XML document cannot represent, such as most control characters.
+    """
+    for value in values:
+        if isinstance(value, six.string_types) and _re_xml_invalid.search(value):
+            return False
+    return True
+
+
+def _fractional_digits(column_type):
+    """
+    Return the number of fractional second digits that column_type stores,
+    or None if it is no date and time type.
+    """
+    match = _re_time_type.match(column_type)
+    if match is None:
+        return None
+    name = match.group('type').lower()
+    if name == 'datetime':
+        return 3
+    if name == 'smalldatetime':
+        return 0
+    return int(match.group('scale') or 7)
 
+
+def _xml_time(value, digits):
+    """Return the ISO format of a datetime or time with digits of fractional seconds."""
+    text = value.replace(microsecond=0).isoformat()
+    if digits and value.microsecond:
+        text += '.' + ('%06d' % value.microsecond)[:digits]
+    return text
+
+
+def _xml_value(value, digits=None):
+    """
+    Format a Python value as text the XML value() method can parse. digits
+    is the number of fractional second digits of datetime and time values,
+    or None for all of them.
+    """
+    if isinstance(value, six.text_type):
+        return value
+    elif isinstance(value, bool):
+        return '1' if value else '0'
+    elif isinstance(value, decimal.Decimal):
+        return format_decimal_as_string(value)
     elif isinstance(value, datetime.datetime):
-        p.Type = adBSTR
         if timezone.is_aware(value):
             value = timezone.make_naive(value, timezone.utc)
-        # Strip '-' so SQL Server parses as YYYYMMDD for all languages/formats
-        s = value.isoformat(' ' if six.PY3 else b' ').replace('-', '')
-        p.Value = s
-        p.Size = len(s)
-
-    elif isinstance(value, (datetime.time, datetime.date)):
-        p.Type = adBSTR
-        s = value.isoformat()
-        p.Value = s
-        p.Size = len(s)
-
-    elif isinstance(value, uuid.UUID):
-        p.Type = adBSTR
-        s = str(value)
-        p.Value = s
-        p.Size = len(s)
+        return value.isoformat() if digits is None else _xml_time(value, digits)
+    elif isinstance(value, datetime.time):
+        return value.isoformat() if digits is None else _xml_time(value, digits)
+    elif isinstance(value, datetime.date):
+        return value.isoformat()
+    elif isinstance(value, six.memoryview):
+        return b64encode(bytes(value)).decode('ascii')
+    elif isinstance(value, bytes) and six.PY3:
+        return b64encode(value).decode('ascii')
+    return six.text_type(value)
+
+
+# SQL Server data types of PackedArray values, by Python type
+_packed_array_types = [
+    (bool, 'bit'),
+    (six.integer_types, 'bigint'),
+    (float, 'float'),
+    (uuid.UUID, 'uniqueidentifier'),
+    (datetime.datetime, 'datetime2'),
+    (datetime.date, 'date'),
+    (six.string_types, 'nvarchar(max)'),
+]
+
+
+class PackedArray(object):
+    """
+    A list of values bound as one XML document parameter, which the server
+    shreds into a single column of rows. Use it where SQL Server accepts a
+    subquery, such as 'WHERE [id] IN (%s)', to pass any number of values
+    with one parameter and the same SQL text.
+
+    values -- The values. None values become NULL.
+    sql_type -- The SQL Server data type of the values, e.g. 'int' or
+        'nvarchar(50)'. Values longer or more precise than the type are
+        truncated by the server. By default it is derived from the Python
+        type of the first value that is not None.
+    """
+    def __init__(self, values, sql_type=None):
+        self.values = list(values)
+        if sql_type is None:
+            sql_type = _packed_array_type(self.values)
+        self.sql_type = sql_type
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return 'PackedArray(<%d values>, %r)' % (len(self.values), self.sql_type)
+
+    def as_sql(self, placeholder='%s'):
+        """Return a SELECT of the values, with placeholder for the document."""
+        if not self.values:
+            return 'SELECT NULL WHERE 1 = 0'
+        path = 'xs:base64Binary(@c0)' if _re_binary_type.match(self.sql_type) else '@c0'
+        return (
+            "SELECT [r].value('{path}', '{sql_type}') "
+            'FROM (SELECT CAST({placeholder} AS xml)) AS [d]([x]) '
+            "CROSS APPLY [d].[x].nodes('/r') AS [n]([r])"
+        ).format(path=path, sql_type=self.sql_type, placeholder=placeholder)
+
+    def document(self):
+        """Return the XML document of the values."""
+        return bulk_insert_document(((value,) for value in self.values), [self.sql_type])
+
+
+def _packed_array_type(values):
+    for value in values:
+        if value is None:
+            continue
+        for python_type, sql_type in _packed_array_types:
+            if isinstance(value, python_type):
+                return sql_type
+        raise TypeError('PackedArray cannot derive the SQL type of %s values, pass sql_type'
+            % value.__class__.__name__)
+    return 'int'
+
+
+def bulk_insert(cursor, table, columns, column_types, rows, batch_size=None):
+    """
+    Insert rows into table with one statement per batch of rows.
+
+    Each batch is sent as a single XML document parameter that the server
+    shreds into rows, so batches are not limited to the 2100 parameters and
+    1000 rows of a multi-row INSERT ... VALUES. A batch with strings that
+    XML cannot represent is inserted with executemany instead.
+
+    cursor -- An open Cursor.
+    table -- The quoted table name.
+    columns -- The quoted column names.
+    column_types -- The SQL Server data type of each column, e.g. 'nvarchar(50)'.
+    rows -- An iterable of sequences with a value for each column.
+    batch_size -- Rows inserted per statement (default defaultBulkInsertBatchSize)
+
+    Returns the number of inserted rows.
+    """
+    sql = bulk_insert_sql(table, columns, column_types)
+    values_sql = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(
+        table, ', '.join(columns), ', '.join(['%s'] * len(columns)))
+    batch_size = batch_size or defaultBulkInsertBatchSize
+
+    def insert(batch):
+        if can_write_xml(value for row in batch for value in row):
+            cursor.execute(sql, [bulk_insert_document(batch, column_types)])
+        else:
+            cursor.executemany(values_sql, batch)
+        return len(batch)
+
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            count += insert(batch)
+            batch = []
+    if batch:
+        count += insert(batch)
+    return count
+
+
+def _bind_string(p, value):
+    p.Value = value
+    p.Size = len(value)
+
+
+def _bind_binary(p, value):
+    p.Size = len(value)
+    p.AppendChunk(value)
+
+
+def _bind_value(p, value):
+    # For any other type, set the value and let pythoncom do the right thing.
+    p.Value = value
+
+
+def _bind_decimal_as_string(p, value):
+    p.Type = adBSTR
+    p.Value = format_decimal_as_string(value)
+
+
+def _bind_datetime_as_string(p, value):
+    p.Type = adBSTR
+    if timezone.is_aware(value):
+        value = timezone.make_naive(value, timezone.utc)
+    # Strip '-' so SQL Server parses as YYYYMMDD for all languages/formats
+    _bind_string(p, value.isoformat(' ' if six.PY3 else b' ').replace('-', ''))
+
+
+def _bind_isoformat_as_string(p, value):
+    p.Type = adBSTR
+    _bind_string(p, value.isoformat())
+
+
+def _bind_uuid_as_string(p, value):
+    p.Type = adBSTR
+    _bind_string(p, str(value))
+
 
+def _bind_decimal(p, value):
+    """
+    Bind a Decimal as adNumeric with the precision and scale of the value.
+    The value itself is assigned as text, because pythoncom passes a Decimal
+    as currency, which only has 4 decimal places and 19 digits.
+    """
+    if not value.is_finite():
+        return _bind_decimal_as_string(p, value)
+    sign, digits, exponent = value.as_tuple()
+    if exponent < 0:
+        scale = -exponent
+        precision = max(len(digits), scale)
     else:
-        # For any other type, set the value and let pythoncom do the right thing.
-        p.Value = value
+        scale = 0
+        precision = len(digits) + exponent
+    if precision > 38:
+        return _bind_decimal_as_string(p, value)
+    p.Type = adNumeric
+    p.Precision = precision
+    p.NumericScale = scale
+    p.Value = format_decimal_as_string(value)
+
+
+def _bind_datetime(p, value):
+    """
+    Bind a datetime as adDBTimeStamp. pythoncom passes it as a COM date,
+    which does not keep microseconds, so those are bound as a string.
+    """
+    if value.microsecond:
+        return _bind_datetime_as_string(p, value)
+    p.Type = adDBTimeStamp
+    if timezone.is_aware(value):
+        value = timezone.make_naive(value, timezone.utc)
+    p.Value = value
+
+
+# Functions that configure an ADO Parameter for a value, by the type of the
+# value. Subclasses use the function of their nearest base class, see
+# _parameter_binder.
+_parameter_binders = {
+    six.memoryview: _bind_binary,
+    decimal.Decimal: _bind_decimal_as_string,
+    datetime.datetime: _bind_datetime_as_string,
+    datetime.date: _bind_isoformat_as_string,
+    datetime.time: _bind_isoformat_as_string,
+    uuid.UUID: _bind_uuid_as_string,
+}
+_parameter_binders.update((t, _bind_string) for t in six.string_types)
+
+# Used for connections with typed_parameters. Decimal and datetime values
+# are bound natively instead of being sent as text for the server to parse.
+_typed_parameter_binders = dict(_parameter_binders)
+_typed_parameter_binders.update({
+    decimal.Decimal: _bind_decimal,
+    datetime.datetime: _bind_datetime,
+})
+
+
+def _parameter_binder(value, binders):
+    """Return the function in binders that configures a Parameter for value."""
+    cls = type(value)
+    try:
+        return binders[cls]
+    except KeyError:
+        binder = _bind_value
+        for base in cls.__mro__[1:]:
+            if base in binders:
+                binder = binders[base]
+                break
+        binders[cls] = binder
+        return binder
+
+
+def _stabilize_parameter(p):
+    """
+    Give string parameters of up to 4000 characters the same size, so the
+    parameter declarations the server sees, and so its cached plans, do not
+    depend on the length of the values.
+    """
+    if p.Type == adVarWChar and p.Size <= _max_stable_string_size:
+        p.Size = _max_stable_string_size
+
+
+def _configure_parameter(p, value, typed=False):
+    """
+    Configure the given ADO Parameter 'p' with the Python 'value'. If typed
+    is True, Decimal and datetime values are bound as adNumeric and
+    adDBTimeStamp instead of strings.
+    """
+    if p.Direction not in [adParamInput, adParamInputOutput, adParamUnknown]:
+        return
+
+    binders = _typed_parameter_binders if typed else _parameter_binders
+    _parameter_binder(value, binders)(p, value)
 
     # Use -1 instead of 0 for empty strings and buffers
     if p.Size == 0:
@@ -315,13 +970,41 @@ def _configure_parameter(p, value):
 
 
 class Connection(object):
-    def __init__(self, adoConn, useTransactions=False):
+    def __init__(self, adoConn, useTransactions=False, fetch_chunk_size=None, command_cache_size=None,
+                 typed_parameters=False, stable_sql_text=False, cache_procedure_parameters=False,
+                 cursor_location=None, cursor_type=None, lock_type=None, cache_size=None):
         self.adoConn = adoConn
         self.errorhandler = None
         self.messages = []
-        self.adoConn.CursorLocation = defaultCursorLocation
+        self.typed_parameters = typed_parameters
+        self.stable_sql_text = stable_sql_text
+        self.cache_procedure_parameters = cache_procedure_parameters
+        # Set by connect() to the masked connection string. Keys the entries
+        # of procedure_parameter_cache.
+        self.connection_key = None
+        # Parameter types by position, keyed by the operation before it is
+        # rewritten. Used to bind None with stable_sql_text.
+        self._null_parameter_types = {}
+        # The cursors whose exhausted recordsets have not been released yet.
+        # See release_exhausted_recordset.
+        self._exhausted_cursors = weakref.WeakSet()
+        self.fetch_chunk_size = fetch_chunk_size or defaultFetchChunkSize
+        # Set by connect() from the properties of the ADO connection
+        self.adoConnProperties = {}
+        self.server_version = None
+        if command_cache_size is None:
+            command_cache_size = defaultCommandCacheSize
+        self.command_cache = CommandCache(command_cache_size) if command_cache_size > 0 else None
+        self.cursor_location = defaultCursorLocation if cursor_location is None else cursor_location
+        self.cursor_type = defaultCursorType if cursor_type is None else cursor_type
+        self.lock_type = defaultLockType if lock_type is None else lock_type
+        self.cache_size = cache_size
+        self.adoConn.CursorLocation = self.cursor_location
         self.supportsTransactions = useTransactions
         self.transaction_level = 0 # 0 == Not in a transaction, at the top level
+        # Set when an error may have ended the transaction on the server, so
+        # transaction_level must be checked against @@TRANCOUNT.
+        self._transaction_level_unknown = False
 
         if self.supportsTransactions:
             self.adoConn.IsolationLevel = defaultIsolationLevel
@@ -331,12 +1014,25 @@ class Connection(object):
         if self.supportsTransactions == (not value):
             return
         if self.supportsTransactions:
-            self.transaction_level = self.adoConn.RollbackTrans() # Disables autocommit per DBPAI
+            self.adoConn.RollbackTrans()
+            self.transaction_level = 0
         else:
             self.adoConn.IsolationLevel = defaultIsolationLevel
             self.transaction_level = self.adoConn.BeginTrans() # Disables autocommit per DBPAI
         self.supportsTransactions = not value
 
+    def _remember_parameter_types(self, operation, parameters, bound_parameters):
+        """Record the types of the non-None parameters bound for operation."""
+        types = self._null_parameter_types.get(operation)
+        if types is None:
+            if len(self._null_parameter_types) >= _max_rewritten_operations:
+                self._null_parameter_types.clear()
+            types = self._null_parameter_types[operation] = {}
+        for p, (i, value, ado_type) in zip(parameters, bound_parameters):
+            # adNumeric needs a precision, which None does not have
+            if value is not None and p.Type != adNumeric:
+                types[i] = p.Type
+
     def _raiseConnectionError(self, errorclass, errorvalue):
         eh = self.errorhandler
         if eh is None:
@@ -346,20 +1042,21 @@ class Connection(object):
     def _close_connection(self):
         """Close the underlying ADO Connection object, rolling back an active transaction if supported."""
         if self.supportsTransactions:
-            self.transaction_level = self.adoConn.RollbackTrans()
+            self.adoConn.RollbackTrans()
+            self.transaction_level = 0
         self.adoConn.Close()
 
     def close(self):
         """Close the database connection."""
         self.messages = []
+        if self.command_cache is not None:
+            self.command_cache.clear()
         try:
             self._close_connection()
         except Exception as e:
             self._raiseConnectionError(InternalError, e)
         self.adoConn = None
-        # Inner import to make this module importable on non-Windows platforms.
-        import pythoncom
-        pythoncom.CoUninitialize()
+        _co_uninitialize()
 
     def commit(self):
         """Commit a pending transaction to the database.
@@ -371,36 +1068,168 @@ class Connection(object):
         if not self.supportsTransactions:
             return
 
+        self.release_exhausted_recordset()
         try:
-            self.transaction_level = self.adoConn.CommitTrans()
+            self.adoConn.CommitTrans()
+            self.transaction_level = 0
             if not(self.adoConn.Attributes & adXactCommitRetaining):
                 # If attributes has adXactCommitRetaining it performs retaining commits that is,
                 # calling CommitTrans automatically starts a new transaction. Not all providers support this.
                 # If not, we will have to start a new transaction by this command:
-                self.adoConn.BeginTrans()
+                self.transaction_level = self.adoConn.BeginTrans()
+            else:
+                self.transaction_level = 1
         except Exception as e:
+            self._transaction_level_unknown = True
             self._raiseConnectionError(Error, e)
 
     def rollback(self):
-        """Abort a pending transaction."""
+        """Abort a pending transaction.
+
+        The transaction level is tracked locally. The server is only asked
+        for @@TRANCOUNT after an error, which may have ended the transaction.
+        """
         self.messages = []
-        with self.cursor() as cursor:
-            cursor.execute("select @@TRANCOUNT")
-            trancount, = cursor.fetchone()
-        if trancount == 0:
+        if self._transaction_level_unknown:
+            with self.cursor() as cursor:
+                cursor.execute("select @@TRANCOUNT")
+                self.transaction_level, = cursor.fetchone()
+            self._transaction_level_unknown = False
+        if self.transaction_level == 0:
             return
-        self.transaction_level = self.adoConn.RollbackTrans()
+        self.release_exhausted_recordset()
+        self.adoConn.RollbackTrans()
+        self.transaction_level = 0
         if not(self.adoConn.Attributes & adXactAbortRetaining):
             # If attributes has adXactAbortRetaining it performs retaining aborts that is,
             # calling RollbackTrans automatically starts a new transaction. Not all providers support this.
             # If not, we will have to start a new transaction by this command:
             self.transaction_level = self.adoConn.BeginTrans()
+        else:
+            self.transaction_level = 1
+
+    def reset(self):
+        """
+        Return the connection to the state it was opened in by rolling back
+        any pending transaction and restoring the default isolation level.
+
+        Used when returning a connection to a pool.
+        """
+        self.messages = []
+        self.adoConn.IsolationLevel = defaultIsolationLevel
+        self.rollback()
 
     def cursor(self):
         """Return a new Cursor object using the current connection."""
         self.messages = []
         return Cursor(self)
 
+    @property
+    def uses_mars(self):
+        """True if the connection string enables Multiple Active Result Sets."""
+        return bool(_re_mars_connection.search(self.adoConn.ConnectionString or ''))
+
+    def release_exhausted_recordset(self, cursor=None):
+        """
+        Release the exhausted recordsets of the cursors other than `cursor`
+        before the connection runs a statement.
+
+        Without MARS, a connection cannot run a statement while a recordset
+        is still open on it, so the provider would open another connection
+        for the statement. Releasing the recordset costs a round trip, so it
+        is only done when a statement is about to run. The cursor moves on
+        to the next recordset, or closes its cursor on the server, when it
+        calls nextset or close.
+        """
+        exhausted_cursors = list(self._exhausted_cursors)
+        self._exhausted_cursors.clear()
+        for exhausted in exhausted_cursors:
+            if exhausted is not cursor and exhausted.connection is self:
+                exhausted._release_recordset()
+
+    def execute_parallel(self, statements):
+        """
+        Execute independent statements at the same time and return a cursor
+        for each, in the same order, with its results.
+
+        statements -- A sequence of (operation, parameters) tuples.
+
+        On a MARS connection all statements are sent before waiting for any
+        of them, so their round trips overlap. Otherwise they are executed
+        one after the other.
+
+        If a statement fails, all of the cursors are closed and the error of
+        the first failed statement is raised. ADO does not tell which command
+        left an error on the connection, so errors are attributed per poll:
+        when several statements complete between two checks, the errors are
+        raised for each of them.
+
+        ADO only reports the number of rows affected by an asynchronous
+        command in its ExecuteComplete event, so the rowcount of the cursors
+        is -1 on a MARS connection. Use Cursor.execute_batch to get the row
+        counts of statements.
+        """
+        cursors = [self.cursor() for statement in statements]
+        try:
+            if self.uses_mars:
+                self._execute_parallel(cursors, statements)
+            else:
+                for cursor, (operation, parameters) in zip(cursors, statements):
+                    cursor.execute(operation, parameters)
+        except Error:
+            for cursor in cursors:
+                cursor.close()
+            raise
+        return cursors
+
+    def _execute_parallel(self, cursors, statements):
+        started = []
+        error = None
+        # Errors of earlier statements must not be taken for those of these
+        self.adoConn.Errors.Clear()
+        for cursor, (operation, parameters) in zip(cursors, statements):
+            try:
+                cursor._prepare(operation, parameters)
+                cursor._start_command()
+            except Error as e:
+                error = e
+                break
+            started.append(cursor)
+
+        # Wait for everything that was sent, even if sending failed. The
+        # Errors collection is shared by the whole connection, so it is read
+        # and cleared as soon as any command completes. Its errors belong to
+        # the commands that completed since it was last read.
+        pending = started
+        while pending:
+            completed = [cursor for cursor in pending if not cursor.cmd.State & adStateExecuting]
+            if not completed:
+                time.sleep(_parallel_poll_interval)
+                continue
+            errors = self._take_errors()
+            if errors:
+                # A command that completed while they were read may have left some of them
+                completed = [cursor for cursor in pending
+                             if cursor in completed or not cursor.cmd.State & adStateExecuting]
+            pending = [cursor for cursor in pending if cursor not in completed]
+            for cursor in completed:
+                try:
+                    cursor._finish_command(errors)
+                except Error as e:
+                    error = error or e
+        if error is not None:
+            raise error
+
+    def _take_errors(self):
+        """
+        Return the (SQLState, Description) of the errors in the Errors
+        collection of the connection, without warnings, and clear it.
+        """
+        errors = [(str(e.SQLState), e.Description) for e in self.adoConn.Errors
+                  if not str(e.SQLState).startswith('01')]
+        self.adoConn.Errors.Clear()
+        return errors
+
     def printADOerrors(self):
         print('ADO Errors (%i):' % self.adoConn.Errors.Count)
         for e in self.adoConn.Errors:
@@ -423,11 +1252,7 @@ class Connection(object):
         Error 40002 is a transactional integrity error.
         """
         if self.adoConn is not None:
-            for e in self.adoConn.Errors:
-                state = str(e.SQLState)
-                if state.startswith('23') or state == '40002':
-                    return IntegrityError
-
+            return _error_class(str(e.SQLState) for e in self.adoConn.Errors)
         return DatabaseError
 
     def __del__(self):
@@ -438,6 +1263,31 @@ class Connection(object):
         self.adoConn = None
 
 
+def _error_class(sql_states):
+    """Return the error class for the SQLState of the ADO errors. See _suggest_error_class."""
+    for state in sql_states:
+        if state.startswith('23') or state == '40002':
+            return IntegrityError
+    return DatabaseError
+
+
+def _next_open_recordset(recordset):
+    """
+    Return recordset, or the first open recordset after it. Statements that
+    return no rows, such as an UPDATE without SET NOCOUNT ON, produce a
+    closed recordset.
+    """
+    while recordset is not None and recordset.State == adStateClosed:
+        recordset = recordset.NextRecordset()[0]
+    return recordset
+
+
+# The results of one statement of Cursor.execute_batch. rowcount is the
+# number of rows the statement returned or affected. description and rows
+# are those of the first result set of the statement, or None.
+BatchResult = namedtuple('BatchResult', ['rowcount', 'description', 'rows'])
+
+
 class Cursor(object):
     # This read-only attribute is a sequence of 7-item sequences.
     # Each of these sequences contains information describing one result column:
@@ -445,7 +1295,12 @@ class Cursor(object):
     # This attribute will be None for operations that do not return rows or if the
     # cursor has not had an operation invoked via the executeXXX() method yet.
     # The type_code can be interpreted by comparing it to the Type Objects specified in the section below.
-    description = None
+    # The display_size is always None.
+    @property
+    def description(self):
+        if self._description is _unread:
+            self._description = self._read_description()
+        return self._description
 
     # This read-only attribute specifies the number of rows that the last executeXXX() produced
     # (for DQL statements like select) or affected (for DML statements like update or insert).
@@ -460,12 +1315,43 @@ class Cursor(object):
     def __init__(self, connection):
         self.messages = []
         self.connection = connection
+        self.cmd = None
+        # The key of self.cmd in the command cache of the connection, while
+        # self.cmd is checked out of it. See _release_command.
+        self._command_key = None
         self.rs = None
-        self.description = None
+        self._description = None
+        # Column types of self.rs, and the position of self.rs in the results
+        # of self.cmd.
+        self._column_types = None
+        self._recordset_index = 0
+        self._converters = None
+        self._pending = None
+        self.return_value = None
+        self.output_parameters = None
+        # The recordset after self.rs, or the error raised moving to it, once
+        # self.rs is exhausted and has been released. See _release_recordset.
+        self._following = None
         self.errorhandler = connection.errorhandler
+        self.fetch_chunk_size = connection.fetch_chunk_size
+        self.cursor_location = connection.cursor_location
+        self.cursor_type = connection.cursor_type
+        self.lock_type = connection.lock_type
+        self.cache_size = connection.cache_size
 
     def __iter__(self):
-        return iter(self.fetchone, None)
+        """
+        Lazily yield the rows of the current recordset. Rows are fetched in
+        blocks of fetch_chunk_size (or arraysize, if larger) so only one
+        block is held in memory at a time.
+        """
+        size = max(self.arraysize, self.fetch_chunk_size)
+        while True:
+            rows = self.fetchmany(size)
+            if not rows:
+                return
+            for row in rows:
+                yield row
 
     def __enter__(self):
         "Allow database cursors to be used with context managers."
@@ -487,40 +1373,95 @@ class Cursor(object):
             eh = standardErrorHandler
         eh(self.connection, self, errorclass, errorvalue)
 
-    def _description_from_recordset(self, recordset):
+    def _description_from_recordset(self, recordset, index=0):
+        """
+        Make recordset, the index'th result set of the command, the current
+        recordset. Only the column types are read now, for the converters.
+        The rest of the description is read when it is first used.
+        """
+        self._following = None
         # Abort if closed or no recordset.
         if (recordset is None) or (recordset.State == adStateClosed):
             self.rs = None
-            self.description = None
+            self._description = None
+            self._column_types = None
+            self._converters = None
             return
 
         # Since we use a forward-only cursor, rowcount will always return -1
         self.rowcount = -1
         self.rs = recordset
-        desc = list()
-
-        for f in self.rs.Fields:
-            display_size = None
-            if not(self.rs.EOF or self.rs.BOF):
-                display_size = f.ActualSize
-
-            null_ok = bool(f.Attributes & adFldMayBeNull)
-
-            desc.append(
-                (f.Name, f.Type, display_size, f.DefinedSize, f.Precision, f.NumericScale, null_ok)
-            )
-
-        self.description = desc
+        # Buffer as many rows as are fetched per round trip. ADO defaults to 1.
+        self.rs.CacheSize = self.cache_size or max(self.arraysize, self.fetch_chunk_size)
+        self._recordset_index = index
+        self._column_types = tuple(f.Type for f in self.rs.Fields)
+        self._converters = [_column_converter(t) for t in self._column_types]
+        self._description = _unread
+
+    def _read_description(self):
+        """
+        Return the description of the current recordset, from the cache if
+        the command returned a result set of the same columns before. The
+        same command text, such as the name of a procedure, may return other
+        columns, so their names and sizes are part of the key. Connections
+        not opened by connect() have no connection_key and are not cached.
+        """
+        key = None
+        if self.cmd is not None and self.connection.connection_key is not None:
+            columns = tuple((f.Name, f.DefinedSize) for f in self.rs.Fields)
+            key = (self.connection.connection_key, self.cmd.CommandText, self._recordset_index,
+                   self._column_types, columns)
+            description = _descriptions.get(key)
+            if description is not None:
+                return list(description)
+
+        description = tuple(
+            (f.Name, ado_type, None, f.DefinedSize, f.Precision, f.NumericScale,
+             bool(f.Attributes & adFldMayBeNull))
+            for f, ado_type in zip(self.rs.Fields, self._column_types)
+        )
+        if key is not None:
+            if len(_descriptions) >= _max_descriptions:
+                _descriptions.clear()
+            _descriptions[key] = description
+        return list(description)
 
     def close(self):
         """Close the cursor."""
         self.messages = []
+        if self._description is _unread:
+            self._description = None
+        self._close_recordsets()
+        self._release_command()
         self.connection = None
+
+    def _close_recordsets(self):
+        """Close the current recordset and the one following it, if open."""
+        if self._following is not None:
+            following = self._following[0]
+            if following is not None and following.State != adStateClosed:
+                following.Close()
+            self._following = None
         if self.rs and self.rs.State != adStateClosed:
             self.rs.Close()
             self.rs = None
 
+    def _release_command(self):
+        """
+        Check self.cmd back into the command cache, once the results of its
+        last execution are no longer read.
+        """
+        key, self._command_key = self._command_key, None
+        if key is None or self.connection is None:
+            return
+        # The Command is reused as soon as it is checked in
+        self._close_recordsets()
+        cache = self.connection.command_cache
+        if cache is not None:
+            cache.release(key, self.cmd)
+
     def _new_command(self, command_type=adCmdText):
+        self._release_command()
         self.cmd = None
         self.messages = []
 
@@ -528,34 +1469,141 @@ class Cursor(object):
             self._raiseCursorError(InterfaceError, None)
             return
 
-        # Inner import to make this module importable on non-Windows platforms.
-        import win32com.client
-
         try:
-            self.cmd = win32com.client.Dispatch("ADODB.Command")
+            self.cmd = _dispatch("ADODB.Command")
             self.cmd.ActiveConnection = self.connection.adoConn
             self.cmd.CommandTimeout = self.connection.adoConn.CommandTimeout
             self.cmd.CommandType = command_type
         except:
             self._raiseCursorError(DatabaseError, None)
 
-    def _execute_command(self):
+    def _execute_command(self, skip_closed=False):
         # Sprocs may have an integer return value
         self.return_value = None
+        self.output_parameters = None
 
         try:
-            recordset = self.cmd.Execute()
+            recordset = self._open_recordset()
             self.rowcount = recordset[1]
+            if skip_closed:
+                recordset = (_next_open_recordset(recordset[0]),)
             self._description_from_recordset(recordset[0])
         except Exception as e:
-            _message = ""
-            if hasattr(e, 'args'):
-                _message += str(e.args) + "\n"
-            _message += "Command:\n{}\nParameters:\n{}".format(
-                self.cmd.CommandText, format_parameters(self.cmd.Parameters, True)
-            )
+            self._raiseCommandError(e)
+
+    def _open_recordset(self):
+        """
+        Execute the command and return the (recordset, records affected)
+        tuple of Command.Execute. A recordset with another cursor location,
+        cursor type or lock type than Command.Execute opens is opened with
+        Recordset.Open, which does not report the records affected.
+        """
+        self.connection.release_exhausted_recordset(self)
+        if (self.cursor_type == adOpenForwardOnly and self.lock_type == adLockReadOnly and
+                self.cursor_location == self.connection.cursor_location):
+            return self.cmd.Execute()
+        recordset = _dispatch('ADODB.Recordset')
+        recordset.CursorLocation = self.cursor_location
+        recordset.CacheSize = self.cache_size or max(self.arraysize, self.fetch_chunk_size)
+        recordset.Open(self.cmd, CursorType=self.cursor_type, LockType=self.lock_type)
+        return recordset, -1
+
+    def _exhausted(self):
+        """
+        Note that the forward-only current recordset has no more rows. On a
+        connection without MARS it is released before the connection runs
+        another statement, see Connection.release_exhausted_recordset.
+        """
+        if self.cursor_type == adOpenForwardOnly and not self.connection.uses_mars:
+            self.connection._exhausted_cursors.add(self)
+
+    def _release_recordset(self):
+        """
+        Move past the exhausted current recordset, so the server can free it
+        and the connection can run other statements. nextset continues from
+        the recordset that follows it. An error raised moving on is raised
+        again by nextset, where it would have been raised before.
+        """
+        if (self._following is not None or self.rs is None or self.rs.State == adStateClosed or
+                not self.rs.EOF):
+            return
+        # The fields of a released recordset can no longer be read, so the
+        # description is read now, in case it is only asked for later.
+        self.description
+        try:
+            self._following = (self.rs.NextRecordset()[0], None)
+        except Exception as e:
+            self._following = (None, e)
+
+    def _next_recordset(self):
+        """
+        Return the recordset after the current one. An error raised by the
+        statement that produces it is raised as a command error.
+        """
+        following, self._following = self._following, None
+        try:
+            if following is None:
+                return self.rs.NextRecordset()[0]
+            recordset, error = following
+            if error is not None:
+                raise error
+            return recordset
+        except Exception as e:
+            self._raiseCommandError(e)
+
+    def _start_command(self):
+        """
+        Start executing the command without waiting for it to complete.
+        _finish_command must be called once it has, before the results can
+        be fetched.
+        Asynchronous commands always open the cursor of Command.Execute.
+        """
+        self.return_value = None
+        self.output_parameters = None
+        self._pending = None
+        self.connection.release_exhausted_recordset(self)
+        try:
+            self._pending = self.cmd.Execute(Options=adAsyncExecute)
+        except Exception as e:
+            self._raiseCommandError(e)
+
+    def _finish_command(self, errors=()):
+        """
+        Load the results of the command started with _start_command, once
+        it has completed.
+
+        errors -- The (SQLState, Description) of the errors the command
+            left on the connection. A failed asynchronous command does not
+            raise, it only leaves its errors on the connection.
+        """
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        if errors:
+            self._raiseCommandError(DatabaseError('\n'.join(description for state, description in errors)),
+                                    _error_class(state for state, description in errors))
+            return
+        # The count returned by Execute is not final for an asynchronous
+        # command, and the final one is not available once it completes.
+        recordset = pending[0]
+        try:
+            self.rowcount = -1
+            self._description_from_recordset(recordset)
+        except Exception as e:
+            self._raiseCommandError(e)
+
+    def _raiseCommandError(self, e, klass=None):
+        _message = ""
+        if hasattr(e, 'args'):
+            _message += str(e.args) + "\n"
+        _message += "Command:\n{}\nParameters:\n{}".format(
+            self.cmd.CommandText, format_parameters(self.cmd.Parameters, True)
+        )
+        if klass is None:
             klass = self.connection._suggest_error_class()
-            self._raiseCursorError(klass, _message)
+        # The error may have rolled back the transaction on the server
+        self.connection._transaction_level_unknown = True
+        self._raiseCursorError(klass, _message)
 
     def callproc(self, procname, parameters=None):
         """Call a stored database procedure with the given name.
@@ -568,90 +1616,200 @@ class Cursor(object):
 
         The sproc may also provide a result set as output,
         which is available through the standard .fetch*() methods.
+        Further result sets are reached with .nextset(). Result sets of
+        statements that return no rows are skipped.
 
         Extension: A "return_value" property may be set on the
         cursor if the sproc defines an integer return value.
+
+        SQL Server sends the return value and output parameters after
+        the result sets, so when the sproc returns result sets they are
+        only known once .nextset() has returned None. The cursor's
+        "return_value" and "output_parameters" are updated then.
         """
         self._new_command(adCmdStoredProc)
         self.cmd.CommandText = procname
-        self.cmd.Parameters.Refresh()
+        cached = self._load_procedure_parameters(procname)
 
         try:
             # Return value is 0th ADO parameter. Skip it.
             for i, p in enumerate(tuple(self.cmd.Parameters)[1:]):
-                _configure_parameter(p, parameters[i])
+                _configure_parameter(p, parameters[i], self.connection.typed_parameters)
         except:
             _message = 'Converting Parameter %s: %s, %s\n' %\
                 (p.Name, ado_type_name(p.Type), repr(parameters[i]))
 
             self._raiseCursorError(DataError, _message)
 
-        self._execute_command()
+        try:
+            self._execute_command(skip_closed=True)
+        except DatabaseError:
+            if cached:
+                # The procedure may have been altered since it was cached
+                procedure_parameter_cache.clear(self.connection.connection_key, procname)
+            raise
+        return self._read_procedure_outputs()
+
+    def _load_procedure_parameters(self, procname):
+        """
+        Add the parameters of procname to the command, from the
+        procedure_parameter_cache if the connection uses it. Return True if
+        they came from the cache.
+        """
+        if not self.connection.cache_procedure_parameters:
+            self.cmd.Parameters.Refresh()
+            return False
+
+        key = self.connection.connection_key
+        parameters = procedure_parameter_cache.get(key, procname)
+        if parameters is None:
+            self.cmd.Parameters.Refresh()
+            procedure_parameter_cache.put(key, procname, self.cmd.Parameters)
+            return False
+
+        for name, ado_type, direction, size, precision, scale in parameters:
+            p = self.cmd.CreateParameter(name, ado_type, direction, size)
+            p.Precision = precision
+            p.NumericScale = scale
+            self.cmd.Parameters.Append(p)
+        return True
 
+    def _read_procedure_outputs(self):
+        """Set return_value and output_parameters from the stored procedure command."""
         p_return_value = self.cmd.Parameters(0)
         self.return_value = _convert_to_python(p_return_value.Value, p_return_value.Type)
 
-        return [_convert_to_python(p.Value, p.Type)
+        self.output_parameters = [_convert_to_python(p.Value, p.Type)
             for p in tuple(self.cmd.Parameters)[1:]]
+        return self.output_parameters
 
     def execute(self, operation, parameters=None):
         """Prepare and execute a database operation (query or command).
 
         Return value is not defined.
+
+        If the connection has a command_cache, the ADO Command for the final
+        SQL text and parameter types is prepared once and reused by later
+        executions, which only rebind the parameter values.
         """
-        self._new_command()
+        self._prepare(operation, parameters)
+        self._execute_command()
 
+    def _prepare(self, operation, parameters=None):
+        """Set self.cmd to a Command for operation with parameters bound."""
+        self._release_command()
         if parameters is None:
             parameters = list()
 
+        if self.connection is not None:
+            typed = self.connection.typed_parameters
+            stable = self.connection.stable_sql_text
+        else:
+            typed = stable = False
+        # With stable_sql_text, None is bound with the type last bound at the
+        # same position, so the parameter declarations do not change with the
+        # values. No type converts implicitly to the types of all columns, so
+        # NULL is written into the SQL until a type is known.
+        null_types = self.connection._null_parameter_types.get(operation) if stable else None
+        original_operation = operation
         parameter_replacements = list()
+        bound_parameters = list()
         for i, value in enumerate(parameters):
             if value is None:
-                parameter_replacements.append('NULL')
+                if null_types and i in null_types:
+                    parameter_replacements.append('?')
+                    bound_parameters.append((i, value, null_types[i]))
+                else:
+                    parameter_replacements.append('NULL')
                 continue
 
-            if isinstance(value, six.string_types) and value == "":
+            if isinstance(value, six.string_types) and value == "" and not stable:
                 parameter_replacements.append("''")
                 continue
 
-            # Otherwise, process the non-NULL, non-empty string parameter.
-            parameter_replacements.append('?')
+            if isinstance(value, PackedArray):
+                # The SELECT of the values replaces the marker
+                parameter_replacements.append(value.as_sql('?'))
+                if not value.values:
+                    continue
+                value = value.document()
+            else:
+                # Otherwise, process the non-NULL, non-empty string parameter.
+                parameter_replacements.append('?')
             try:
-                p = self.cmd.CreateParameter('p%i' % i, _ado_type(value))
+                bound_parameters.append((i, value, _ado_type(value, typed)))
             except KeyError:
                 _message = 'Failed to map python type "%s" to an ADO type' % (value.__class__.__name__,)
                 self._raiseCursorError(DataError, _message)
-            except:
-                _message = 'Creating Parameter p%i, %s' % (i, _ado_type(value))
-                self._raiseCursorError(DataError, _message)
-
-            try:
-                _configure_parameter(p, value)
-                self.cmd.Parameters.Append(p)
-            except Exception:
-                _message = 'Converting Parameter %s: %s, %s\n' %\
-                    (p.Name, ado_type_name(p.Type), repr(value))
-
-                self._raiseCursorError(DataError, _message)
 
-        # Replace params with ? or NULL
-        if parameter_replacements:
-            operation = operation % tuple(parameter_replacements)
+        operation = _rewrite_operation(operation, tuple(parameter_replacements))
 
-        # Django will pass down many '%%' values. Need to convert these back to
-        # a single '%'. This will break raw SQL that includes '%%' as part of an
-        # inlined value. Those queries should use params.
-        operation = operation.replace('%%', '%')
-
-        self.cmd.CommandText = operation
-        self._execute_command()
+        cache = self.connection.command_cache if self.connection is not None else None
+        parameter_types = tuple(ado_type for i, value, ado_type in bound_parameters)
+        if cache is not None and adBinary not in parameter_types:
+            # Binary values are written with AppendChunk, which cannot be
+            # rebound on a reused Command.
+            cache_key = (operation, parameter_types)
+            cmd = cache.get(cache_key)
+        else:
+            cache_key = cmd = None
+
+        if cmd is not None:
+            self.messages = []
+            self.cmd = cmd
+            self._command_key = cache_key
+            for p, (i, value, ado_type) in zip(self.cmd.Parameters, bound_parameters):
+                try:
+                    _configure_parameter(p, value, typed)
+                    if stable:
+                        _stabilize_parameter(p)
+                except Exception:
+                    _message = 'Converting Parameter %s: %s, %s\n' %\
+                        (p.Name, ado_type_name(p.Type), repr(value))
+
+                    self._raiseCursorError(DataError, _message)
+        else:
+            self._new_command()
+            for i, value, ado_type in bound_parameters:
+                try:
+                    p = self.cmd.CreateParameter('p%i' % i, ado_type)
+                except:
+                    _message = 'Creating Parameter p%i, %s' % (i, ado_type)
+                    self._raiseCursorError(DataError, _message)
+
+                try:
+                    _configure_parameter(p, value, typed)
+                    if stable:
+                        _stabilize_parameter(p)
+                    self.cmd.Parameters.Append(p)
+                except Exception:
+                    _message = 'Converting Parameter %s: %s, %s\n' %\
+                        (p.Name, ado_type_name(p.Type), repr(value))
+
+                    self._raiseCursorError(DataError, _message)
+
+            self.cmd.CommandText = operation
+            if cache_key is not None and cache_key not in cache:
+                self.cmd.Prepared = True
+                cache.put(cache_key, self.cmd)
+                self._command_key = cache_key
+
+        if stable:
+            self.connection._remember_parameter_types(original_operation, self.cmd.Parameters,
+                                                      bound_parameters)
 
     def executemany(self, operation, seq_of_parameters):
-        """Execute the given command against all parameter sequences or mappings given in seq_of_parameters."""
+        """Execute the given command against all parameter sequences or mappings given in seq_of_parameters.
+
+        A single row "INSERT ... VALUES (...)" is sent as multi-row INSERT
+        statements, each holding as many parameter sequences as SQL Server
+        allows, instead of one round trip per parameter sequence.
+        """
         self.messages = list()
+        seq_of_parameters = list(seq_of_parameters)
         total_recordcount = 0
 
-        for params in seq_of_parameters:
+        for operation, params in self._executemany_batches(operation, seq_of_parameters):
             self.execute(operation, params)
 
             if self.rowcount == -1:
@@ -662,6 +1820,95 @@ class Cursor(object):
 
         self.rowcount = total_recordcount
 
+    def _executemany_batches(self, operation, seq_of_parameters):
+        """
+        Yield (operation, parameters) pairs that executemany must execute
+        for seq_of_parameters.
+        """
+        match = _re_insert_values.match(operation) if len(seq_of_parameters) > 1 else None
+        if match:
+            row = match.group('row')
+            row_size = row.count('%s')
+            if '%s' in match.group('insert') or any(len(params) != row_size for params in seq_of_parameters):
+                match = None
+
+        if not match:
+            for params in seq_of_parameters:
+                yield operation, params
+            return
+
+        batch_size = min(_max_insert_rows, _max_parameters // row_size) if row_size else _max_insert_rows
+        for start in range(0, len(seq_of_parameters), batch_size):
+            batch = seq_of_parameters[start:start + batch_size]
+            yield (
+                match.group('insert') + ', '.join([row] * len(batch)),
+                [value for params in batch for value in params],
+            )
+
+    def execute_batch(self, statements):
+        """
+        Execute independent statements with one command per batch of
+        statements and return a BatchResult for each, in order.
+
+        statements -- A sequence of (operation, parameters) tuples. As with
+            execute, '%' must be written as '%%' in operations that have
+            parameters.
+
+        Statements are grouped into as few commands as the 2100 parameter
+        limit allows. Each statement is followed by a SELECT of @@ROWCOUNT,
+        which marks where its results end.
+        """
+        self.messages = list()
+        results = []
+        for operations, parameters in self._batch_commands(statements):
+            sql = 'SET NOCOUNT ON;\n{0};\nSET NOCOUNT OFF'.format(';\n'.join(operations))
+            self.execute(sql, parameters)
+            results.extend(self._batch_results())
+        self.rowcount = -1
+        return results
+
+    def _batch_commands(self, statements):
+        """Yield the (operations, parameters) of each command of execute_batch."""
+        operations = []
+        parameters = []
+        for operation, params in statements:
+            operation = operation.strip().rstrip(';')
+            if params:
+                params = list(params)
+            else:
+                # Operations without parameters are not formatted by execute
+                operation = operation.replace('%', '%%')
+                params = []
+            if operations and len(parameters) + len(params) > _max_parameters:
+                yield operations, parameters
+                operations = []
+                parameters = []
+            operations.append(operation)
+            operations.append(_batch_rowcount_sql)
+            parameters.extend(params)
+        if operations:
+            yield operations, parameters
+
+    def _batch_results(self):
+        """Read the recordsets of an execute_batch command, one BatchResult per statement."""
+        results = []
+        description = rows = None
+        recordset = self.rs
+        index = 0
+        while recordset is not None:
+            if self.description is not None:
+                if self.description[0][0] == _batch_rowcount_column and len(self.description) == 1:
+                    rowcount, = self.fetchone()
+                    results.append(BatchResult(rowcount, description, rows))
+                    description = rows = None
+                elif description is None:
+                    description = self.description
+                    rows = self.fetchall()
+            recordset = self._next_recordset()
+            index += 1
+            self._description_from_recordset(recordset, index)
+        return results
+
     def _fetch(self, rows=None):
         """Fetch rows from the current recordset.
 
@@ -671,7 +1918,10 @@ class Cursor(object):
             self._raiseCursorError(FetchFailedError, 'Attempting to fetch from a closed connection or empty record set')
             return
 
-        if self.rs.State == adStateClosed or self.rs.BOF or self.rs.EOF:
+        if (self._following is not None or self.rs.State == adStateClosed or
+                self.rs.BOF or self.rs.EOF):
+            if self._following is None and self.rs.State != adStateClosed and self.rs.EOF:
+                self._exhausted()
             if rows == 1: # fetchone returns None
                 return None
             else: # fetchall and fetchmany return empty lists
@@ -682,12 +1932,10 @@ class Cursor(object):
         else:
             ado_results = self.rs.GetRows()
 
-        py_columns = list()
-        column_types = [column_desc[1] for column_desc in self.description]
-        for ado_type, column in zip(column_types, ado_results):
-            py_columns.append([_convert_to_python(cell, ado_type) for cell in column])
+        if self.rs.EOF:
+            self._exhausted()
 
-        return tuple(zip(*py_columns))
+        return _rows_from_columns(ado_results, self._converters)
 
     def fetchone(self):
         """
@@ -729,11 +1977,17 @@ class Cursor(object):
             self._raiseCursorError(Error, None)
             return None
 
-        recordset = self.rs.NextRecordset()[0]
+        recordset = self._next_recordset()
+        procedure = self.cmd.CommandType == adCmdStoredProc
+        if procedure:
+            recordset = _next_open_recordset(recordset)
         if recordset is None:
+            if procedure:
+                self._read_procedure_outputs()
+            self._release_command()
             return None
 
-        self._description_from_recordset(recordset)
+        self._description_from_recordset(recordset, self._recordset_index + 1)
         return True
 
     def setinputsizes(self, sizes):
@@ -788,6 +2042,10 @@ def _convert_to_python(variant, adType):
     return _variantConversions[adType](variant)
 
 
+def _cvtIdentity(variant):
+    return variant
+
+
 def _cvtDecimal(variant):
     return _convertNumberWithCulture(variant, decimal.Decimal)
 
@@ -846,13 +2104,49 @@ _variantConversions = MultiMap(
         adoIntegerTypes: int,
         adoBinaryTypes: six.memoryview,
     },
-    lambda x: x)
+    _cvtIdentity)
+
+# pythoncom already returns these as the expected Python type, so fetched
+# columns of these types are used without any per-cell conversion.
+_fetchIdentityTypes = frozenset(adoStringTypes + adoIntegerTypes)
+
+
+def _column_converter(adType):
+    """
+    Return the conversion function for a fetched column of adType, or None
+    when the column values can be used as returned by ADO.
+    """
+    if adType in _fetchIdentityTypes:
+        return None
+    convert = _variantConversions[adType]
+    if convert is _cvtIdentity:
+        return None
+    return convert
+
+
+def _rows_from_columns(ado_results, converters):
+    """
+    Convert the column-major result of Recordset.GetRows to a tuple of rows.
+
+    converters is a list with one entry per column, as returned by
+    _column_converter. Each column is converted as a whole before the
+    columns are transposed in to rows.
+    """
+    py_columns = list()
+    for convert, column in zip(converters, ado_results):
+        if convert is not None:
+            column = [None if cell is None else convert(cell) for cell in column]
+        py_columns.append(column)
+
+    return tuple(zip(*py_columns))
 
 
 # Mapping Python data types to ADO type codes
-def _ado_type(data):
+def _ado_type(data, typed=False):
     if isinstance(data, six.string_types):
         return adVarWChar
+    if typed:
+        return _typed_map_to_adotype[type(data)]
     return _map_to_adotype[type(data)]
 
 _map_to_adotype = {
@@ -872,3 +2166,9 @@ if six.PY3:
 
 if six.PY2:
     _map_to_adotype[long] = adBigInt
+
+_typed_map_to_adotype = dict(_map_to_adotype)
+_typed_map_to_adotype.update({
+    decimal.Decimal: adNumeric,
+    datetime.datetime: adDBTimeStamp,
+})
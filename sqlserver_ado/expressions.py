@@ -3,9 +3,23 @@ This file contains Microsoft SQL Server specific aggregates and overrides for
 the default Django aggregates.
 """
 
+import re
+
 from django.db.models.aggregates import Avg, StdDev, Variance
 from django.db.models.expressions import Value
 from django.db.models.functions import Length, Substr
+from django.db.models.lookups import In
+from django.utils import six
+
+from . import dbapi as Database
+from .compiler import _re_data_type_terminator
+
+# Data types whose values compare the same after being shredded from the XML
+# of a PackedArray. Strings are only packed if they fit the length.
+_re_packable_type = re.compile(
+    r'^(?:bigint|int|smallint|tinyint|bit|uniqueidentifier|date|n?(?:var)?char\s*\(\s*(?P<length>\d+|max)\s*\))$',
+    re.IGNORECASE,
+)
 
 
 def as_microsoft(expression):
@@ -56,6 +70,40 @@ def fix_variance_function_name(self, compiler, connection):
 # Expressions
 
 
+# Lookups
+@as_microsoft(In)
+def pack_large_in_list(self, compiler, connection):
+    """
+    Bind a list of values longer than the connection's
+    packed_in_list_threshold as one PackedArray parameter, instead of a
+    parameter per value, so it is not limited to 2100 parameters and the SQL
+    text does not depend on the number of values.
+    """
+    threshold = getattr(connection, 'packed_in_list_threshold', 0)
+    # Bilateral transforms wrap each value in the SQL, which a PackedArray cannot
+    if (threshold and self.rhs_is_direct_value() and len(self.rhs) > threshold and
+            not self.bilateral_transforms):
+        db_type = self.lhs.output_field.db_type(connection)
+        sql_type = _re_data_type_terminator.split(db_type)[0] if db_type else None
+        match = _re_packable_type.match(sql_type) if sql_type else None
+        if match:
+            rhs, rhs_params = self.batch_process_rhs(compiler, connection)
+            if _can_pack(rhs_params, match.group('length')):
+                lhs, lhs_params = self.process_lhs(compiler, connection)
+                params = list(lhs_params) + [Database.PackedArray(rhs_params, sql_type)]
+                return '%s IN (%%s)' % lhs, params
+    return self.as_sql(compiler, connection)
+
+
+def _can_pack(values, length):
+    """Return True if the string values fit length and can be written as XML."""
+    if length and length.lower() != 'max':
+        for value in values:
+            if isinstance(value, six.string_types) and len(value) > int(length):
+                return False
+    return Database.can_write_xml(values)
+
+
 # Functions
 @as_microsoft(Length)
 def fix_length_function_name(self, compiler, connection):
@@ -18,6 +18,9 @@ class DatabaseFeatures(BaseDatabaseFeatures):
     supports_sequence_reset = False
 
     can_return_id_from_insert = True
+    # Django 1.8 does not read this flag; it is only consumed by
+    # sqlserver_ado.models.BulkCreateQuerySet._batched_insert.
+    can_return_ids_from_bulk_insert = True
 
     supports_regex_backreferencing = False
 
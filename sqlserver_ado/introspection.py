@@ -1,5 +1,8 @@
 from __future__ import absolute_import, unicode_literals
 
+from collections import defaultdict
+from contextlib import contextmanager
+
 from django.db.backends.base.introspection import (
     BaseDatabaseIntrospection, FieldInfo, TableInfo
 )
@@ -10,8 +13,182 @@ AUTO_FIELD_MARKER = -1000
 BIG_AUTO_FIELD_MARKER = -1001
 MONEY_FIELD_MARKER = -1002
 
+# The size ADO reports for varchar(max), nvarchar(max) and varbinary(max)
+# columns, whose max_length in the catalog is -1.
+MAX_COLUMN_SIZE = 2147483647
+
+# The columns of tables and views, and the indexes, foreign keys and check
+# constraints of tables, ordered by constraint and column position. The
+# {objects} filter of the object ids is either '= OBJECT_ID(%s)' for one
+# table, or _all_objects for the catalog snapshot.
+_columns_sql = """
+SELECT c.object_id, c.name, COALESCE(bt.name, t.name),
+    CASE WHEN bt.name IN ('nchar', 'nvarchar') AND c.max_length > 0 THEN c.max_length / 2
+    ELSE c.max_length END,
+    c.precision, c.scale, c.is_nullable, c.is_identity
+FROM sys.columns c
+JOIN sys.types t ON t.user_type_id = c.user_type_id
+-- The system type of alias types. CLR types, such as geography, have none.
+LEFT JOIN sys.types bt ON bt.user_type_id = c.system_type_id
+WHERE c.object_id {objects}
+ORDER BY c.object_id, c.column_id"""
+
+_constraints_sql = """
+SELECT i.object_id, 'index', i.name, c.name, i.is_unique, i.is_primary_key, NULL, NULL, ic.key_ordinal, 0
+FROM sys.indexes i
+JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+WHERE i.object_id {objects} AND ic.is_included_column = 0
+UNION ALL
+SELECT fk.parent_object_id, 'foreign_key', fk.name, cc.name, 0, 0, rt.name, rc.name,
+    fkc.constraint_column_id, ri.is_primary_key
+FROM sys.foreign_keys fk
+JOIN sys.foreign_key_columns fkc ON fkc.constraint_object_id = fk.object_id
+JOIN sys.columns cc ON cc.object_id = fkc.parent_object_id AND cc.column_id = fkc.parent_column_id
+JOIN sys.tables rt ON rt.object_id = fk.referenced_object_id
+JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id
+JOIN sys.indexes ri ON ri.object_id = fk.referenced_object_id AND ri.index_id = fk.key_index_id
+WHERE fk.parent_object_id {objects}
+UNION ALL
+SELECT OBJECT_ID(QUOTENAME(kc.TABLE_SCHEMA) + '.' + QUOTENAME(kc.TABLE_NAME)), 'check',
+    kc.CONSTRAINT_NAME, kc.COLUMN_NAME, 0, 0, NULL, NULL, 0, 0
+FROM INFORMATION_SCHEMA.CONSTRAINT_COLUMN_USAGE AS kc
+JOIN INFORMATION_SCHEMA.TABLE_CONSTRAINTS AS c ON
+    kc.TABLE_SCHEMA = c.TABLE_SCHEMA AND
+    kc.TABLE_NAME = c.TABLE_NAME AND
+    kc.CONSTRAINT_NAME = c.CONSTRAINT_NAME
+WHERE c.CONSTRAINT_TYPE = 'CHECK'
+    AND OBJECT_ID(QUOTENAME(kc.TABLE_SCHEMA) + '.' + QUOTENAME(kc.TABLE_NAME)) {objects}
+ORDER BY 1, 2, 3, 9"""
+
+# (column, referenced table, referenced column) of the foreign keys that
+# reference a primary key, in the order of _constraints_sql
+_key_columns_sql = """
+SELECT cc.name, rt.name, rc.name
+FROM sys.foreign_keys fk
+JOIN sys.foreign_key_columns fkc ON fkc.constraint_object_id = fk.object_id
+JOIN sys.columns cc ON cc.object_id = fkc.parent_object_id AND cc.column_id = fkc.parent_column_id
+JOIN sys.tables rt ON rt.object_id = fk.referenced_object_id
+JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id
+JOIN sys.indexes ri ON ri.object_id = fk.referenced_object_id AND ri.index_id = fk.key_index_id
+WHERE fk.parent_object_id = OBJECT_ID(%s) AND ri.is_primary_key = 1
+ORDER BY fk.name, fkc.constraint_column_id"""
+
+_one_object = '= OBJECT_ID(%s)'
+_all_objects = "IN (SELECT object_id FROM sys.objects WHERE type IN ('U', 'V'))"
+
+
+def _add_constraint(constraints, kind, name, column, unique, primary_key, ref_table, ref_column):
+    """Add a row of _constraints_sql to the get_constraints dict constraints."""
+    if name not in constraints:
+        constraints[name] = {
+            "columns": [],
+            "primary_key": bool(primary_key),
+            "unique": bool(unique),
+            "index": kind == 'index',
+            "check": kind == 'check',
+            # The first referenced column
+            "foreign_key": (ref_table, ref_column) if kind == 'foreign_key' else None,
+        }
+    constraints[name]['columns'].append(column)
+
+
+def _add_index(indexes, column, unique, primary_key):
+    """
+    Add a single column index to the get_indexes dict indexes. A column may
+    be the key of several indexes, such as a primary key and a non-unique
+    index, so the flags of all of them are combined.
+    """
+    index = indexes.setdefault(column.lower(), {"primary_key": False, "unique": False})
+    index["primary_key"] = index["primary_key"] or bool(primary_key)
+    index["unique"] = index["unique"] or bool(unique)
+
+
+class CatalogSnapshot(object):
+    """
+    The tables, views, columns and constraints of the whole database, read
+    with three queries. DatabaseIntrospection serves its methods from a
+    snapshot inside catalog_snapshot(), or with the use_catalog_snapshot
+    option.
+
+    Tables are looked up by name, ignoring case. When tables of several
+    schemas share a name, the one in the default schema is used, as
+    OBJECT_ID does.
+    """
+    def __init__(self, cursor):
+        self.tables = []
+        self._object_ids = {}
+        # Rows of _columns_sql without the object id, by object id
+        self.columns = defaultdict(list)
+        # get_constraints dicts and (column, referenced table, referenced
+        # column) of foreign keys that reference a primary key, by object id
+        self.constraints = defaultdict(dict)
+        self.key_columns = defaultdict(list)
+
+        cursor.execute("""
+SELECT o.object_id, o.name, o.type
+FROM sys.objects o
+WHERE o.type IN ('U', 'V')
+ORDER BY CASE WHEN o.schema_id = SCHEMA_ID() THEN 1 ELSE 0 END""")
+        names = set()
+        for object_id, name, object_type in cursor.fetchall():
+            self._object_ids[name.lower()] = object_id
+            if name not in names:
+                names.add(name)
+                self.tables.append(TableInfo(name, 't' if object_type.strip() == 'U' else 'v'))
+
+        cursor.execute(_columns_sql.format(objects=_all_objects))
+        for row in cursor.fetchall():
+            self.columns[row[0]].append(row[1:])
+
+        cursor.execute(_constraints_sql.format(objects=_all_objects))
+        for row in cursor.fetchall():
+            object_id, kind, name, column, unique, primary_key, ref_table, ref_column, position, ref_primary_key = row
+            _add_constraint(self.constraints[object_id], kind, name, column, unique, primary_key,
+                            ref_table, ref_column)
+            if kind == 'foreign_key' and ref_primary_key:
+                self.key_columns[object_id].append((column, ref_table, ref_column))
+
+    def object_id(self, table_name):
+        """Return the object id of table_name, or None if there is no such table or view."""
+        return self._object_ids.get(table_name.lower())
+
 
 class DatabaseIntrospection(BaseDatabaseIntrospection):
+    def __init__(self, connection):
+        super(DatabaseIntrospection, self).__init__(connection)
+        # Serve every method from a CatalogSnapshot. Set from the
+        # use_catalog_snapshot option, and by catalog_snapshot().
+        self.use_catalog_snapshot = False
+        self._snapshot = None
+
+    @contextmanager
+    def catalog_snapshot(self):
+        """
+        Serve introspection from a snapshot of the whole catalog inside the
+        block. The snapshot is read on first use, and read again after the
+        schema editor runs a statement.
+        """
+        use_catalog_snapshot, self.use_catalog_snapshot = self.use_catalog_snapshot, True
+        try:
+            yield
+        finally:
+            self.use_catalog_snapshot = use_catalog_snapshot
+            if not use_catalog_snapshot:
+                self._snapshot = None
+
+    def clear_catalog_snapshot(self):
+        """Forget the catalog snapshot, so that it is read again on next use."""
+        self._snapshot = None
+
+    def _catalog(self, cursor):
+        """Return the CatalogSnapshot to serve from, or None."""
+        if not self.use_catalog_snapshot:
+            return None
+        if self._snapshot is None:
+            self._snapshot = CatalogSnapshot(cursor)
+        return self._snapshot
+
     def get_field_type(self, data_type, description):
         field_type = self.data_types_reverse[data_type]
         if (field_type == 'CharField' and description.internal_size is not None and description.internal_size > 8000):
@@ -20,6 +197,9 @@ class DatabaseIntrospection(BaseDatabaseIntrospection):
 
     def get_table_list(self, cursor):
         "Return a list of table and view names in the current database."
+        catalog = self._catalog(cursor)
+        if catalog is not None:
+            return list(catalog.tables)
         cursor.execute("""\
 SELECT TABLE_NAME, 't'
 FROM INFORMATION_SCHEMA.TABLES
@@ -30,30 +210,6 @@ FROM INFORMATION_SCHEMA.VIEWS
 """)
         return [TableInfo(row[0], row[1]) for row in cursor.fetchall()]
 
-    def _is_auto_field(self, cursor, table_name, column_name):
-        """Check if a column is an identity column.
-
-        See: http://msdn2.microsoft.com/en-us/library/ms174968.aspx
-        """
-        sql = "SELECT COLUMNPROPERTY(OBJECT_ID(N'%s'), N'%s', 'IsIdentity')" % \
-            (table_name, column_name)
-
-        cursor.execute(sql)
-        return cursor.fetchone()[0]
-
-    def _get_table_field_type_map(self, cursor, table_name):
-        """
-        Return a dict mapping field name to data type. DB-API cursor description
-        interprets the date columns as chars.
-        """
-        cursor.execute('''
-SELECT [COLUMN_NAME], [DATA_TYPE], [CHARACTER_MAXIMUM_LENGTH]
-FROM INFORMATION_SCHEMA.COLUMNS
-WHERE [TABLE_NAME] LIKE \'%s\'
-        ''' % table_name)
-        results = dict([(c[0], (c[1], c[2])) for c in cursor.fetchall()])
-        return results
-
     def _datatype_to_ado_type(self, datatype):
         """
         Map datatype name to ado type.
@@ -95,32 +251,32 @@ WHERE [TABLE_NAME] LIKE \'%s\'
 
         When a field is found with an IDENTITY property, it is given a custom field number
         of SQL_AUTOFIELD, which maps to the 'AutoField' value in the DATA_TYPES_REVERSE dict.
-        """
-        table_field_type_map = self._get_table_field_type_map(cursor, table_name)
 
-        cursor.execute("SELECT * FROM [%s] where 1=0" % (table_name))
-        columns = cursor.description
+        The columns are read from the catalog with a single query.
+        """
+        catalog = self._catalog(cursor)
+        if catalog is not None:
+            rows = catalog.columns.get(catalog.object_id(table_name), [])
+        else:
+            cursor.execute(_columns_sql.format(objects=_one_object), [table_name])
+            rows = [row[1:] for row in cursor.fetchall()]
 
         items = list()
-        for column in columns:
-            column = list(column) # Convert tuple to list
-            # fix data type
-            data_type, char_length = table_field_type_map.get(column[0])
-            column[1] = self._datatype_to_ado_type(data_type)
-
-            if identity_check and self._is_auto_field(cursor, table_name, column[0]):
-                if column[1] == ado_consts.adBigInt:
-                    column[1] = BIG_AUTO_FIELD_MARKER
+        for name, data_type, size, precision, scale, null_ok, identity in rows:
+            type_code = self._datatype_to_ado_type(data_type)
+            if size == -1:
+                if type_code == ado_consts.adVarWChar:
+                    # treat varchar(max) as text
+                    type_code = self._datatype_to_ado_type('text')
+                size = MAX_COLUMN_SIZE
+
+            if identity_check and identity:
+                if type_code == ado_consts.adBigInt:
+                    type_code = BIG_AUTO_FIELD_MARKER
                 else:
-                    column[1] = AUTO_FIELD_MARKER
-
-            if column[1] == MONEY_FIELD_MARKER:
-                # force decimal_places=4 to match data type. Cursor description thinks this column is a string
-                column[5] = 4
-            elif column[1] == ado_consts.adVarWChar and char_length == -1:
-                # treat varchar(max) as text
-                column[1] = self._datatype_to_ado_type('text')
-            items.append(FieldInfo(*column))
+                    type_code = AUTO_FIELD_MARKER
+
+            items.append(FieldInfo(name, type_code, None, size, precision, scale, bool(null_ok)))
         return items
 
     def _name_to_index(self, cursor, table_name):
@@ -148,45 +304,27 @@ WHERE [TABLE_NAME] LIKE \'%s\'
         """
         # source_field_dict = self._name_to_index(cursor, table_name)
 
-        sql = """
-select
-    COLUMN_NAME = fk_cols.COLUMN_NAME,
-    REFERENCED_TABLE_NAME = pk.TABLE_NAME,
-    REFERENCED_COLUMN_NAME = pk_cols.COLUMN_NAME
-from INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS ref_const
-join INFORMATION_SCHEMA.TABLE_CONSTRAINTS fk
-    on ref_const.CONSTRAINT_CATALOG = fk.CONSTRAINT_CATALOG
-    and ref_const.CONSTRAINT_SCHEMA = fk.CONSTRAINT_SCHEMA
-    and ref_const.CONSTRAINT_NAME = fk.CONSTRAINT_NAME
-    and fk.CONSTRAINT_TYPE = 'FOREIGN KEY'
-
-join INFORMATION_SCHEMA.TABLE_CONSTRAINTS pk
-    on ref_const.UNIQUE_CONSTRAINT_CATALOG = pk.CONSTRAINT_CATALOG
-    and ref_const.UNIQUE_CONSTRAINT_SCHEMA = pk.CONSTRAINT_SCHEMA
-    and ref_const.UNIQUE_CONSTRAINT_NAME = pk.CONSTRAINT_NAME
-    And pk.CONSTRAINT_TYPE = 'PRIMARY KEY'
-
-join INFORMATION_SCHEMA.KEY_COLUMN_USAGE fk_cols
-    on ref_const.CONSTRAINT_NAME = fk_cols.CONSTRAINT_NAME
-
-join INFORMATION_SCHEMA.KEY_COLUMN_USAGE pk_cols
-    on pk.CONSTRAINT_NAME = pk_cols.CONSTRAINT_NAME
-where
-    fk.TABLE_NAME = %s"""
-
-        cursor.execute(sql, [table_name])
-        relations = cursor.fetchall()
+        catalog = self._catalog(cursor)
+        if catalog is not None:
+            return list(catalog.key_columns.get(catalog.object_id(table_name), []))
 
-        key_columns = []
-        key_columns.extend([(source_column, target_table, target_column)
-            for source_column, target_table, target_column in relations])
-        return key_columns
+        cursor.execute(_key_columns_sql, [table_name])
+        return [tuple(row) for row in cursor.fetchall()]
 
     def get_indexes(self, cursor, table_name):
         #    Returns a dictionary of fieldname -> infodict for the given table,
         #    where each infodict is in the format:
         #        {'primary_key': boolean representing whether it's the primary key,
         #         'unique': boolean representing whether it's a unique index}
+        catalog = self._catalog(cursor)
+        if catalog is not None:
+            indexes = dict()
+            constraints = catalog.constraints.get(catalog.object_id(table_name), {})
+            for constraint in constraints.values():
+                if constraint['index'] and len(constraint['columns']) == 1:
+                    _add_index(indexes, constraint['columns'][0], constraint['unique'], constraint['primary_key'])
+            return indexes
+
         sql = """
 select
     C.name as [column_name],
@@ -199,6 +337,7 @@ from
     join sys.indexes IX on IX.object_id = T.object_id and IX.index_id = IC.index_id
 where
     T.name = %s
+    and IC.is_included_column = 0
     -- Omit multi-column keys
     and not exists (
         select *
@@ -214,7 +353,7 @@ where
         indexes = dict()
 
         for column_name, unique, primary_key in constraints:
-            indexes[column_name.lower()] = {"primary_key": primary_key, "unique": unique}
+            _add_index(indexes, column_name, unique, primary_key)
 
         return indexes
 
@@ -262,82 +401,15 @@ where
         Some backends may return special constraint names that don't exist
         if they don't name constraints of a certain type (e.g. SQLite)
         """
-        constraints = dict()
+        catalog = self._catalog(cursor)
+        if catalog is not None:
+            constraints = catalog.constraints.get(catalog.object_id(table_name), {})
+            return dict((name, dict(constraint, columns=list(constraint['columns'])))
+                        for name, constraint in constraints.items())
 
-        # getting indexes (primary keys, unique, regular)
-        sql = """
-        select object_id, name, index_id, is_unique, is_primary_key
-        from sys.indexes where object_id = OBJECT_ID(%s)
-        """
-        cursor.execute(sql, [table_name])
-        for object_id, name, index_id, unique, primary_key in list(cursor.fetchall()):
-            sql = """
-            select name from sys.index_columns ic
-            inner join sys.columns c on ic.column_id = c.column_id and ic.object_id = c.object_id
-            where ic.object_id = %s and ic.index_id = %s
-            """
-            cursor.execute(sql, [object_id, index_id])
-            columns = [row[0] for row in cursor.fetchall()]
-            constraint = {"columns": list(columns),
-                          "primary_key": primary_key,
-                          "unique": unique,
-                          "index": True,
-                          "check": False,
-                          "foreign_key": None,
-                          }
-            constraints[name] = constraint
-
-        # getting foreign keys
-        sql = """
-        select fk.object_id, fk.name, rt.name from sys.foreign_keys fk
-        inner join sys.tables rt on fk.referenced_object_id = rt.object_id
-        where fk.parent_object_id = OBJECT_ID(%s)
-        """
-        cursor.execute(sql, [table_name])
-        for id, name, ref_table_name in list(cursor.fetchall()):
-            sql = """
-            select cc.name, rc.name from sys.foreign_key_columns fkc
-            inner join sys.columns rc on
-                fkc.referenced_object_id = rc.object_id and fkc.referenced_column_id = rc.column_id
-            inner join sys.columns cc on
-                fkc.parent_object_id = cc.object_id and fkc.parent_column_id = cc.column_id
-            where fkc.constraint_object_id = %s
-            """
-            cursor.execute(sql, [id])
-            columns, fkcolumns = zip(*cursor.fetchall())
-            constraint = {"columns": list(columns),
-                          "primary_key": False,
-                          "unique": False,
-                          "index": False,
-                          "check": False,
-                          "foreign_key": (ref_table_name, fkcolumns[0]),
-                          }
-            constraints[name] = constraint
-
-        # get check constraints
-        sql = """
-        SELECT kc.constraint_name, kc.column_name
-        FROM INFORMATION_SCHEMA.CONSTRAINT_COLUMN_USAGE AS kc
-        JOIN INFORMATION_SCHEMA.TABLE_CONSTRAINTS AS c ON
-            kc.table_schema = c.table_schema AND
-            kc.table_name = c.table_name AND
-            kc.constraint_name = c.constraint_name
-        WHERE
-            c.constraint_type = 'CHECK'
-            AND
-            kc.table_name = %s
-        """
-        cursor.execute(sql, [table_name])
-        for constraint, column in list(cursor.fetchall()):
-            if column not in constraints:
-                constraints[constraint] = {
-                    "columns": [],
-                    "primary_key": False,
-                    "unique": False,
-                    "index": False,
-                    "check": True,
-                    "foreign_key": None,
-                }
-            constraints[constraint]['columns'].append(column)
+        cursor.execute(_constraints_sql.format(objects=_one_object), [table_name] * 3)
+        constraints = dict()
+        for row in cursor.fetchall():
+            _add_constraint(constraints, *row[1:8])
 
         return constraints
@@ -1,3 +1,5 @@
 from __future__ import unicode_literals
-from sqlserver_ado.models.manager import RawStoredProcedureManager  # NOQA
-from sqlserver_ado.models.query import RawStoredProcedureQuerySet  # NOQA
+from sqlserver_ado.models.manager import (BulkCreateManager, KeysetManager,  # NOQA
+    QueryHintsManagerMixin, RawStoredProcedureManager)
+from sqlserver_ado.models.query import (BulkCreateQuerySet, KeysetQuerySet,  # NOQA
+    QueryHintsMixin, RawStoredProcedureQuerySet, mssql_hints)
@@ -1,6 +1,7 @@
 from __future__ import unicode_literals
 from django.db.models import Manager
-from sqlserver_ado.models.query import RawStoredProcedureQuerySet
+from sqlserver_ado.models.query import (BulkCreateQuerySet, KeysetQuerySet,
+    RawStoredProcedureQuerySet, mssql_hints)
 
 
 class RawStoredProcedureManager(Manager):
@@ -19,3 +20,33 @@ class RawStoredProcedureManager(Manager):
         """
         return RawStoredProcedureQuerySet(raw_query=proc_name, model=self.model,
             params=params, using=self._db, *args, **kwargs)
+
+
+class KeysetManager(Manager.from_queryset(KeysetQuerySet)):
+    """
+    Adds seek, which pages through the results of a query by the last row of
+    the previous page instead of by OFFSET. See KeysetQuerySet.seek.
+    """
+    pass
+
+
+class BulkCreateManager(Manager.from_queryset(BulkCreateQuerySet)):
+    """
+    Sets the primary keys of the objects created by bulk_create. See
+    BulkCreateQuerySet.
+    """
+    pass
+
+
+class QueryHintsManagerMixin(object):
+    """
+    Manager mixin that adds mssql_hints, which adds SQL Server query and
+    table hints to the queryset of the manager.
+
+        class MyManager(QueryHintsManagerMixin, Manager):
+            pass
+
+        MyModel.objects.mssql_hints('RECOMPILE', tables={MyModel: 'NOLOCK'})
+    """
+    def mssql_hints(self, *options, **kwargs):
+        return mssql_hints(self.get_queryset(), *options, **kwargs)
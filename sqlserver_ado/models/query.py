@@ -1,35 +1,89 @@
 from __future__ import unicode_literals
 
-from django.db import connections
-from django.db.models import sql
-from django.db.models.query import RawQuerySet
+from django.db import InterfaceError, connections
+from django.db.models import Model, Q, sql
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.query import QuerySet, RawQuerySet
+from django.utils import six
 
-from sqlserver_ado.dbapi import FetchFailedError
+from sqlserver_ado.compiler import query_options_context, table_hints_context
 
 __all__ = [
+    'BulkCreateQuerySet',
+    'KeysetQuerySet',
+    'QueryHintsMixin',
     'RawStoredProcedureQuery',
     'RawStoredProcedureQuerySet',
+    'StoredProcedureResultSets',
+    'mssql_hints',
 ]
 
 
 class RawStoredProcedureQuery(sql.RawQuery):
     """
     A single raw SQL stored procedure query
+
+    The return value and output parameters of the stored procedure are set
+    once all of its result sets have been read.
     """
+    def __init__(self, *args, **kwargs):
+        super(RawStoredProcedureQuery, self).__init__(*args, **kwargs)
+        self.return_value = None
+        self.output_parameters = None
+
     def clone(self, using):
         return RawStoredProcedureQuery(self.sql, using, params=self.params)
 
     def __repr__(self):
         return "<RawStoredProcedureQuery: %r %r>" % (self.sql, self.params)
 
+    def __iter__(self):
+        # Execute now, so the columns are known before the first row is read
+        self._execute_query()
+        return self._rows()
+
+    def _rows(self):
+        """Yield the rows of the first result set, then skip any others."""
+        if self.cursor.description is not None:
+            for row in self.cursor:
+                yield row
+            while self.cursor.nextset():
+                pass
+        self._read_outputs()
+
+    def _read_outputs(self):
+        self.return_value = self.cursor.return_value
+        self.output_parameters = self.cursor.output_parameters
+
     def _execute_query(self):
         """
         Execute the stored procedure using callproc, instead of execute.
         """
+        self.return_value = None
+        self.output_parameters = None
         self.cursor = connections[self.using].cursor()
         self.cursor.callproc(self.sql, self.params)
 
 
+class _ResultSetQuery(sql.RawQuery):
+    """
+    The current result set of an executed RawStoredProcedureQuery. It does
+    not own the cursor, so RawQuerySet does not close it.
+    """
+    def __init__(self, procedure_query):
+        super(_ResultSetQuery, self).__init__(
+            procedure_query.sql, procedure_query.using, params=procedure_query.params)
+        self.procedure_query = procedure_query
+
+    def get_columns(self):
+        converter = connections[self.using].introspection.column_name_converter
+        return [converter(column_meta[0])
+                for column_meta in self.procedure_query.cursor.description]
+
+    def __iter__(self):
+        return iter(self.procedure_query.cursor)
+
+
 class RawStoredProcedureQuerySet(RawQuerySet):
     """
     Provides an iterator which converts the results of raw SQL queries into
@@ -47,17 +101,31 @@ class RawStoredProcedureQuerySet(RawQuerySet):
         self.params = params or ()
         self.translations = translations or {}
 
-    def __iter__(self):
-        try:
-            for x in super(RawStoredProcedureQuerySet, self).__iter__():
-                yield x
-        except FetchFailedError:
-            # Stored procedure didn't return a record set
-            pass
-
     def __repr__(self):
         return "<RawStoredProcedureQuerySet: %r %r>" % (self.raw_query, self.params)
 
+    @property
+    def return_value(self):
+        """The return value of the stored procedure, once iteration has finished."""
+        return self.query.return_value
+
+    @property
+    def output_parameters(self):
+        """The output parameters of the stored procedure, once iteration has finished."""
+        return self.query.output_parameters
+
+    def result_sets(self, *models):
+        """
+        Return a StoredProcedureResultSets, which executes the stored
+        procedure once and iterates over all of its result sets.
+
+        models -- The model of each result set, in order. None, or a result
+            set after the last model, gives the rows as tuples. Without
+            models, every result set is loaded as the model of this
+            queryset.
+        """
+        return StoredProcedureResultSets(self, models or None)
+
     @property
     def columns(self):
         """
@@ -69,9 +137,9 @@ class RawStoredProcedureQuerySet(RawQuerySet):
                 self._columns = self.query.get_columns()
             except TypeError:
                 # "'NoneType' object is not iterable" thrown when stored procedure
-                # doesn't return a result set.
-                # no result means no column names, so grab them from the model
-                self._columns = [self.model._meta.pk.db_column]  # [x.db_column for x in self.model._meta.fields]
+                # doesn't return a result set. There are no rows then, so the
+                # columns of the model let the empty result be loaded.
+                self._columns = [f.column for f in self.model._meta.fields]
 
             # Adjust any column names which don't match field names
             for (query_name, model_name) in self.translations.items():
@@ -83,3 +151,221 @@ class RawStoredProcedureQuerySet(RawQuerySet):
                     pass
 
         return self._columns
+
+
+class StoredProcedureResultSets(object):
+    """
+    Iterates over the result sets of a stored procedure, executing it once.
+
+    Each result set is an iterator that streams the rows of the result set,
+    as model instances or tuples. Rows that have not been read when the next
+    result set is requested are skipped, and reading them afterwards raises
+    InterfaceError. return_value and output_parameters are set when the
+    iteration has finished.
+    """
+    def __init__(self, queryset, models=None):
+        self.queryset = queryset
+        self.models = models
+        self.return_value = None
+        self.output_parameters = None
+
+    def __repr__(self):
+        return "<StoredProcedureResultSets: %r %r>" % (self.queryset.raw_query, self.queryset.params)
+
+    def _model(self, index):
+        if self.models is None:
+            return self.queryset.model
+        if index < len(self.models):
+            return self.models[index]
+        return None
+
+    def __iter__(self):
+        qs = self.queryset
+        query = qs.query.clone(qs.db)
+        query._execute_query()
+        cursor = query.cursor
+        # The index of the result set the cursor is on, or None once closed
+        current = [0]
+        try:
+            while cursor.description is not None:
+                index = current[0]
+                model = self._model(index)
+                if model is None:
+                    rows = iter(cursor)
+                else:
+                    rows = iter(RawStoredProcedureQuerySet(
+                        qs.raw_query, model=model, query=_ResultSetQuery(query),
+                        params=qs.params, translations=qs.translations, using=qs.db,
+                    ))
+                yield self._result_set(rows, index, current)
+                current[0] += 1
+                if not cursor.nextset():
+                    break
+            query._read_outputs()
+            self.return_value = query.return_value
+            self.output_parameters = query.output_parameters
+        finally:
+            current[0] = None
+            cursor.close()
+
+    def _result_set(self, rows, index, current):
+        """
+        Yield from rows while the cursor is still on result set `index`.
+        The result sets share the cursor, so an earlier one would otherwise
+        read the rows of the current one.
+        """
+        while True:
+            if current[0] != index:
+                raise InterfaceError(
+                    'Result set %d of %r was read after the next result set was requested' % (
+                        index, self.queryset.raw_query))
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            yield row
+
+
+class BulkCreateQuerySet(QuerySet):
+    """
+    Sets the primary keys of the objects created by bulk_create, in order.
+
+    Django 1.8 does not request the primary keys from the backend, even
+    though the backend can return them for a bulk insert.
+    """
+    def _batched_insert(self, objs, fields, batch_size):
+        if not connections[self.db].features.can_return_ids_from_bulk_insert or \
+                any(obj.pk is not None for obj in objs):
+            return super(BulkCreateQuerySet, self)._batched_insert(objs, fields, batch_size)
+        if not objs:
+            return
+        ops = connections[self.db].ops
+        batch_size = (batch_size or max(ops.bulk_batch_size(fields, objs), 1))
+        for batch in [objs[i:i + batch_size]
+                      for i in range(0, len(objs), batch_size)]:
+            ids = self.model._base_manager._insert(batch, fields=fields,
+                return_id=True, using=self.db)
+            if len(batch) == 1:
+                ids = [ids]
+            for obj, pk in zip(batch, ids):
+                obj.pk = pk
+                obj._state.adding = False
+                obj._state.db = self.db
+
+
+class KeysetQuerySet(QuerySet):
+    """
+    Adds seek, which pages through the results of a query by the ordering
+    values of the last row of the previous page, instead of by OFFSET.
+    """
+    def keyset_ordering(self):
+        """
+        Return the ordering names used by seek. The primary key is added if
+        it is not already part of the ordering, so that the order is total.
+        """
+        if self.query.order_by:
+            ordering = list(self.query.order_by)
+        elif self.query.default_ordering:
+            ordering = list(self.model._meta.ordering)
+        else:
+            ordering = []
+        for name in ordering:
+            if not isinstance(name, six.string_types) or name == '?':
+                raise ValueError('seek requires an ordering of field names, not %r' % (name,))
+        pk_names = ('pk', self.model._meta.pk.name, self.model._meta.pk.attname)
+        if not any(name.lstrip('-') in pk_names for name in ordering):
+            ordering.append('pk')
+        return ordering
+
+    def seek(self, after):
+        """
+        Return the rows that come after `after` in the ordering of the query.
+        Slice the result for the page, e.g. qs.seek(last)[:50].
+
+        after -- The last model instance of the previous page, or a sequence
+            of its values for the names returned by keyset_ordering. None
+            returns the first page.
+
+        The cost of a page does not depend on how deep it is, as long as
+        an index matches the ordering.
+        """
+        ordering = self.keyset_ordering()
+        if after is None:
+            return self.order_by(*ordering)
+        if isinstance(after, Model):
+            values = [_ordering_value(after, name.lstrip('-')) for name in ordering]
+        else:
+            values = list(after)
+        if len(values) != len(ordering):
+            raise ValueError('seek expected %d values for the ordering %r, got %d' % (
+                len(ordering), ordering, len(values)))
+        if any(value is None for value in values):
+            raise ValueError('seek does not support NULL ordering values')
+
+        # (a, b) > (x, y) becomes a > x OR (a = x AND b > y). The leading
+        # a >= x is redundant, but lets SQL Server seek on an index of a.
+        equal = {}
+        seek = Q()
+        for name, value in zip(ordering, values):
+            lookup = name[1:] + '__lt' if name.startswith('-') else name + '__gt'
+            seek |= Q(**dict(equal, **{lookup: value}))
+            equal[name.lstrip('-')] = value
+        if len(ordering) > 1:
+            first = ordering[0]
+            bound = first[1:] + '__lte' if first.startswith('-') else first + '__gte'
+            seek &= Q(**{bound: values[0]})
+        return self.order_by(*ordering).filter(seek)
+
+
+def _ordering_value(obj, name):
+    """Return the value of the ordering name, which may span relations, for obj."""
+    value = obj
+    for part in name.split(LOOKUP_SEP):
+        value = getattr(value, part)
+    if isinstance(value, Model):
+        raise ValueError(
+            'seek cannot order by the relation %r, order by its column instead' % name)
+    return value
+
+
+def mssql_hints(queryset, *options, **kwargs):
+    """
+    Return a copy of queryset with SQL Server query and table hints, which
+    are added to the hints already on the queryset.
+
+    options -- Query hints for the OPTION clause, such as 'RECOMPILE',
+        'OPTIMIZE FOR UNKNOWN', 'MAXDOP 1' or 'FAST 10'.
+    tables -- A dict of table hints, such as 'NOLOCK' or 'READPAST', by
+        model or table name. A single hint may be given as a string.
+
+    Hints are included in the SQL as given, so they must not contain user
+    input.
+    """
+    tables = kwargs.pop('tables', None) or {}
+    if kwargs:
+        raise TypeError('mssql_hints() got unexpected keyword arguments %r' % sorted(kwargs))
+
+    clone = queryset._clone()
+    query = clone.query
+    if options:
+        query.add_context(
+            query_options_context,
+            tuple(query.get_context(query_options_context, ())) + options,
+        )
+    if tables:
+        table_hints = dict(query.get_context(table_hints_context, {}))
+        for table, hints in tables.items():
+            if isinstance(table, type) and issubclass(table, Model):
+                table = table._meta.db_table
+            if isinstance(hints, six.string_types):
+                hints = (hints,)
+            table_hints[table] = table_hints.get(table, ()) + tuple(hints)
+        query.add_context(table_hints_context, table_hints)
+    return clone
+
+
+class QueryHintsMixin(object):
+    """QuerySet mixin that adds mssql_hints."""
+    def mssql_hints(self, *options, **kwargs):
+        """Add SQL Server query and table hints. See models.query.mssql_hints."""
+        return mssql_hints(self, *options, **kwargs)
@@ -10,6 +10,7 @@ from django.db.backends.base.operations import BaseDatabaseOperations
 from django.utils import six, timezone
 from django.utils.encoding import force_text, smart_text
 
+from . import dbapi as Database
 from . import fields as mssql_fields
 
 try:
@@ -214,6 +215,13 @@ class DatabaseOperations(BaseDatabaseOperations):
         """
         return (None, None)
 
+    def fetch_returned_insert_ids(self, cursor):
+        """
+        Return the primary keys selected by a bulk insert, in the order of
+        the inserted objects. See SQLInsertCompiler._as_bulk_return_ids_sql.
+        """
+        return [row[0] for row in cursor.fetchall()]
+
     def no_limit_value(self):
         return None
 
@@ -535,4 +543,7 @@ class DatabaseOperations(BaseDatabaseOperations):
         are the fields going to be inserted in the batch, the objs contains
         all the objects to be inserted.
         """
+        if self.connection.use_xml_bulk_insert:
+            # Rows are sent as a single XML document parameter
+            return min(len(objs), Database.defaultBulkInsertBatchSize)
         return min(len(objs), 2100 // len(fields), 1000)
@@ -0,0 +1,167 @@
+"""
+In-process pooling of dbapi connections, per thread.
+
+ADO objects belong to the COM apartment of the thread that created them, so
+idle connections are kept per thread and are only handed out again to the
+thread that opened them. A connection released by one thread is never
+reused by another, and the sizes of a pool apply to each thread separately.
+The pool pays off when the same threads open connections over and over,
+such as the worker threads of a web server.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import functools
+import threading
+import time
+
+from . import dbapi as Database
+
+__all__ = [
+    'PerThreadConnectionPool',
+    'get_pool',
+]
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(conn_params, **options):
+    """
+    Return the process wide PerThreadConnectionPool for the dbapi.connect()
+    arguments in conn_params, creating it with the PerThreadConnectionPool
+    options if needed.
+    """
+    key = (tuple(sorted(conn_params.items())), tuple(sorted(options.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            connect = functools.partial(Database.connect, **conn_params)
+            pool = _pools[key] = PerThreadConnectionPool(connect, **options)
+        return pool
+
+
+class PerThreadConnectionPool(object):
+    """
+    Keeps released connections open for reuse by the thread that released
+    them.
+
+    connect -- Callable that opens a new dbapi connection.
+    min_size -- Connections opened for a thread when it first acquires one,
+        and idle connections per thread that are kept open regardless of
+        idle_timeout.
+    max_idle -- Most idle connections kept per thread. Connections released
+        beyond this are closed. It is not a limit on the number of
+        connections: any number can be checked out at the same time.
+    idle_timeout -- Seconds an idle connection is kept before it is closed,
+        or None to keep idle connections until the thread exits.
+    validate -- Callable that returns False if a dbapi connection is no
+        longer usable. It is called before an idle connection is reused.
+    """
+    def __init__(self, connect, min_size=0, max_idle=5, idle_timeout=300, validate=None):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.validate = validate
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+        self.discarded = 0
+        self.checked_out = 0
+
+    def _idle_connections(self):
+        """Return the list of (connection, released at) for the current thread, oldest first."""
+        idle = getattr(self._local, 'connections', None)
+        if idle is None:
+            idle = self._local.connections = []
+        return idle
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def acquire(self):
+        """Return an idle connection from the current thread, or a new connection."""
+        if getattr(self._local, 'connections', None) is None:
+            self.fill()
+        idle = self._idle_connections()
+        self._expire(idle)
+        while idle:
+            # Most recently released first
+            conn, released_at = idle.pop()
+            if self.validate is None or self.validate(conn):
+                self._count(reused=1, checked_out=1)
+                return conn
+            self._discard(conn)
+
+        conn = self.connect()
+        self._count(created=1, checked_out=1)
+        return conn
+
+    def fill(self):
+        """
+        Open connections until the current thread has min_size idle ones.
+        acquire calls this the first time a thread uses the pool.
+        """
+        idle = self._idle_connections()
+        while len(idle) < self.min_size:
+            idle.append((self.connect(), time.time()))
+            self._count(created=1)
+
+    def release(self, conn):
+        """Reset conn and keep it for reuse by the current thread, or close it."""
+        self._count(checked_out=-1)
+        idle = self._idle_connections()
+        if len(idle) >= self.max_idle:
+            self._discard(conn)
+            return
+        try:
+            conn.reset()
+        except Exception:
+            self._discard(conn)
+            return
+        idle.append((conn, time.time()))
+        self._count(released=1)
+
+    def clear(self):
+        """Close all idle connections of the current thread."""
+        idle = self._idle_connections()
+        while idle:
+            conn, released_at = idle.pop()
+            self._discard(conn)
+
+    def _expire(self, idle):
+        """Close connections idle for longer than idle_timeout, keeping min_size of them."""
+        if self.idle_timeout is None:
+            return
+        expired_before = time.time() - self.idle_timeout
+        while len(idle) > self.min_size and idle[0][1] < expired_before:
+            conn, released_at = idle.pop(0)
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._count(discarded=1)
+
+    def stats(self):
+        """
+        Return a dict of the pool metrics. 'idle' is the number of idle
+        connections kept for the current thread.
+        """
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'released': self.released,
+                'discarded': self.discarded,
+                'checked_out': self.checked_out,
+                'idle': len(self._idle_connections()),
+            }
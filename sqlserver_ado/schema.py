@@ -1,5 +1,6 @@
 import binascii
 import datetime
+import re
 from logging import getLogger
 from django.db.backends.utils import truncate_name
 from django.db.models.fields import AutoField
@@ -10,8 +11,44 @@ from django.utils.encoding import force_text
 
 from django.db.backends.base.schema import BaseDatabaseSchemaEditor
 
+from . import dbapi as Database
+from .introspection import _add_constraint
+
 logger = getLogger('django.db.backends.schema')
 
+# Statements that change the parameters of a stored procedure
+_re_procedure_ddl = re.compile(r'\b(?:CREATE|ALTER|DROP)\s+PROC(?:EDURE)?\b', re.IGNORECASE)
+
+# Statements of the schema editor whose effect on the constraints of a
+# table the constraint cache follows. See DatabaseSchemaEditor._track_constraints.
+_re_add_constraint = re.compile(
+    r'^ALTER TABLE (?P<table>\S+) ADD CONSTRAINT (?P<name>\S+)'
+    r' (?P<type>PRIMARY KEY|UNIQUE|FOREIGN KEY) \((?P<columns>[^)]*)\)'
+    r'(?: REFERENCES (?P<to_table>\S+) \((?P<to_column>[^)]*)\))?$',
+    re.IGNORECASE)
+_re_create_index = re.compile(
+    r'^CREATE (?P<unique>UNIQUE )?INDEX (?P<name>\S+) ON (?P<table>\S+) \((?P<columns>[^)]*)\)',
+    re.IGNORECASE)
+_re_drop_constraint = re.compile(r'^ALTER TABLE (?P<table>\S+) DROP CONSTRAINT (?P<name>\S+)$', re.IGNORECASE)
+_re_drop_index = re.compile(r'^DROP INDEX (?P<name>\S+) ON (?P<table>\S+)$', re.IGNORECASE)
+_re_drop_column = re.compile(r'^ALTER TABLE (?P<table>\S+) DROP COLUMN (?P<column>\S+)$', re.IGNORECASE)
+# Statements that leave the constraints of get_constraints as they are
+_re_constraints_unchanged = re.compile(
+    r'^(?:ALTER TABLE \S+ (?:ALTER COLUMN|ADD CONSTRAINT \S+ DEFAULT)\b|UPDATE\b|INSERT\b|DELETE\b'
+    # The statement of _drop_default_column
+    r'|\s*DECLARE @sql nvarchar\(max\)\s+WHILE 1=1\s+BEGIN'
+    r'\s+SELECT TOP 1 @sql = [^\n]*\n\s*FROM sys\.default_constraints\b)',
+    re.IGNORECASE)
+# Other statements that change a single table
+_re_table_ddl = re.compile(r'^(?:ALTER|CREATE|DROP) TABLE (?P<table>\S+)', re.IGNORECASE)
+
+
+def _unquote_name(name):
+    """Return name without the square brackets of quote_name."""
+    if name.startswith('[') and name.endswith(']'):
+        return name[1:-1].replace(']]', ']')
+    return name
+
 
 def _related_non_m2m_objects(old_field, new_field):
     # Filters out m2m objects from reverse relations.
@@ -78,6 +115,11 @@ END'''
         '': '',
     }
 
+    def __init__(self, *args, **kwargs):
+        super(DatabaseSchemaEditor, self).__init__(*args, **kwargs)
+        # The get_constraints dict of each table, see _table_constraints
+        self._constraints = {}
+
     def _create_constraint_name(self, model, column_names, constraint_type='', suffix=""):
         """
         Generates a unique name for a constraint.
@@ -105,17 +147,108 @@ END'''
 
     def delete_db_column(self, model, column):
         # drop all of the column constraints to avoid the database blocking the column removal
-        with self.connection.cursor() as cursor:
-            constraints = self.connection.introspection.get_constraints(cursor, model._meta.db_table)
-            for name, constraint in six.iteritems(constraints):
-                if column in constraint['columns']:
-                    sql = 'ALTER TABLE %(table)s DROP CONSTRAINT [%(constraint)s]' % {
-                        'table': model._meta.db_table,
-                        'constraint': name,
-                    }
-                    cursor.execute(sql)
+        constraints = self._table_constraints(model._meta.db_table)
+        for name, constraint in list(constraints.items()):
+            if column in constraint['columns']:
+                sql = 'ALTER TABLE %(table)s DROP CONSTRAINT [%(constraint)s]' % {
+                    'table': model._meta.db_table,
+                    'constraint': name,
+                }
+                self.execute(sql)
         super(DatabaseSchemaEditor, self).delete_db_column(model, column)
 
+    def _table_constraints(self, table):
+        """
+        Return the get_constraints dict of table. Each table is introspected
+        once per schema editor, after which _track_constraints keeps the
+        dict up to date with the statements the editor executes.
+        """
+        constraints = self._constraints.get(table)
+        if constraints is None:
+            with self.connection.cursor() as cursor:
+                constraints = self.connection.introspection.get_constraints(cursor, table)
+            self._constraints[table] = constraints
+        return constraints
+
+    def _constraint_names(self, model, column_names=None, unique=None,
+                          primary_key=None, index=None, foreign_key=None,
+                          check=None):
+        """
+        Returns all constraint names matching the columns and conditions
+        """
+        column_names = list(column_names) if column_names else None
+        constraints = self._table_constraints(model._meta.db_table)
+        result = []
+        for name, infodict in constraints.items():
+            if column_names is None or column_names == infodict['columns']:
+                if unique is not None and infodict['unique'] != unique:
+                    continue
+                if primary_key is not None and infodict['primary_key'] != primary_key:
+                    continue
+                if index is not None and infodict['index'] != index:
+                    continue
+                if check is not None and infodict['check'] != check:
+                    continue
+                if foreign_key is not None and not infodict['foreign_key']:
+                    continue
+                result.append(name)
+        return result
+
+    def _track_constraints(self, sql):
+        """
+        Apply the effect of the executed statement sql to the cached
+        constraints. Statements the editor does not know, such as sp_rename
+        or the RunSQL of a migration, clear the whole cache.
+        """
+        sql = force_text(sql).strip()
+        match = _re_add_constraint.match(sql)
+        if match:
+            constraints = self._constraints.get(_unquote_name(match.group('table')))
+            if constraints is not None:
+                kind = match.group('type').upper()
+                name = _unquote_name(match.group('name'))
+                ref_table = ref_column = None
+                if kind == 'FOREIGN KEY':
+                    ref_table = _unquote_name(match.group('to_table'))
+                    ref_column = _unquote_name(match.group('to_column').split(',')[0].strip())
+                for column in match.group('columns').split(','):
+                    _add_constraint(
+                        constraints, 'foreign_key' if kind == 'FOREIGN KEY' else 'index', name,
+                        _unquote_name(column.strip()), kind != 'FOREIGN KEY', kind == 'PRIMARY KEY',
+                        ref_table, ref_column)
+            return
+        match = _re_create_index.match(sql)
+        if match:
+            constraints = self._constraints.get(_unquote_name(match.group('table')))
+            if constraints is not None:
+                name = _unquote_name(match.group('name'))
+                for column in match.group('columns').split(','):
+                    _add_constraint(
+                        constraints, 'index', name, _unquote_name(column.strip()),
+                        bool(match.group('unique')), False, None, None)
+            return
+        match = _re_drop_constraint.match(sql) or _re_drop_index.match(sql)
+        if match:
+            constraints = self._constraints.get(_unquote_name(match.group('table')))
+            if constraints is not None:
+                constraints.pop(_unquote_name(match.group('name')), None)
+            return
+        match = _re_drop_column.match(sql)
+        if match:
+            constraints = self._constraints.get(_unquote_name(match.group('table')))
+            if constraints is not None:
+                column = _unquote_name(match.group('column'))
+                for name in [n for n, c in constraints.items() if column in c['columns']]:
+                    del constraints[name]
+            return
+        if _re_constraints_unchanged.match(sql):
+            return
+        match = _re_table_ddl.match(sql)
+        if match:
+            self._constraints.pop(_unquote_name(match.group('table')), None)
+            return
+        self._constraints.clear()
+
     def remove_field(self, model, field):
         """
         Removes a field from a model. Usually involves deleting a column,
@@ -484,6 +617,31 @@ END''' % {'table': model._meta.db_table}
         params = [model._meta.db_table, column]
         return sql, params
 
+    def __enter__(self):
+        # Introspect the tables as they are changed, instead of from the
+        # catalog snapshot
+        introspection = self.connection.introspection
+        self._use_catalog_snapshot = introspection.use_catalog_snapshot
+        introspection.use_catalog_snapshot = False
+        self._constraints = {}
+        return super(DatabaseSchemaEditor, self).__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            return super(DatabaseSchemaEditor, self).__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.connection.introspection.use_catalog_snapshot = self._use_catalog_snapshot
+
+    def execute(self, sql, params=[]):
+        super(DatabaseSchemaEditor, self).execute(sql, params)
+        self._track_constraints(sql)
+        # The columns of a table may have changed
+        Database.clear_description_cache()
+        self.connection.introspection.clear_catalog_snapshot()
+        if _re_procedure_ddl.search(force_text(sql)):
+            # Such as a RunSQL operation of a migration
+            Database.clear_procedure_parameter_cache()
+
     def prepare_default(self, value):
         return self.quote_value(value)
 
@@ -0,0 +1,18 @@
+from django.db import models
+
+from sqlserver_ado.models import QueryHintsManagerMixin
+
+
+class HintManager(QueryHintsManagerMixin, models.Manager):
+    pass
+
+
+class HintGroup(models.Model):
+    name = models.CharField(max_length=10)
+
+
+class HintItem(models.Model):
+    group = models.ForeignKey(HintGroup)
+    name = models.CharField(max_length=10)
+
+    objects = HintManager()
@@ -1,6 +1,11 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from sqlserver_ado.compiler import _re_data_type_terminator
+from sqlserver_ado.models import mssql_hints
+
+from .models import HintGroup, HintItem
 
 class CompilerRegexTestCase(TestCase):
     def test_data_type_terminator(self):
@@ -24,3 +29,46 @@ class CompilerRegexTestCase(TestCase):
 
         for val, expected in pairs:
             self.assertEqual(expected, _re_data_type_terminator.split(val)[0])
+
+
+class QueryHintsTestCase(TestCase):
+    def test_options(self):
+        qs = HintItem.objects.mssql_hints('RECOMPILE').filter(name='a')
+        qs = mssql_hints(qs, 'MAXDOP 1')[:5]
+        sql = str(qs.query)
+        self.assertTrue(sql.endswith(' OPTION (RECOMPILE, MAXDOP 1)'), sql)
+
+    def test_table_hints(self):
+        qs = HintItem.objects.mssql_hints(tables={HintItem: 'NOLOCK', 'mssql_compiler_regress_hintgroup': ['READPAST']})
+        sql = str(qs.filter(group__name='a').query)
+        self.assertIn('FROM [mssql_compiler_regress_hintitem] WITH (NOLOCK) ', sql)
+        self.assertIn('INNER JOIN [mssql_compiler_regress_hintgroup] WITH (READPAST) ON (', sql)
+
+    def test_not_in_subquery(self):
+        inner = HintItem.objects.mssql_hints('RECOMPILE', tables={HintItem: 'NOLOCK'}).values('group_id')
+        sql = str(HintGroup.objects.filter(pk__in=inner).query)
+        self.assertNotIn('OPTION', sql)
+        self.assertIn('WITH (NOLOCK)', sql)
+
+    def test_aggregate_of_subquery(self):
+        HintItem.objects.create(group=HintGroup.objects.create(name='a'), name='b')
+        qs = HintItem.objects.mssql_hints('RECOMPILE')
+        for count in (qs.distinct().count, qs[:5].count):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(count(), 1)
+            sql = captured.captured_queries[-1]['sql']
+            self.assertTrue(sql.endswith(' OPTION (RECOMPILE)'), sql)
+            self.assertEqual(sql.count('OPTION'), 1, sql)
+
+    def test_does_not_change_original(self):
+        qs = HintItem.objects.all()
+        mssql_hints(qs, 'RECOMPILE', tables={HintItem: 'NOLOCK'})
+        self.assertNotIn('RECOMPILE', str(qs.query))
+        self.assertNotIn('NOLOCK', str(qs.query))
+
+    def test_results(self):
+        group = HintGroup.objects.create(name='a')
+        HintItem.objects.create(group=group, name='b')
+        qs = HintItem.objects.mssql_hints('RECOMPILE', 'FAST 1', tables={HintItem: 'NOLOCK'})
+        self.assertEqual([i.name for i in qs.filter(group__name='a')], ['b'])
+        self.assertEqual(qs.count(), 1)
@@ -0,0 +1,297 @@
+"""
+Micro-benchmarks for the dbapi module that run against the fake ADO objects
+in fakeado, so they need neither a database nor pywin32.
+
+From the tests folder, run:
+
+    python -m mssql_dbapi.benchmarks
+"""
+from __future__ import print_function, unicode_literals
+
+import datetime
+import decimal
+import timeit
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from sqlserver_ado import dbapi
+from sqlserver_ado.ado_consts import (adBigInt, adDecimal, adDouble, adInteger, adOpenForwardOnly,
+    adOpenStatic, adVarWChar)
+
+from .fakeado import FakeConnection, FakeField, FakeParameter, FakeRecordset, fake_dispatch
+
+
+def _report(name, seconds, repeat):
+    print('%-60s %10.2f ms' % (name, seconds / repeat * 1000))
+
+
+def bench_fetchall(rows=200000, repeat=3):
+    """Compare the per-column fetch path against per-cell conversion."""
+    fields = [
+        FakeField('id', adInteger),
+        FakeField('big', adBigInt),
+        FakeField('name', adVarWChar),
+        FakeField('amount', adDecimal),
+        FakeField('ratio', adDouble),
+    ]
+    data = [(i, i, 'name %d' % i, '%d.25' % i, i / 3.0) for i in range(rows)]
+
+    def fetchall():
+        cur = dbapi.Connection(FakeConnection()).cursor()
+        cur._description_from_recordset(FakeRecordset(fields, data))
+        return cur.fetchall()
+
+    def fetchall_per_cell():
+        cur = dbapi.Connection(FakeConnection()).cursor()
+        cur._description_from_recordset(FakeRecordset(fields, data))
+        ado_results = cur.rs.GetRows()
+        py_columns = list()
+        column_types = [column_desc[1] for column_desc in cur.description]
+        for ado_type, column in zip(column_types, ado_results):
+            py_columns.append([dbapi._convert_to_python(cell, ado_type) for cell in column])
+        return tuple(zip(*py_columns))
+
+    assert fetchall() == fetchall_per_cell()
+    _report('fetchall (%d rows, per cell)' % rows, timeit.timeit(fetchall_per_cell, number=repeat), repeat)
+    _report('fetchall (%d rows, per column)' % rows, timeit.timeit(fetchall, number=repeat), repeat)
+
+
+def bench_iterate(rows=100000, repeat=3):
+    """Iterate over a cursor with different fetch chunk sizes."""
+    fields = [FakeField('id', adInteger), FakeField('name', adVarWChar)]
+    data = [(i, 'name %d' % i) for i in range(rows)]
+
+    for chunk_size in (1, 100, 1000):
+        def iterate():
+            cur = dbapi.Connection(FakeConnection(), fetch_chunk_size=chunk_size).cursor()
+            cur._description_from_recordset(FakeRecordset(fields, data))
+            for row in cur:
+                pass
+        _report('iterate (%d rows, chunk %d)' % (rows, chunk_size), timeit.timeit(iterate, number=repeat), repeat)
+
+
+def bench_executemany(rows=10000, repeat=3):
+    """Count round trips of executemany against one execute per row."""
+    sql = 'INSERT INTO [t] ([a], [b], [c]) VALUES (%s, %s, %s)'
+    params = [(i, 'name %d' % i, i / 3.0) for i in range(rows)]
+
+    def execute_per_row():
+        ado_conn = FakeConnection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        for p in params:
+            cur.execute(sql, p)
+        return len(ado_conn.executed)
+
+    def executemany():
+        ado_conn = FakeConnection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        cur.executemany(sql, params)
+        return len(ado_conn.executed)
+
+    for name, func in (('execute per row', execute_per_row), ('executemany', executemany)):
+        label = '%s (%d rows, %d round trips)' % (name, rows, func())
+        _report(label, timeit.timeit(func, number=repeat), repeat)
+
+
+def bench_bulk_insert(rows=20000, columns=20, repeat=3):
+    """Compare the throughput of executemany and the XML bulk_insert."""
+    names = ['[c%d]' % i for i in range(columns)]
+    sql = 'INSERT INTO [t] (%s) VALUES (%s)' % (', '.join(names), ', '.join(['%s'] * columns))
+    params = [['value %d' % i] * columns for i in range(rows)]
+
+    def executemany():
+        ado_conn = FakeConnection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        cur.executemany(sql, params)
+        return len(ado_conn.executed)
+
+    def bulk_insert():
+        ado_conn = FakeConnection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        dbapi.bulk_insert(cur, '[t]', names, ['nvarchar(20)'] * columns, params)
+        return len(ado_conn.executed)
+
+    for name, func in (('executemany', executemany), ('bulk_insert', bulk_insert)):
+        label = '%s (%d x %d, %d round trips)' % (name, rows, columns, func())
+        seconds = timeit.timeit(func, number=repeat)
+        _report(label, seconds, repeat)
+        print('%-60s %10.0f rows/s' % ('', rows * repeat / seconds))
+
+
+def bench_parameter_binding(values=100000, repeat=3):
+    """Compare string and typed binding of Decimal and datetime parameters."""
+    data = [
+        ('Decimal', [decimal.Decimal('%d.%02d' % (i, i % 100)) for i in range(values)]),
+        ('datetime', [datetime.datetime(2015, 1, 1) + datetime.timedelta(seconds=i) for i in range(values)]),
+    ]
+    for type_name, params in data:
+        for typed in (False, True):
+            def bind():
+                p = FakeParameter('p0', dbapi._ado_type(params[0], typed))
+                for value in params:
+                    dbapi._configure_parameter(p, value, typed)
+            label = 'bind %s (%d values, %s)' % (type_name, values, 'typed' if typed else 'string')
+            _report(label, timeit.timeit(bind, number=repeat), repeat)
+
+
+def bench_execute_parallel(statements=8, latency=0.005, repeat=3):
+    """Compare sequential and parallel SELECTs against a server with round trip latency."""
+    fields = [FakeField('id', adInteger)]
+
+    def connection():
+        ado_conn = FakeConnection(
+            handler=lambda cmd: (FakeRecordset(fields, [(1,)]), -1),
+            latency=latency,
+        )
+        ado_conn.ConnectionString = 'MARS Connection=True'
+        return dbapi.Connection(ado_conn)
+
+    queries = [('SELECT [id] FROM [t%d]' % i, None) for i in range(statements)]
+
+    def sequential():
+        conn = connection()
+        for sql, params in queries:
+            conn.cursor().execute(sql, params)
+
+    def parallel():
+        connection().execute_parallel(queries)
+
+    for name, func in (('sequential', sequential), ('execute_parallel', parallel)):
+        label = '%s (%d selects, %d ms latency)' % (name, statements, latency * 1000)
+        _report(label, timeit.timeit(func, number=repeat), repeat)
+
+
+def bench_execute_batch(statements=50, latency=0.002, repeat=3):
+    """Compare one execute per statement against execute_batch with round trip latency."""
+    marker = [FakeField(dbapi._batch_rowcount_column, adInteger)]
+
+    def handler(cmd):
+        count = cmd.CommandText.count(dbapi._batch_rowcount_sql)
+        recordset = None
+        for i in range(count):
+            recordset = FakeRecordset(marker, [(1,)], recordset)
+        return (recordset, 1)
+
+    queries = [('UPDATE [t] SET [a] = %s WHERE [id] = %s', [i, i]) for i in range(statements)]
+
+    def execute_per_statement():
+        ado_conn = FakeConnection(handler=handler, latency=latency)
+        cur = dbapi.Connection(ado_conn).cursor()
+        for sql, params in queries:
+            cur.execute(sql, params)
+        return len(ado_conn.executed)
+
+    def execute_batch():
+        ado_conn = FakeConnection(handler=handler, latency=latency)
+        cur = dbapi.Connection(ado_conn).cursor()
+        cur.execute_batch(queries)
+        return len(ado_conn.executed)
+
+    for name, func in (('execute per statement', execute_per_statement), ('execute_batch', execute_batch)):
+        label = '%s (%d updates, %d round trips)' % (name, statements, func())
+        _report(label, timeit.timeit(func, number=repeat), repeat)
+
+
+def bench_packed_array(values=2000, repeat=20):
+    """Compare an IN list with a parameter per value against one PackedArray."""
+    ids = list(range(values))
+
+    def parameter_per_value():
+        ado_conn = FakeConnection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        cur.execute('SELECT [a] FROM [t] WHERE [id] IN (%s)' % ', '.join(['%s'] * values), ids)
+        return len(ado_conn.executed[0][1])
+
+    def packed_array():
+        ado_conn = FakeConnection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        cur.execute('SELECT [a] FROM [t] WHERE [id] IN (%s)', [dbapi.PackedArray(ids, 'int')])
+        return len(ado_conn.executed[0][1])
+
+    for name, func in (('parameter per value', parameter_per_value), ('PackedArray', packed_array)):
+        label = '%s (%d values, %d parameters)' % (name, values, func())
+        _report(label, timeit.timeit(func, number=repeat), repeat)
+
+
+def bench_cursor_options(rows=5000, latency=0.0002, repeat=1):
+    """
+    Iterate over a recordset whose rows arrive CacheSize rows per round trip,
+    for each cursor type, cache size and fetch chunk size. A cache size of 1
+    is the ADO default.
+    """
+    fields = [FakeField('id', adInteger), FakeField('name', adVarWChar)]
+    data = [(i, 'name %d' % i) for i in range(rows)]
+
+    for cursor_type, type_name in ((adOpenForwardOnly, 'forward only'), (adOpenStatic, 'static')):
+        for cache_size in (1, None, 1000):
+            for chunk_size in (100, 1000):
+                def iterate():
+                    ado_conn = FakeConnection(handler=lambda cmd: (FakeRecordset(fields, data, latency=latency), -1))
+                    conn = dbapi.Connection(ado_conn, fetch_chunk_size=chunk_size, cursor_type=cursor_type,
+                                            cache_size=cache_size)
+                    cur = conn.cursor()
+                    cur.execute('SELECT [id], [name] FROM [t]')
+                    for row in cur:
+                        pass
+                    return cur.rs.round_trips
+
+                label = 'iterate (%s, cache %d, chunk %d, %d round trips)' % (
+                    type_name, cache_size or chunk_size, chunk_size, iterate())
+                seconds = timeit.timeit(iterate, number=repeat)
+                _report(label, seconds, repeat)
+
+
+def bench_exhausted_recordsets(queries=200, latency=0.0005, repeat=1):
+    """
+    Run queries that each read a single recordset to the end, releasing the
+    exhausted recordset at once, or only before the next statement when the
+    connection does not use MARS. The cursors are kept open, so only a
+    release moves past their recordsets.
+    """
+    fields = [FakeField('id', adInteger)]
+
+    for mars in (False, True):
+        for eager in (True, False):
+            def run():
+                recordsets = []
+                def handler(cmd):
+                    recordsets.append(FakeRecordset(fields, [(1,)], latency=latency))
+                    return (recordsets[-1], -1)
+                ado_conn = FakeConnection(handler=handler)
+                if mars:
+                    ado_conn.ConnectionString = 'MARS Connection=True'
+                conn = dbapi.Connection(ado_conn)
+                cursors = []
+                for i in range(queries):
+                    cur = conn.cursor()
+                    cursors.append(cur)
+                    cur.execute('SELECT [id] FROM [t]')
+                    cur.fetchall()
+                    if eager:
+                        cur._release_recordset()
+                return sum(rs.next_recordset_calls for rs in recordsets)
+
+            label = 'read %d queries (%s, %s release, %d NextRecordset)' % (
+                queries, 'MARS' if mars else 'no MARS', 'eager' if eager else 'deferred', run())
+            _report(label, timeit.timeit(run, number=repeat), repeat)
+
+
+def main():
+    dbapi._dispatch = fake_dispatch
+    bench_fetchall()
+    bench_iterate()
+    bench_executemany()
+    bench_bulk_insert()
+    bench_parameter_binding()
+    bench_execute_parallel()
+    bench_execute_batch()
+    bench_packed_array()
+    bench_cursor_options()
+    bench_exhausted_recordsets()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+Minimal stand-ins for the ADO COM objects used by sqlserver_ado.dbapi.
+
+These allow exercising the dbapi module without a database or pywin32. Only
+the members that the dbapi module uses are implemented.
+"""
+from __future__ import unicode_literals
+
+import time
+
+from sqlserver_ado.ado_consts import (adAsyncExecute, adFldMayBeNull, adLockReadOnly, adOpenForwardOnly,
+    adParamInput, adStateClosed, adStateExecuting, adStateOpen)
+
+
+class FakeField(object):
+    def __init__(self, name, ado_type, defined_size=0, precision=0, scale=0, nullable=True):
+        self.Name = name
+        self.Type = ado_type
+        self.ActualSize = defined_size
+        self.DefinedSize = defined_size
+        self.Precision = precision
+        self.NumericScale = scale
+        self.Attributes = adFldMayBeNull if nullable else 0
+
+
+class FakeRecordset(object):
+    """
+    A forward-only recordset over a list of row tuples. GetRows returns the
+    rows column-major, the same as ADO.
+
+    Rows come from the server CacheSize rows at a time. Each of these round
+    trips is counted in `round_trips` and takes `latency` seconds, as does
+    each call of NextRecordset, counted in `next_recordset_calls`.
+    """
+    def __init__(self, fields, rows, next_recordset=None, latency=0):
+        self.Fields = fields
+        self.State = adStateOpen
+        self.BOF = False
+        self.CacheSize = 1
+        self.CursorLocation = None
+        self.CursorType = adOpenForwardOnly
+        self.LockType = adLockReadOnly
+        self.get_rows_calls = 0
+        self.round_trips = 0
+        self.next_recordset_calls = 0
+        self.latency = latency
+        self._rows = list(rows)
+        self._position = 0
+        self._cached = 0
+        self._next_recordset = next_recordset
+
+    @property
+    def EOF(self):
+        return self._position >= len(self._rows)
+
+    def GetRows(self, count=-1):
+        self.get_rows_calls += 1
+        if count < 0:
+            count = len(self._rows)
+        rows = self._rows[self._position:self._position + count]
+        self._position += len(rows)
+        while self._cached < self._position:
+            self.round_trips += 1
+            self._cached += self.CacheSize
+            if self.latency:
+                time.sleep(self.latency)
+        return tuple(zip(*rows))
+
+    def Open(self, source, CursorType=adOpenForwardOnly, LockType=adLockReadOnly):
+        """Run the command source and take over the recordset it returns."""
+        recordset = source.Execute()[0]
+        self.CursorType = CursorType
+        self.LockType = LockType
+        if recordset is None:
+            self.State = adStateClosed
+            return
+        self.Fields = recordset.Fields
+        self.State = recordset.State
+        self.latency = recordset.latency
+        self._rows = recordset._rows
+        self._next_recordset = recordset._next_recordset
+
+    def NextRecordset(self):
+        self.next_recordset_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        self.Close()
+        return (self._next_recordset, -1)
+
+    def Close(self):
+        self.State = adStateClosed
+
+
+class FakeConnection(object):
+    """
+    An ADODB.Connection that never leaves the process.
+
+    Every executed command is recorded in `executed` as a tuple of the
+    command text and parameter values. The result of an execution is
+    provided by `handler`, which is called with the command and returns the
+    same (recordset, records affected) tuple as Command.Execute.
+
+    Each execution takes `latency` seconds, to simulate the round trip to a
+    server. Asynchronous executions return at once and complete after it,
+    once their State is read. The commands that are executing are kept in
+    `executing`, and the most that ever were at the same time in
+    `max_executing`.
+
+    A handler may return a FakeError instead. A synchronous execution
+    raises it, an asynchronous one adds it to `Errors` when it completes.
+    It may also set the `latency` of the command, to override that of the
+    connection.
+
+    `procedures` maps stored procedure names to the list of (name, type,
+    direction) of their parameters, starting with the return value, which
+    Parameters.Refresh loads into a command.
+    """
+    def __init__(self, properties=None, handler=None, latency=0, procedures=None):
+        self.ConnectionString = ''
+        self.CommandTimeout = 30
+        self.CursorLocation = None
+        self.IsolationLevel = None
+        self.Attributes = 0
+        self.Errors = FakeErrors()
+        self.Properties = [FakeProperty(k, v) for k, v in (properties or {}).items()]
+        self.transaction_calls = []
+        self.executed = []
+        self.handler = handler or (lambda command: (None, -1))
+        self.latency = latency
+        self.procedures = procedures or {}
+        self.refreshes = 0
+        self.executing = set()
+        self.max_executing = 0
+
+    def Open(self):
+        pass
+
+    def BeginTrans(self):
+        self.transaction_calls.append('begin')
+        return 1
+
+    def CommitTrans(self):
+        self.transaction_calls.append('commit')
+
+    def RollbackTrans(self):
+        self.transaction_calls.append('rollback')
+
+    def Close(self):
+        pass
+
+
+class FakeError(object):
+    def __init__(self, description, sql_state='42000'):
+        self.Description = description
+        self.SQLState = sql_state
+        self.Number = 0
+        self.NativeError = 0
+        self.Source = 'Fake'
+
+
+class FakeErrors(list):
+    @property
+    def Count(self):
+        return len(self)
+
+    def Clear(self):
+        del self[:]
+
+
+class FakeProperty(object):
+    def __init__(self, name, value):
+        self.Name = name
+        self.Value = value
+
+
+class FakeParameter(object):
+    def __init__(self, name, ado_type, direction=adParamInput, size=0):
+        self.Name = name
+        self.Type = ado_type
+        self.Direction = direction
+        self.Size = size
+        self.Value = None
+        self.Precision = 0
+        self.NumericScale = 0
+
+    def AppendChunk(self, value):
+        self.Value = value
+
+
+class FakeParameters(object):
+    def __init__(self, command):
+        self._command = command
+        self._items = []
+
+    def __call__(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+    def Append(self, parameter):
+        self._items.append(parameter)
+
+    def Refresh(self):
+        conn = self._command.ActiveConnection
+        conn.refreshes += 1
+        procedure = conn.procedures.get(self._command.CommandText, [])
+        self._items = [FakeParameter(*p) for p in procedure]
+
+
+class FakeCommand(object):
+    """An ADODB.Command that runs against a FakeConnection."""
+    def __init__(self):
+        self.ActiveConnection = None
+        self.CommandTimeout = 30
+        self.CommandType = None
+        self.CommandText = ''
+        self.Prepared = False
+        self.Parameters = FakeParameters(self)
+        self.latency = None
+        self._completes_at = 0
+        self._error = None
+
+    def CreateParameter(self, name, ado_type, direction=adParamInput, size=0):
+        return FakeParameter(name, ado_type, direction, size)
+
+    @property
+    def State(self):
+        conn = self.ActiveConnection
+        if self in conn.executing:
+            if time.time() < self._completes_at:
+                return adStateExecuting
+            conn.executing.discard(self)
+            if self._error is not None:
+                conn.Errors.append(self._error)
+                self._error = None
+        return adStateClosed
+
+    def Execute(self, Options=None):
+        conn = self.ActiveConnection
+        conn.executed.append((self.CommandText, [p.Value for p in self.Parameters]))
+        conn.executing.add(self)
+        conn.max_executing = max(conn.max_executing, len(conn.executing))
+        try:
+            result = conn.handler(self)
+        except Exception:
+            conn.executing.discard(self)
+            raise
+        latency = conn.latency if self.latency is None else self.latency
+        if Options is not None and Options & adAsyncExecute:
+            self._completes_at = time.time() + latency
+            if isinstance(result, FakeError):
+                self._error = result
+                result = (None, -1)
+            return result
+        if latency:
+            time.sleep(latency)
+        conn.executing.discard(self)
+        if isinstance(result, FakeError):
+            conn.Errors.append(result)
+            raise Exception(result.Description)
+        return result
+
+
+def fake_dispatch(prog_id):
+    """Replacement for dbapi._dispatch that creates fake ADO objects."""
+    return {
+        'ADODB.Command': FakeCommand,
+        'ADODB.Connection': FakeConnection,
+        'ADODB.Recordset': lambda: FakeRecordset([], []),
+    }[prog_id]()
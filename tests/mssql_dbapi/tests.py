@@ -1,14 +1,31 @@
 from __future__ import absolute_import
 
+import datetime
+import decimal
+import sys
+import threading
+import time
 import unittest
 
+from django.utils.safestring import SafeText
+
 # Base is used to get connection string using Django settings
 from sqlserver_ado import base
 # Internal dbapi module
 from sqlserver_ado import dbapi
+from sqlserver_ado.pool import PerThreadConnectionPool
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from sqlserver_ado import aio
+
+from sqlserver_ado.ado_consts import (adBigInt, adBinary, adBSTR, adDBTimeStamp, adDecimal, adDouble,
+    adInteger, adLockOptimistic, adNumeric, adOpenKeyset, adOpenStatic, adParamInput,
+    adParamOutput, adParamReturnValue, adStateClosed, adUseClient, adVarWChar)
 
 # Base unit test
 from . import dbapi20
+from .fakeado import FakeConnection, FakeError, FakeField, FakeParameter, FakeRecordset, fake_dispatch
 
 class DbApiTest(dbapi20.DatabaseAPI20Test):
     driver = dbapi
@@ -173,3 +190,1116 @@ class MaskConnectionStringPasswordTest(unittest.TestCase):
             dbapi.connect(connection_string)
         self.assertNotIn('PWD=myPass;', str(err.exception))
         self.assertIn('PWD=******;', str(err.exception))
+
+
+class FetchConvertersTest(unittest.TestCase):
+    def _cursor(self, fields, rows):
+        cur = dbapi.Connection(FakeConnection()).cursor()
+        cur._description_from_recordset(FakeRecordset(fields, rows))
+        return cur
+
+    def test_identity_columns_have_no_converter(self):
+        cur = self._cursor([FakeField('a', adInteger), FakeField('b', adVarWChar)], [])
+        self.assertEqual(cur._converters, [None, None])
+
+    def test_fetch_converts_columns(self):
+        fields = [
+            FakeField('id', adInteger),
+            FakeField('name', adVarWChar),
+            FakeField('amount', adDecimal),
+            FakeField('ratio', adDouble),
+        ]
+        rows = [
+            (1, 'one', '1.50', 0.5),
+            (2, None, None, None),
+        ]
+        cur = self._cursor(fields, rows)
+        self.assertEqual(cur.fetchall(), (
+            (1, 'one', decimal.Decimal('1.50'), 0.5),
+            (2, None, None, None),
+        ))
+
+
+class CursorIterationTest(unittest.TestCase):
+    def test_iter_fetches_in_chunks(self):
+        rows = [(i,) for i in range(250)]
+        rs = FakeRecordset([FakeField('id', adInteger)], rows)
+        cur = dbapi.Connection(FakeConnection(), fetch_chunk_size=100).cursor()
+        cur._description_from_recordset(rs)
+
+        self.assertEqual(list(cur), rows)
+        self.assertEqual(rs.get_rows_calls, 3)
+
+    def test_iter_uses_larger_arraysize(self):
+        rows = [(i,) for i in range(250)]
+        rs = FakeRecordset([FakeField('id', adInteger)], rows)
+        cur = dbapi.Connection(FakeConnection(), fetch_chunk_size=10).cursor()
+        cur.arraysize = 250
+        cur._description_from_recordset(rs)
+
+        self.assertEqual(list(cur), rows)
+        self.assertEqual(rs.get_rows_calls, 1)
+
+
+class CursorOptionsTest(unittest.TestCase):
+    def _cursor(self, rs, **kwargs):
+        cur = dbapi.Connection(FakeConnection(), **kwargs).cursor()
+        cur._description_from_recordset(rs)
+        return cur
+
+    def test_cache_size_follows_fetch_size(self):
+        rows = [(i,) for i in range(250)]
+        rs = FakeRecordset([FakeField('id', adInteger)], rows)
+        cur = self._cursor(rs, fetch_chunk_size=100)
+        self.assertEqual(rs.CacheSize, 100)
+        self.assertEqual(list(cur), rows)
+        self.assertEqual(rs.round_trips, 3)
+
+    def test_cache_size(self):
+        rs = FakeRecordset([FakeField('id', adInteger)], [(i,) for i in range(250)])
+        cur = self._cursor(rs, cache_size=1000)
+        cur.fetchall()
+        self.assertEqual(rs.CacheSize, 1000)
+        self.assertEqual(rs.round_trips, 1)
+
+    def test_scrollable_recordset_is_not_released(self):
+        rs = FakeRecordset([FakeField('id', adInteger)], [(1,)])
+        rs.CursorType = adOpenStatic
+        cur = self._cursor(rs, cursor_type=adOpenStatic)
+        self.assertEqual(cur.fetchall(), ((1,),))
+        self.assertNotEqual(rs.State, adStateClosed)
+
+
+class FakeDispatchTestCase(unittest.TestCase):
+    """Runs the dbapi against the fake ADO objects from fakeado."""
+    def setUp(self):
+        self._old_com = dbapi._dispatch, dbapi._co_initialize, dbapi._co_uninitialize
+        dbapi._dispatch = fake_dispatch
+        dbapi._co_initialize = dbapi._co_uninitialize = lambda: None
+
+    def tearDown(self):
+        dbapi._dispatch, dbapi._co_initialize, dbapi._co_uninitialize = self._old_com
+
+
+class RecordsetOpenTest(FakeDispatchTestCase):
+    def _connection(self, **kwargs):
+        fields = [FakeField('id', adInteger)]
+        ado_conn = FakeConnection(handler=lambda cmd: (FakeRecordset(fields, [(1,), (2,)]), -1))
+        return dbapi.Connection(ado_conn, **kwargs)
+
+    def test_firehose_by_default(self):
+        recordsets = []
+        def handler(cmd):
+            recordsets.append(FakeRecordset([FakeField('id', adInteger)], [(1,), (2,)]))
+            return (recordsets[-1], -1)
+        cur = dbapi.Connection(FakeConnection(handler=handler)).cursor()
+        cur.execute('SELECT [id] FROM [t]')
+        # The recordset of Command.Execute is used, not one from Recordset.Open
+        self.assertIs(cur.rs, recordsets[0])
+        self.assertEqual(cur.fetchall(), ((1,), (2,)))
+
+    def test_exhausted_recordset_is_released(self):
+        fields = [FakeField('id', adInteger)]
+        second = FakeRecordset(fields, [(2,)])
+        first = FakeRecordset(fields, [(1,)], second)
+        results = [(first, -1), (None, 1)]
+        conn = dbapi.Connection(FakeConnection(handler=lambda cmd: results.pop(0)))
+        cur = conn.cursor()
+        cur.execute('SELECT [id] FROM [t]; SELECT [id] FROM [u]')
+
+        self.assertEqual(cur.fetchone(), (1,))
+        # Released only once the connection runs another statement
+        self.assertNotEqual(first.State, adStateClosed)
+        conn.cursor().execute('UPDATE [t] SET [id] = 3')
+        self.assertEqual(first.State, adStateClosed)
+        self.assertEqual(cur.description[0][0], 'id')
+        self.assertIsNone(cur.fetchone())
+        self.assertTrue(cur.nextset())
+        self.assertEqual(cur.fetchall(), ((2,),))
+        self.assertIsNone(cur.nextset())
+
+    def test_exhausted_recordsets_of_all_cursors_are_released(self):
+        fields = [FakeField('id', adInteger)]
+        recordsets = []
+        def handler(cmd):
+            recordsets.append(FakeRecordset(fields, [(1,)]))
+            return (recordsets[-1], -1)
+        conn = dbapi.Connection(FakeConnection(handler=handler))
+        cursors = [conn.cursor() for i in range(3)]
+        for cur in cursors:
+            cur.execute('SELECT [id] FROM [t]')
+        # All three are exhausted before the connection runs a statement
+        for cur in cursors:
+            self.assertEqual(cur.fetchall(), ((1,),))
+        self.assertNotIn(adStateClosed, [rs.State for rs in recordsets])
+        conn.cursor().execute('UPDATE [t] SET [id] = 3')
+        self.assertEqual([rs.State for rs in recordsets[:3]], [adStateClosed] * 3)
+
+    def test_exhausted_recordset_is_kept_with_mars(self):
+        fields = [FakeField('id', adInteger)]
+        recordsets = []
+        def handler(cmd):
+            recordsets.append(FakeRecordset(fields, [(1,)]))
+            return (recordsets[-1], -1)
+        ado_conn = FakeConnection(handler=handler)
+        ado_conn.ConnectionString = 'MARS Connection=True'
+        conn = dbapi.Connection(ado_conn)
+        cur = conn.cursor()
+        cur.execute('SELECT [id] FROM [t]')
+        self.assertEqual(cur.fetchall(), ((1,),))
+        conn.cursor().execute('SELECT [id] FROM [u]')
+        # MARS runs the statement next to the open recordset, without a
+        # round trip to release it
+        self.assertNotEqual(recordsets[0].State, adStateClosed)
+        self.assertIsNone(cur.nextset())
+        self.assertEqual(recordsets[0].State, adStateClosed)
+
+    def test_release_error_is_raised_by_nextset(self):
+        class FailingRecordset(FakeRecordset):
+            def NextRecordset(self):
+                raise Exception('Divide by zero error encountered.')
+
+        rs = FailingRecordset([FakeField('id', adInteger)], [(1,)])
+        cur = dbapi.Connection(FakeConnection(handler=lambda cmd: (rs, -1))).cursor()
+        cur.execute('SELECT [id] FROM [t]; SELECT 1 / 0')
+        self.assertEqual(cur.fetchall(), ((1,),))
+        cur.connection.release_exhausted_recordset()
+        self.assertEqual(cur.fetchall(), [])
+        with self.assertRaises(dbapi.DatabaseError) as context:
+            cur.nextset()
+        self.assertIn('Divide by zero', str(context.exception))
+        self.assertIn('SELECT 1 / 0', str(context.exception))
+
+    def test_cursor_type(self):
+        conn = self._connection(cursor_type=adOpenKeyset, lock_type=adLockOptimistic)
+        cur = conn.cursor()
+        cur.execute('SELECT [id] FROM [t]')
+        self.assertEqual((cur.rs.CursorType, cur.rs.LockType), (adOpenKeyset, adLockOptimistic))
+        self.assertEqual(cur.rowcount, -1)
+        self.assertEqual(cur.fetchall(), ((1,), (2,)))
+
+    def test_per_cursor(self):
+        conn = self._connection()
+        cur = conn.cursor()
+        cur.cursor_location = adUseClient
+        cur.cursor_type = adOpenStatic
+        cur.execute('SELECT [id] FROM [t]')
+        self.assertEqual(cur.rs.CursorLocation, adUseClient)
+        self.assertEqual(cur.rs.CursorType, adOpenStatic)
+        self.assertEqual(conn.cursor().cursor_type, dbapi.defaultCursorType)
+
+
+class _CountingField(FakeField):
+    """A field that counts the reads of its properties, which are COM calls in ADO."""
+    def __init__(self, *args, **kwargs):
+        super(_CountingField, self).__init__(*args, **kwargs)
+        self.reads = []
+
+    def __getattribute__(self, name):
+        if name[0].isupper():
+            object.__getattribute__(self, 'reads').append(name)
+        return object.__getattribute__(self, name)
+
+
+class DescriptionTest(FakeDispatchTestCase):
+    def setUp(self):
+        super(DescriptionTest, self).setUp()
+        dbapi.clear_description_cache()
+        self.fields = [_CountingField('id', adInteger, 4, nullable=False), _CountingField('name', adVarWChar, 10)]
+        rows = [(1, 'one'), (2, 'two')]
+        self.conn = dbapi.Connection(FakeConnection(handler=lambda cmd: (FakeRecordset(self.fields, rows), -1)))
+        self.conn.connection_key = 'test'
+
+    def tearDown(self):
+        dbapi.clear_description_cache()
+        super(DescriptionTest, self).tearDown()
+
+    def _reads(self):
+        reads = [f.reads for f in self.fields]
+        for f in self.fields:
+            f.reads = []
+        return reads
+
+    def test_only_types_are_read_on_execute(self):
+        cur = self.conn.cursor()
+        cur.execute('SELECT [id], [name] FROM [t]')
+        self.assertEqual(self._reads(), [['Type'], ['Type']])
+        self.assertEqual(cur.description, [
+            ('id', adInteger, None, 4, 0, 0, False),
+            ('name', adVarWChar, None, 10, 0, 0, True),
+        ])
+
+    def test_description_is_cached(self):
+        cur = self.conn.cursor()
+        cur.execute('SELECT [id], [name] FROM [t]')
+        cur.description
+        self._reads()
+
+        cur = self.conn.cursor()
+        cur.execute('SELECT [id], [name] FROM [t]')
+        self.assertEqual([d[0] for d in cur.description], ['id', 'name'])
+        self.assertEqual(self._reads(), [['Type', 'Name', 'DefinedSize']] * 2)
+
+        dbapi.clear_description_cache()
+        cur = self.conn.cursor()
+        cur.execute('SELECT [id], [name] FROM [t]')
+        cur.description
+        self.assertNotEqual(self._reads(), [['Type'], ['Type']])
+
+    def test_other_columns_are_not_taken_from_cache(self):
+        cur = self.conn.cursor()
+        cur.execute('EXEC [proc]')
+        cur.description
+        self.fields[1] = _CountingField('title', adVarWChar, 20)
+        cur = self.conn.cursor()
+        cur.execute('EXEC [proc]')
+        self.assertEqual(cur.description[1], ('title', adVarWChar, None, 20, 0, 0, True))
+
+    def test_not_cached_without_connection_key(self):
+        self.conn.connection_key = None
+        cur = self.conn.cursor()
+        cur.execute('SELECT [id], [name] FROM [t]')
+        cur.description
+        self.assertEqual(dbapi._descriptions, {})
+
+    def test_released_recordset(self):
+        cur = self.conn.cursor()
+        cur.execute('SELECT [id], [name] FROM [t]')
+        self.assertEqual(len(cur.fetchall()), 2)
+        self.assertEqual([d[0] for d in cur.description], ['id', 'name'])
+
+
+class ExecuteManyTest(FakeDispatchTestCase):
+    def _connection(self):
+        # Pretend every parameter set inserts one row.
+        return FakeConnection(handler=lambda cmd: (None, len(cmd.Parameters) // self.row_size))
+
+    def test_insert_is_batched(self):
+        self.row_size = 2
+        ado_conn = self._connection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        cur.executemany('INSERT INTO [t] ([a], [b]) VALUES (%s, %s)', [(i, 'x') for i in range(2500)])
+
+        self.assertEqual(len(ado_conn.executed), 3)
+        self.assertEqual(cur.rowcount, 2500)
+        sql, params = ado_conn.executed[0]
+        self.assertEqual(sql, 'INSERT INTO [t] ([a], [b]) VALUES ' + ', '.join(['(?, ?)'] * 1000))
+        self.assertEqual(params[:4], [0, 'x', 1, 'x'])
+
+    def test_batches_respect_parameter_limit(self):
+        self.row_size = 30
+        ado_conn = self._connection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        sql = 'INSERT INTO [t] VALUES (%s)' % ', '.join(['%s'] * self.row_size)
+        cur.executemany(sql, [[i] * self.row_size for i in range(100)])
+
+        # 2100 // 30 == 70 rows per statement
+        self.assertEqual([len(params) for sql, params in ado_conn.executed], [2100, 900])
+        self.assertEqual(cur.rowcount, 100)
+
+    def test_other_statements_are_not_batched(self):
+        self.row_size = 1
+        ado_conn = self._connection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        cur.executemany('UPDATE [t] SET [a] = %s', [(i,) for i in range(5)])
+
+        self.assertEqual(len(ado_conn.executed), 5)
+        self.assertEqual(cur.rowcount, 5)
+
+
+class BulkInsertTest(FakeDispatchTestCase):
+    def test_sql(self):
+        sql = dbapi.bulk_insert_sql('[t]', ['[a]', '[b]', '[c]'], ['int', 'nvarchar(10)', 'varbinary(max)'])
+        self.assertEqual(sql,
+            "INSERT INTO [t] ([a], [b], [c]) SELECT "
+            "[r].value('@c0', 'int'), [r].value('@c1', 'nvarchar(10)'), "
+            "[r].value('xs:base64Binary(@c2)', 'varbinary(max)') "
+            "FROM (SELECT CAST(%s AS xml)) AS [d]([x]) "
+            "CROSS APPLY [d].[x].nodes('/r') AS [n]([r])")
+
+    def test_document(self):
+        doc = dbapi.bulk_insert_document([
+            (1, 'a "b" <c> & d\n', None),
+            (True, decimal.Decimal('1E+2'), memoryview(b'\x00\xff')),
+        ])
+        self.assertEqual(doc,
+            '<r c0="1" c1="a &quot;b&quot; &lt;c&gt; &amp; d&#10;"/>'
+            '<r c0="1" c1="100" c2="AP8="/>')
+
+    def test_document_fractional_seconds(self):
+        value = datetime.datetime(2015, 1, 2, 3, 4, 5, 123456)
+        doc = dbapi.bulk_insert_document(
+            [(value, value, value, value.time(), value)],
+            ['datetime', 'smalldatetime', 'datetime2(2)', 'time', 'nvarchar(50)'])
+        self.assertEqual(doc,
+            '<r c0="2015-01-02T03:04:05.123" c1="2015-01-02T03:04:05" c2="2015-01-02T03:04:05.12"'
+            ' c3="03:04:05.123456" c4="2015-01-02T03:04:05.123456"/>')
+
+    def test_invalid_xml_characters_are_inserted_with_parameters(self):
+        ado_conn = FakeConnection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        rows = [(1, 'a'), (2, 'b\x01')]
+        count = dbapi.bulk_insert(cur, '[t]', ['[a]', '[b]'], ['int', 'nvarchar(10)'], rows)
+
+        self.assertEqual(count, 2)
+        self.assertFalse(dbapi.can_write_xml(['b\x01']))
+        self.assertEqual(ado_conn.executed, [
+            ('INSERT INTO [t] ([a], [b]) VALUES (?, ?), (?, ?)', [1, 'a', 2, 'b\x01']),
+        ])
+
+    def test_batches(self):
+        ado_conn = FakeConnection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        rows = ((i, 'name %d' % i) for i in range(2500))
+        count = dbapi.bulk_insert(cur, '[t]', ['[a]', '[b]'], ['int', 'nvarchar(10)'], rows, batch_size=1000)
+
+        self.assertEqual(count, 2500)
+        self.assertEqual(len(ado_conn.executed), 3)
+        sql, params = ado_conn.executed[2]
+        self.assertTrue(sql.startswith('INSERT INTO [t] ([a], [b]) SELECT '))
+        self.assertIn('CAST(? AS xml)', sql)
+        self.assertEqual(len(params), 1)
+        self.assertEqual(params[0].count('<r '), 500)
+
+
+class ParameterBindingTest(unittest.TestCase):
+    def bind(self, value, typed=False):
+        p = FakeParameter('p0', dbapi._ado_type(value, typed))
+        dbapi._configure_parameter(p, value, typed)
+        return p
+
+    def test_string_binding(self):
+        p = self.bind(decimal.Decimal('-12.340'))
+        self.assertEqual((p.Type, p.Value), (adBSTR, '-12.340'))
+        p = self.bind(datetime.datetime(2015, 1, 2, 3, 4, 5, 6))
+        self.assertEqual((p.Type, p.Value), (adBSTR, '20150102 03:04:05.000006'))
+
+    def test_typed_decimal(self):
+        for value, precision, scale in [
+                ('-12.340', 5, 3),
+                ('0.001', 3, 3),
+                ('0.123456', 6, 6),
+                ('12345678901234567.89', 19, 2),
+                ('1E+3', 4, 0),
+                ('12', 2, 0)]:
+            p = self.bind(decimal.Decimal(value), typed=True)
+            self.assertEqual((p.Type, p.Precision, p.NumericScale), (adNumeric, precision, scale))
+            # Assigned as text, not as a currency value
+            self.assertEqual(p.Value, dbapi.format_decimal_as_string(decimal.Decimal(value)))
+
+    def test_typed_decimal_out_of_range(self):
+        value = '0.' + '1' * 39
+        p = self.bind(decimal.Decimal(value), typed=True)
+        self.assertEqual((p.Type, p.Value), (adBSTR, value))
+
+    def test_typed_datetime(self):
+        value = datetime.datetime(2015, 1, 2, 3, 4, 5)
+        p = self.bind(value, typed=True)
+        self.assertEqual((p.Type, p.Value), (adDBTimeStamp, value))
+        # A COM date would drop the microseconds
+        p = self.bind(value.replace(microsecond=6), typed=True)
+        self.assertEqual((p.Type, p.Value), (adBSTR, '20150102 03:04:05.000006'))
+        # Dates are still bound as strings
+        p = self.bind(value.date(), typed=True)
+        self.assertEqual((p.Type, p.Value), (adBSTR, '2015-01-02'))
+
+    def test_subclass_uses_base_binder(self):
+        p = self.bind(SafeText('abc'))
+        self.assertEqual((p.Value, p.Size), ('abc', 3))
+
+
+class PlanCacheReportTest(FakeDispatchTestCase):
+    """
+    Counts the distinct statements the server would compile for a workload
+    whose parameter values vary. SQL Server caches a plan per SQL text and
+    parameter declaration, so fewer statements mean fewer cached plans.
+    """
+    workload = [
+        ('INSERT INTO [t] ([a], [b], [c]) VALUES (%s, %s, %s)', params)
+        for params in [
+            (1, 'x', None),
+            (2, None, 'abc'),
+            (None, '', 'abcdef'),
+            (4, 'a longer value', ''),
+        ]
+    ] + [
+        ('SELECT [a] FROM [t] WHERE [b] = %s AND [c] LIKE %s ESCAPE \'\\\' AND [d] %% 2 = 0', params)
+        for params in [('x', 'a%'), ('xyz', 'ab%'), ('', '%')]
+    ]
+
+    def statements(self, **kwargs):
+        seen = set()
+
+        def handler(cmd):
+            declarations = tuple((p.Type, p.Size) for p in cmd.Parameters)
+            seen.add((cmd.CommandText, declarations))
+            return (None, 1)
+
+        cur = dbapi.Connection(FakeConnection(handler=handler), **kwargs).cursor()
+        for sql, params in self.workload:
+            cur.execute(sql, params)
+        return seen
+
+    def test_default(self):
+        statements = self.statements()
+        self.assertEqual(len(statements), 7)
+
+    def test_stable_sql_text(self):
+        statements = self.statements(stable_sql_text=True)
+        self.assertEqual(len(statements), 3)
+        insert = [sql for sql, declarations in statements if sql.startswith('INSERT')]
+        # [c] had not been bound before the first statement
+        self.assertEqual(sorted(insert), [
+            'INSERT INTO [t] ([a], [b], [c]) VALUES (?, ?, ?)',
+            'INSERT INTO [t] ([a], [b], [c]) VALUES (?, ?, NULL)',
+        ])
+
+    def test_stable_sql_text_null_without_type(self):
+        executed = []
+
+        def handler(cmd):
+            executed.append((cmd.CommandText, [(p.Type, p.Value) for p in cmd.Parameters]))
+            return (None, 1)
+
+        cur = dbapi.Connection(FakeConnection(handler=handler), stable_sql_text=True).cursor()
+        sql = 'UPDATE [t] SET [data] = %s WHERE [id] = %s'
+        cur.execute(sql, [None, 1])
+        cur.execute(sql, [dbapi.Binary(b'abc'), 1])
+        cur.execute(sql, [None, 2])
+        self.assertEqual(executed[0], ('UPDATE [t] SET [data] = NULL WHERE [id] = ?', [(adBigInt, 1)]))
+        self.assertEqual(executed[2], ('UPDATE [t] SET [data] = ? WHERE [id] = ?',
+                                       [(adBinary, None), (adBigInt, 2)]))
+
+    def test_rewritten_operations_are_memoized(self):
+        dbapi._rewritten_operations.clear()
+        self.statements(stable_sql_text=True)
+        self.assertEqual(len(dbapi._rewritten_operations), 3)
+        self.assertIn(
+            "SELECT [a] FROM [t] WHERE [b] = ? AND [c] LIKE ? ESCAPE '\\' AND [d] % 2 = 0",
+            dbapi._rewritten_operations.values())
+
+
+class ExecuteParallelTest(FakeDispatchTestCase):
+    def _handler(self, cmd):
+        if cmd.CommandText == 'fail':
+            raise Exception('error')
+        if cmd.CommandText == 'SELECT 1 / 0':
+            return FakeError('Divide by zero error encountered.', '22012')
+        if cmd.CommandText == 'INSERT':
+            return FakeError('Violation of PRIMARY KEY constraint.', '23000')
+        if cmd.CommandText == 'SELECT ? WAITFOR':
+            # Completes long after the others
+            cmd.latency = 0.05
+        if cmd.CommandText == 'UPDATE':
+            # The count at the time Execute returned
+            return (None, 0)
+        value = cmd.Parameters(0).Value
+        return (FakeRecordset([FakeField('a', adInteger)], [(value,), (value + 1,)]), -1)
+
+    def _connection(self, connection_string='MARS Connection=True', latency=0):
+        ado_conn = FakeConnection(handler=self._handler, latency=latency)
+        ado_conn.ConnectionString = connection_string
+        return dbapi.Connection(ado_conn)
+
+    def test_results_in_order(self):
+        conn = self._connection()
+        cursors = conn.execute_parallel([('SELECT %s', [i]) for i in (10, 20, 30)])
+        # All three were executing at the same time
+        self.assertEqual(conn.adoConn.max_executing, 3)
+        self.assertEqual(conn.adoConn.executing, set())
+        self.assertEqual([c.fetchall() for c in cursors], [((10,), (11,)), ((20,), (21,)), ((30,), (31,))])
+
+    def test_without_mars(self):
+        conn = self._connection('Provider=SQLNCLI11')
+        self.assertFalse(conn.uses_mars)
+        cursors = conn.execute_parallel([('SELECT %s', [i]) for i in (10, 20, 30)])
+        self.assertEqual(conn.adoConn.max_executing, 1)
+        self.assertEqual([c.fetchone() for c in cursors], [(10,), (20,), (30,)])
+
+    def test_error(self):
+        conn = self._connection()
+        with self.assertRaises(dbapi.DatabaseError):
+            conn.execute_parallel([('SELECT %s', [1]), ('fail', None), ('SELECT %s', [3])])
+        # The statements after the failure were not sent
+        self.assertEqual([sql for sql, params in conn.adoConn.executed], ['SELECT ?', 'fail'])
+        # The statement that was sent completed
+        self.assertEqual(conn.adoConn.executing, set())
+
+    def test_error_of_asynchronous_statement(self):
+        conn = self._connection()
+        # An error left over from an earlier statement
+        conn.adoConn.Errors.append(FakeError('Earlier error.'))
+        with self.assertRaises(dbapi.DatabaseError) as context:
+            conn.execute_parallel([('SELECT %s WAITFOR', [1]), ('SELECT 1 / 0', None)])
+        self.assertIn('Divide by zero', str(context.exception))
+        self.assertIn('SELECT 1 / 0', str(context.exception))
+        self.assertNotIn('Earlier error', str(context.exception))
+
+    def test_integrity_error(self):
+        conn = self._connection()
+        with self.assertRaises(dbapi.IntegrityError):
+            conn.execute_parallel([('INSERT', None)])
+
+    def test_rowcount_is_unknown(self):
+        conn = self._connection()
+        cursor, = conn.execute_parallel([('UPDATE', None)])
+        self.assertEqual(cursor.rowcount, -1)
+        cursor, = conn.execute_parallel([('SELECT %s', [1])])
+        self.assertEqual(cursor.rowcount, -1)
+
+    def test_cursors_are_closed_on_error(self):
+        conn = self._connection()
+        cursors = []
+        cursor = conn.cursor
+        def tracked_cursor():
+            cursors.append(cursor())
+            return cursors[-1]
+        conn.cursor = tracked_cursor
+        with self.assertRaises(dbapi.DatabaseError):
+            conn.execute_parallel([('SELECT %s', [1]), ('SELECT 1 / 0', None)])
+        self.assertEqual([c.connection for c in cursors], [None, None])
+
+
+class ExecuteBatchTest(FakeDispatchTestCase):
+    def _handler(self, cmd):
+        """Return the results of the batch, with a @@ROWCOUNT marker after each statement."""
+        marker = [FakeField(dbapi._batch_rowcount_column, adInteger)]
+        results = []
+        for i, statement in enumerate(cmd.CommandText.split(';\n')[1:-1]):
+            if statement == dbapi._batch_rowcount_sql:
+                continue
+            if statement.startswith('SELECT'):
+                rows = [(i, 'a'), (i, 'b')]
+                results.append(FakeRecordset([FakeField('a', adInteger), FakeField('b', adVarWChar)], rows))
+                results.append(FakeRecordset(marker, [(len(rows),)]))
+            else:
+                results.append(FakeRecordset(marker, [(3,)]))
+        recordset = None
+        for r in reversed(results):
+            r._next_recordset = recordset
+            recordset = r
+        return (recordset, -1)
+
+    def test_results(self):
+        ado_conn = FakeConnection(handler=self._handler)
+        cur = dbapi.Connection(ado_conn).cursor()
+        results = cur.execute_batch([
+            ('UPDATE [t] SET [a] = %s;', [1]),
+            ('SELECT [a], [b] FROM [t] WHERE [b] LIKE \'a%\'', None),
+            ('DELETE FROM [t] WHERE [a] = %s', [2]),
+        ])
+
+        self.assertEqual(len(ado_conn.executed), 1)
+        sql, params = ado_conn.executed[0]
+        self.assertEqual(params, [1, 2])
+        self.assertIn("LIKE 'a%'", sql)
+        self.assertEqual([r.rowcount for r in results], [3, 2, 3])
+        self.assertEqual([r.rows for r in results], [None, ((2, 'a'), (2, 'b')), None])
+        self.assertEqual([d[0] for d in results[1].description], ['a', 'b'])
+        self.assertIsNone(results[0].description)
+        self.assertEqual(cur.rowcount, -1)
+
+    def test_parameter_limit(self):
+        ado_conn = FakeConnection(handler=self._handler)
+        cur = dbapi.Connection(ado_conn).cursor()
+        statement = ('UPDATE [t] SET [a] = %s WHERE [b] IN ({0})'.format(', '.join(['%s'] * 999)), list(range(1000)))
+        results = cur.execute_batch([statement] * 5)
+
+        self.assertEqual([len(params) for sql, params in ado_conn.executed], [2000, 2000, 1000])
+        self.assertEqual([r.rowcount for r in results], [3] * 5)
+
+
+class CallprocResultSetsTest(FakeDispatchTestCase):
+    procedures = {
+        'report': [
+            ('@RETURN_VALUE', adInteger, adParamReturnValue),
+            ('@input', adInteger, adParamInput),
+            ('@output', adInteger, adParamOutput),
+        ],
+    }
+
+    def _handler(self, cmd):
+        """
+        Return a count, a result set, a count and a result set. As with
+        SQL Server, the outputs are only set after the last result set.
+        """
+        def set_outputs():
+            cmd.Parameters(0).Value = 5
+            cmd.Parameters(2).Value = cmd.Parameters(1).Value + 1
+
+        fields = [FakeField('a', adInteger)]
+        last = _LastRecordset(fields, [(3,), (4,)], set_outputs)
+        count = FakeRecordset([], [], last)
+        count.Close()
+        first = FakeRecordset(fields, [(1,), (2,)], count)
+        count = FakeRecordset([], [], first)
+        count.Close()
+        return (count, 1)
+
+    def test_result_sets_and_outputs(self):
+        ado_conn = FakeConnection(handler=self._handler, procedures=self.procedures)
+        cur = dbapi.Connection(ado_conn).cursor()
+        cur.callproc('report', [1, None])
+
+        # The closed recordsets of the counts are skipped
+        self.assertEqual(cur.fetchall(), ((1,), (2,)))
+        self.assertIsNone(cur.return_value)
+        self.assertTrue(cur.nextset())
+        self.assertEqual(cur.fetchall(), ((3,), (4,)))
+        self.assertIsNone(cur.nextset())
+        self.assertEqual(cur.return_value, 5)
+        self.assertEqual(cur.output_parameters, [1, 2])
+
+    def test_no_result_sets(self):
+        def handler(cmd):
+            cmd.Parameters(0).Value = 5
+            count = FakeRecordset([], [])
+            count.Close()
+            return (count, 1)
+        ado_conn = FakeConnection(handler=handler, procedures=self.procedures)
+        cur = dbapi.Connection(ado_conn).cursor()
+        self.assertEqual(cur.callproc('report', [1, None]), [1, None])
+        self.assertIsNone(cur.description)
+        self.assertEqual(cur.return_value, 5)
+
+
+class _LastRecordset(FakeRecordset):
+    """A recordset that calls on_close when it is left for the next recordset."""
+    def __init__(self, fields, rows, on_close):
+        super(_LastRecordset, self).__init__(fields, rows)
+        self.on_close = on_close
+
+    def NextRecordset(self):
+        self.on_close()
+        return super(_LastRecordset, self).NextRecordset()
+
+
+class ProcedureParameterCacheTest(FakeDispatchTestCase):
+    procedures = {
+        'add': [
+            ('@RETURN_VALUE', adInteger, adParamReturnValue),
+            ('@input', adNumeric, adParamInput),
+        ],
+    }
+
+    def setUp(self):
+        super(ProcedureParameterCacheTest, self).setUp()
+        self._old_cache = dbapi.procedure_parameter_cache
+        dbapi.procedure_parameter_cache = dbapi.ProcedureParameterCache()
+
+    def tearDown(self):
+        dbapi.procedure_parameter_cache = self._old_cache
+        super(ProcedureParameterCacheTest, self).tearDown()
+
+    def _connection(self, handler=None, cache=True):
+        ado_conn = FakeConnection(handler=handler, procedures=self.procedures)
+        return dbapi.Connection(ado_conn, cache_procedure_parameters=cache)
+
+    def test_refresh_once(self):
+        conn = self._connection()
+        cur = conn.cursor()
+        for i in range(3):
+            cur.callproc('add', [decimal.Decimal('1.5')])
+
+        self.assertEqual(conn.adoConn.refreshes, 1)
+        self.assertEqual(dbapi.procedure_parameter_cache.avoided, 2)
+        self.assertEqual(dbapi.procedure_parameter_cache.refreshes, 1)
+        params = list(cur.cmd.Parameters)
+        self.assertEqual([(p.Name, p.Direction) for p in params],
+            [('@RETURN_VALUE', adParamReturnValue), ('@input', adParamInput)])
+        self.assertEqual(conn.adoConn.executed[-1][1], [None, '1.5'])
+
+        # Other connections with the same connection string share the cache
+        other = self._connection()
+        other.cursor().callproc('add', [1])
+        self.assertEqual(other.adoConn.refreshes, 0)
+
+    def test_disabled(self):
+        conn = self._connection(cache=False)
+        conn.cursor().callproc('add', [1])
+        conn.cursor().callproc('add', [1])
+        self.assertEqual(conn.adoConn.refreshes, 2)
+        self.assertEqual(len(dbapi.procedure_parameter_cache), 0)
+
+    def test_clear(self):
+        conn = self._connection()
+        conn.cursor().callproc('add', [1])
+        dbapi.clear_procedure_parameter_cache(procname='other')
+        conn.cursor().callproc('add', [1])
+        self.assertEqual(conn.adoConn.refreshes, 1)
+        dbapi.clear_procedure_parameter_cache()
+        conn.cursor().callproc('add', [1])
+        self.assertEqual(conn.adoConn.refreshes, 2)
+
+    def test_error_clears_procedure(self):
+        def handler(cmd):
+            if len(conn.adoConn.executed) == 2:
+                raise Exception('Procedure or function add has too many arguments specified.')
+            return (None, -1)
+        conn = self._connection(handler)
+        conn.cursor().callproc('add', [1])
+        with self.assertRaises(dbapi.DatabaseError):
+            conn.cursor().callproc('add', [1])
+        self.assertEqual(len(dbapi.procedure_parameter_cache), 0)
+        conn.cursor().callproc('add', [1])
+        self.assertEqual(conn.adoConn.refreshes, 2)
+
+
+class PackedArrayTest(FakeDispatchTestCase):
+    def test_one_parameter(self):
+        ado_conn = FakeConnection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        cur.execute('SELECT [a] FROM [t] WHERE [b] = %s AND [a] IN (%s)',
+            ['x', dbapi.PackedArray(range(5000), 'int')])
+
+        sql, params = ado_conn.executed[0]
+        self.assertEqual(sql, "SELECT [a] FROM [t] WHERE [b] = ? AND [a] IN (SELECT [r].value('@c0', 'int') "
+            "FROM (SELECT CAST(? AS xml)) AS [d]([x]) CROSS APPLY [d].[x].nodes('/r') AS [n]([r]))")
+        self.assertEqual(len(params), 2)
+        self.assertTrue(params[1].startswith('<r c0="0"/><r c0="1"/>'))
+
+    def test_document(self):
+        packed = dbapi.PackedArray(['a"b', None, 'c\td'])
+        self.assertEqual(packed.sql_type, 'nvarchar(max)')
+        self.assertEqual(packed.document(), '<r c0="a&quot;b"/><r/><r c0="c&#9;d"/>')
+
+    def test_sql_type(self):
+        self.assertEqual(dbapi.PackedArray([None, 1]).sql_type, 'bigint')
+        self.assertEqual(dbapi.PackedArray([True]).sql_type, 'bit')
+        self.assertEqual(dbapi.PackedArray([b'ab'], 'varbinary(10)').as_sql().split(' FROM')[0],
+            "SELECT [r].value('xs:base64Binary(@c0)', 'varbinary(10)')")
+        with self.assertRaises(TypeError):
+            dbapi.PackedArray([object()])
+
+    def test_empty(self):
+        ado_conn = FakeConnection()
+        cur = dbapi.Connection(ado_conn).cursor()
+        cur.execute('SELECT [a] FROM [t] WHERE [a] IN (%s)', [dbapi.PackedArray([])])
+        self.assertEqual(ado_conn.executed[0], ('SELECT [a] FROM [t] WHERE [a] IN (SELECT NULL WHERE 1 = 0)', []))
+
+
+class CommandCacheTest(FakeDispatchTestCase):
+    def test_reuses_prepared_command(self):
+        ado_conn = FakeConnection()
+        conn = dbapi.Connection(ado_conn, command_cache_size=10)
+        cur = conn.cursor()
+        cur.execute('SELECT * FROM [t] WHERE [a] = %s', [1])
+        first_cmd = cur.cmd
+        cur.execute('SELECT * FROM [t] WHERE [a] = %s', [2])
+
+        self.assertIs(cur.cmd, first_cmd)
+        self.assertTrue(first_cmd.Prepared)
+        self.assertEqual(len(first_cmd.Parameters), 1)
+        self.assertEqual(ado_conn.executed[-1], ('SELECT * FROM [t] WHERE [a] = ?', [2]))
+        self.assertEqual((conn.command_cache.hits, conn.command_cache.misses), (1, 1))
+
+    def test_parameter_types_are_part_of_key(self):
+        conn = dbapi.Connection(FakeConnection(), command_cache_size=10)
+        cur = conn.cursor()
+        cur.execute('SELECT %s', [1])
+        cur.execute('SELECT %s', ['a'])
+
+        self.assertEqual(len(conn.command_cache), 2)
+        self.assertEqual(conn.command_cache.hits, 0)
+
+    def test_eviction(self):
+        conn = dbapi.Connection(FakeConnection(), command_cache_size=2)
+        cur = conn.cursor()
+        for sql in ('SELECT 1', 'SELECT 2', 'SELECT 1', 'SELECT 3', 'SELECT 2'):
+            cur.execute(sql)
+
+        # 'SELECT 2' was the least recently used when 'SELECT 3' was added
+        self.assertEqual(conn.command_cache.evictions, 2)
+        self.assertEqual((conn.command_cache.hits, conn.command_cache.misses), (1, 4))
+
+    def test_disabled_by_default(self):
+        conn = dbapi.Connection(FakeConnection())
+        cur = conn.cursor()
+        cur.execute('SELECT 1')
+        self.assertIsNone(conn.command_cache)
+        self.assertFalse(cur.cmd.Prepared)
+
+    def test_command_in_use_is_not_shared(self):
+        def handler(cmd):
+            value = cmd.Parameters(0).Value
+            return (FakeRecordset([FakeField('id', adInteger)], [(value,), (value + 1,)]), -1)
+
+        conn = dbapi.Connection(FakeConnection(handler=handler), command_cache_size=10)
+        sql = 'SELECT [id] FROM [t] WHERE [id] >= %s'
+        first = conn.cursor()
+        first.execute(sql, [1])
+        self.assertEqual(first.fetchone(), (1,))
+        second = conn.cursor()
+        second.execute(sql, [10])
+        self.assertIsNot(second.cmd, first.cmd)
+        self.assertEqual(first.cmd.Parameters(0).Value, 1)
+        # Interleaved fetches read the rows of their own execution
+        self.assertEqual(second.fetchone(), (10,))
+        self.assertEqual(first.fetchone(), (2,))
+        self.assertEqual(second.fetchone(), (11,))
+
+        # Closing the cursor checks the Command back in
+        cached_cmd = first.cmd
+        first.close()
+        third = conn.cursor()
+        third.execute(sql, [20])
+        self.assertIs(third.cmd, cached_cmd)
+        self.assertEqual(third.fetchall(), ((20,), (21,)))
+
+
+class ConnectionPoolTest(FakeDispatchTestCase):
+    def _connect(self):
+        def handler(cmd):
+            if cmd.CommandText == 'select @@TRANCOUNT':
+                return (FakeRecordset([FakeField('', adInteger)], [(1,)]), -1)
+            return (None, -1)
+        conn = dbapi.Connection(FakeConnection(handler=handler), True)
+        self.opened.append(conn)
+        return conn
+
+    def setUp(self):
+        super(ConnectionPoolTest, self).setUp()
+        self.opened = []
+
+    def test_reuse(self):
+        pool = PerThreadConnectionPool(self._connect)
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(conn.adoConn.transaction_calls, ['begin', 'rollback', 'begin'])
+        self.assertEqual(pool.stats(), {
+            'created': 1, 'reused': 1, 'released': 1, 'discarded': 0, 'checked_out': 1, 'idle': 0,
+        })
+
+    def test_max_idle(self):
+        pool = PerThreadConnectionPool(self._connect, max_idle=1)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        pool.release(second)
+
+        self.assertEqual(pool.stats()['idle'], 1)
+        self.assertEqual(pool.stats()['discarded'], 1)
+        self.assertIsNone(second.adoConn)
+
+    def test_unusable_connection_is_replaced(self):
+        pool = PerThreadConnectionPool(self._connect, validate=lambda conn: False)
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['created'], 2)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_idle_timeout_keeps_min_size(self):
+        pool = PerThreadConnectionPool(self._connect, min_size=1, max_idle=5, idle_timeout=0)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        pool.release(second)
+        pool._idle_connections()[0] = (first, 0)
+        pool._idle_connections()[1] = (second, 0)
+
+        # first is expired, second is kept to honor min_size
+        self.assertIs(pool.acquire(), second)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_idle_connections_are_per_thread(self):
+        pool = PerThreadConnectionPool(self._connect)
+        pool.release(pool.acquire())
+
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(acquired[0], self.opened[0])
+        self.assertEqual(pool.stats()['created'], 2)
+
+    def test_min_size_is_opened_on_first_use(self):
+        pool = PerThreadConnectionPool(self._connect, min_size=2)
+        conn = pool.acquire()
+
+        self.assertIn(conn, self.opened)
+        self.assertEqual(len(self.opened), 2)
+        self.assertEqual(pool.stats()['idle'], 1)
+        # Only the first use of a thread fills the pool
+        pool.acquire()
+        pool.acquire()
+        self.assertEqual(len(self.opened), 3)
+
+
+class ConnectionInfoCacheTest(unittest.TestCase):
+    conn_string = 'DATA SOURCE=localhost;Initial Catalog=test;UID=u;PWD=secret;PROVIDER=SQLNCLI11'
+
+    def setUp(self):
+        dbapi.clear_connection_info_cache()
+
+    def tearDown(self):
+        dbapi.clear_connection_info_cache()
+
+    def test_properties_are_read_once(self):
+        first = FakeConnection({'DBMS Version': '11.00.3000', 'Transaction DDL': 8})
+        second = FakeConnection({'DBMS Version': '12.00.2000', 'Transaction DDL': 0})
+
+        properties, version = dbapi._connection_info(first, self.conn_string)
+        self.assertEqual(version, 11)
+        self.assertTrue(dbapi._use_transactions(properties))
+        self.assertEqual(dbapi._connection_info(second, self.conn_string), (properties, 11))
+
+        # The connection string is not kept in the clear
+        self.assertNotIn(self.conn_string, dbapi._connection_info_cache)
+
+    def test_password_is_part_of_key(self):
+        first = FakeConnection({'DBMS Version': '11.00.3000'})
+        second = FakeConnection({'DBMS Version': '12.00.2000'})
+        dbapi._connection_info(first, self.conn_string)
+        properties, version = dbapi._connection_info(second, self.conn_string.replace('secret', 'other'))
+        self.assertEqual(version, 12)
+
+    def test_properties_are_copied(self):
+        conn = FakeConnection({'DBMS Version': '11.00.3000'})
+        properties, version = dbapi._connection_info(conn, self.conn_string)
+        properties['DBMS Version'] = 'changed'
+        self.assertEqual(dbapi._connection_info(conn, self.conn_string)[0], {'DBMS Version': '11.00.3000'})
+
+    def test_clear(self):
+        dbapi._connection_info(FakeConnection({'DBMS Version': '11.00.3000'}), self.conn_string)
+        dbapi.clear_connection_info_cache(self.conn_string)
+        properties, version = dbapi._connection_info(FakeConnection({'DBMS Version': '12.0'}), self.conn_string)
+        self.assertEqual(version, 12)
+
+    def test_unknown_version(self):
+        properties, version = dbapi._connection_info(FakeConnection(), self.conn_string)
+        self.assertEqual(properties, {})
+        self.assertIsNone(version)
+
+
+class RollbackTest(FakeDispatchTestCase):
+    def _handler(self, cmd):
+        if cmd.CommandText == 'select @@TRANCOUNT':
+            return (FakeRecordset([FakeField('', adInteger)], [(self.trancount,)]), -1)
+        if cmd.CommandText == 'fail':
+            raise Exception('error')
+        return (None, -1)
+
+    def setUp(self):
+        super(RollbackTest, self).setUp()
+        self.trancount = 1
+        self.ado_conn = FakeConnection(handler=self._handler)
+        self.conn = dbapi.Connection(self.ado_conn, True)
+
+    def test_rollback_issues_no_queries(self):
+        self.conn.cursor().execute('UPDATE [t] SET [a] = 1')
+        self.conn.rollback()
+        self.conn.rollback()
+
+        self.assertEqual(len(self.ado_conn.executed), 1)
+        self.assertEqual(self.ado_conn.transaction_calls, ['begin', 'rollback', 'begin', 'rollback', 'begin'])
+        self.assertEqual(self.conn.transaction_level, 1)
+
+    def test_rollback_after_error_checks_trancount(self):
+        with self.assertRaises(dbapi.DatabaseError):
+            self.conn.cursor().execute('fail')
+        # The server already rolled back the transaction
+        self.trancount = 0
+        self.conn.rollback()
+        self.conn.rollback()
+
+        self.assertEqual([sql for sql, params in self.ado_conn.executed], ['fail', 'select @@TRANCOUNT'])
+        self.assertEqual(self.ado_conn.transaction_calls, ['begin'])
+
+    def test_autocommit_rollback_is_noop(self):
+        ado_conn = FakeConnection(handler=self._handler)
+        conn = dbapi.Connection(ado_conn, False)
+        conn.rollback()
+        self.assertEqual(ado_conn.executed, [])
+        self.assertEqual(ado_conn.transaction_calls, [])
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'aio requires Python 3.5')
+class AsyncConnectionTest(FakeDispatchTestCase):
+    def setUp(self):
+        super(AsyncConnectionTest, self).setUp()
+        self.initialized = []
+        dbapi._co_initialize = lambda: self.initialized.append(threading.current_thread().name)
+        self.loop = asyncio.new_event_loop()
+        self.executor = aio.ApartmentExecutor(2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.loop.close()
+        super(AsyncConnectionTest, self).tearDown()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def connect(self, handler):
+        conn = self.run_async(aio.connect('Provider=fake', executor=self.executor))
+        conn.connection.adoConn.handler = handler
+        return conn
+
+    def test_iterate(self):
+        calls = []
+
+        def handler(cmd):
+            calls.append(threading.current_thread().name)
+            return (FakeRecordset([FakeField('a', adInteger)], [(i,) for i in range(250)]), -1)
+
+        conn = self.connect(handler)
+        cursor = conn.cursor()
+        self.assertIs(self.run_async(cursor.execute('SELECT [a] FROM [t]')), cursor)
+        self.assertEqual(self.run_async(cursor.fetchone()), (0,))
+
+        rows = []
+        iterator = cursor.__aiter__()
+        while True:
+            try:
+                rows.append(self.run_async(iterator.__anext__()))
+            except StopAsyncIteration:
+                break
+        self.assertEqual(rows, [(i,) for i in range(1, 250)])
+        self.assertEqual(cursor.cursor.rs.get_rows_calls, 4)
+
+        self.run_async(conn.close())
+        self.assertTrue(conn.closed)
+        # COM calls ran on an apartment thread, which initialized COM
+        self.assertEqual(len(set(calls)), 1)
+        self.assertTrue(calls[0].startswith('sqlserver_ado-apartment-'))
+        self.assertIn(calls[0], self.initialized)
+
+    def test_connections_are_spread_over_threads(self):
+        conns = [self.connect(None) for i in range(4)]
+        self.assertEqual(sorted(t.connections for t in self.executor._threads), [2, 2])
+        for conn in conns:
+            self.run_async(conn.close())
+        self.assertEqual([t.connections for t in self.executor._threads], [0, 0])
+
+    def test_bounded_concurrency(self):
+        lock = threading.Lock()
+        running = [0]
+        most_running = [0]
+
+        def handler(cmd):
+            with lock:
+                running[0] += 1
+                most_running[0] = max(most_running[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return (None, 1)
+
+        conns = [self.connect(handler) for i in range(4)]
+        start = time.time()
+        tasks = [self.loop.create_task(conn.cursor().execute('UPDATE [t] SET [a] = 1')) for conn in conns]
+        for task in tasks:
+            self.run_async(task)
+        self.assertEqual(most_running[0], 2)
+        self.assertGreaterEqual(time.time() - start, 0.04)
+
+    def test_errors_are_raised_in_the_caller(self):
+        def handler(cmd):
+            raise Exception('failed')
+
+        conn = self.connect(handler)
+        with self.assertRaises(dbapi.DatabaseError):
+            self.run_async(conn.cursor().execute('SELECT 1'))
@@ -1,9 +1,20 @@
 from django.db import models
 
+from sqlserver_ado.models import BulkCreateManager, RawStoredProcedureManager
+
 class AutoPkPlusOne(models.Model):
     id = models.AutoField(primary_key=True)
     a = models.IntegerField(null=True)
 
+class BinaryData(models.Model):
+    data = models.BinaryField(null=True)
+
+class BulkCreatePlusOne(models.Model):
+    id = models.AutoField(primary_key=True)
+    a = models.IntegerField(null=True)
+
+    objects = BulkCreateManager()
+
 class PkPlusOne(models.Model):
     id = models.IntegerField(primary_key=True)
     a = models.IntegerField(null=True)
@@ -11,3 +22,21 @@ class PkPlusOne(models.Model):
 class TextPkPlusOne(models.Model):
     id = models.CharField(primary_key=True, max_length=10)
     a = models.IntegerField(null=True)
+
+class ProcedureResult(models.Model):
+    a = models.IntegerField(null=True)
+
+    objects = RawStoredProcedureManager()
+
+class IntrospectionParent(models.Model):
+    name = models.CharField(max_length=20, unique=True)
+
+class IntrospectionChild(models.Model):
+    parent = models.ForeignKey(IntrospectionParent)
+    code = models.CharField(max_length=10, db_index=True)
+    notes = models.TextField(null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = [('parent', 'code')]
@@ -1,10 +1,16 @@
 from __future__ import absolute_import
 
+import datetime
+
 from django.core.exceptions import ImproperlyConfigured
-from django.db import connection
+from django.db import InterfaceError, connection, models
 from django.test import TestCase
 
-from .models import AutoPkPlusOne, PkPlusOne, TextPkPlusOne
+from sqlserver_ado import ado_consts, dbapi as Database
+from sqlserver_ado.introspection import AUTO_FIELD_MARKER
+
+from .models import (AutoPkPlusOne, BinaryData, BulkCreatePlusOne, IntrospectionChild, IntrospectionParent, PkPlusOne,
+    ProcedureResult, TextPkPlusOne)
 
 
 class ConnectionStringTestCase(TestCase):
@@ -132,3 +138,318 @@ AS UPDATE {tbl} set [a] = 100""".format(
         self.assertEqual(obj.pk, id)
         self.assertEqual(TextPkPlusOne.objects.get(pk=id).a, 100)
 
+
+class BulkInsertReturnIdsTestCase(TestCase):
+    def insert(self, model, objs, fields):
+        return model._base_manager._insert(objs, fields=fields, return_id=True)
+
+    def test_auto_pk(self):
+        objs = [AutoPkPlusOne(a=i) for i in range(2500)]
+        ids = self.insert(AutoPkPlusOne, objs, [AutoPkPlusOne._meta.get_field('a')])
+        self.assertEqual(len(ids), 2500)
+        self.assertEqual([AutoPkPlusOne.objects.get(pk=pk).a for pk in ids[:3] + ids[-3:]],
+            [0, 1, 2, 2497, 2498, 2499])
+
+    def test_auto_pk_default_values(self):
+        ids = self.insert(AutoPkPlusOne, [AutoPkPlusOne() for i in range(3)], [])
+        self.assertEqual(sorted(ids), list(AutoPkPlusOne.objects.order_by('pk').values_list('pk', flat=True)))
+
+    def test_explicit_pk(self):
+        objs = [AutoPkPlusOne(id=i, a=i) for i in (30, 10, 20)]
+        ids = self.insert(AutoPkPlusOne, objs, AutoPkPlusOne._meta.local_concrete_fields)
+        self.assertEqual(ids, [30, 10, 20])
+
+    def test_text_pk(self):
+        objs = [TextPkPlusOne(id=i, a=1) for i in ('c', 'a', 'b')]
+        ids = self.insert(TextPkPlusOne, objs, TextPkPlusOne._meta.local_concrete_fields)
+        self.assertEqual(ids, ['c', 'a', 'b'])
+
+
+class BulkCreateManagerTestCase(TestCase):
+    def test_pks_are_set(self):
+        objs = BulkCreatePlusOne.objects.bulk_create(
+            [BulkCreatePlusOne(a=i) for i in range(2500)])
+        self.assertTrue(all(obj.pk is not None for obj in objs))
+        self.assertEqual([BulkCreatePlusOne.objects.get(pk=obj.pk).a for obj in objs[:3] + objs[-3:]],
+            [0, 1, 2, 2497, 2498, 2499])
+
+    def test_single_object(self):
+        obj, = BulkCreatePlusOne.objects.bulk_create([BulkCreatePlusOne(a=7)])
+        self.assertEqual(BulkCreatePlusOne.objects.get(pk=obj.pk).a, 7)
+
+    def test_explicit_pks_are_kept(self):
+        objs = BulkCreatePlusOne.objects.bulk_create(
+            [BulkCreatePlusOne(id=i, a=i) for i in (30, 10, 20)])
+        self.assertEqual([obj.pk for obj in objs], [30, 10, 20])
+        self.assertEqual(BulkCreatePlusOne.objects.get(pk=10).a, 10)
+
+
+class StableSqlTextTestCase(TestCase):
+    def setUp(self):
+        connection.ensure_connection()
+        self.stable_sql_text = connection.connection.stable_sql_text
+        connection.connection.stable_sql_text = True
+
+    def tearDown(self):
+        connection.connection.stable_sql_text = self.stable_sql_text
+
+    def test_binary_null(self):
+        obj = BinaryData.objects.create(data=None)
+        self.assertIsNone(BinaryData.objects.get(pk=obj.pk).data)
+        obj.data = b'abc'
+        obj.save()
+        obj.data = None
+        obj.save()
+        self.assertIsNone(BinaryData.objects.get(pk=obj.pk).data)
+
+
+class XmlBulkInsertTestCase(TestCase):
+    def setUp(self):
+        self.use_xml_bulk_insert = connection.use_xml_bulk_insert
+        connection.use_xml_bulk_insert = True
+
+    def tearDown(self):
+        connection.use_xml_bulk_insert = self.use_xml_bulk_insert
+
+    def test_bulk_create(self):
+        AutoPkPlusOne.objects.bulk_create([AutoPkPlusOne(a=i) for i in range(3000)])
+        self.assertEqual(AutoPkPlusOne.objects.count(), 3000)
+        self.assertEqual(AutoPkPlusOne.objects.filter(a=2999).count(), 1)
+
+    def test_bulk_create_with_pk_and_nulls(self):
+        objs = [TextPkPlusOne(id='a&<"%d' % i, a=None if i % 2 else i) for i in range(10)]
+        TextPkPlusOne.objects.bulk_create(objs)
+        self.assertEqual(TextPkPlusOne.objects.filter(a__isnull=True).count(), 5)
+        self.assertEqual(TextPkPlusOne.objects.get(id='a&<"2').a, 2)
+
+    def test_bulk_create_with_auto_pk(self):
+        AutoPkPlusOne.objects.bulk_create([AutoPkPlusOne(id=i, a=i) for i in range(1, 11)])
+        self.assertEqual(AutoPkPlusOne.objects.get(pk=10).a, 10)
+
+    def test_bulk_create_with_invalid_xml_characters(self):
+        # Inserted with parameters, as XML cannot represent the control character
+        TextPkPlusOne.objects.bulk_create([TextPkPlusOne(id='a\x01', a=1), TextPkPlusOne(id='b', a=2)])
+        self.assertEqual(TextPkPlusOne.objects.get(id='a\x01').a, 1)
+
+    def test_bulk_create_many_with_invalid_xml_characters(self):
+        # Larger than the 1000 rows of a single INSERT ... VALUES
+        objs = [TextPkPlusOne(id='t%d' % i, a=i) for i in range(2500)]
+        objs[1500].id = 'a\x01'
+        TextPkPlusOne.objects.bulk_create(objs)
+        self.assertEqual(TextPkPlusOne.objects.count(), 2500)
+        self.assertEqual(TextPkPlusOne.objects.get(id='a\x01').a, 1500)
+
+    def test_bulk_insert_legacy_datetime(self):
+        value = datetime.datetime(2015, 1, 2, 3, 4, 5, 123456)
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE #legacy_datetime ([a] datetime)')
+            Database.bulk_insert(cursor, '#legacy_datetime', ['[a]'], ['datetime'], [(value,), (value,)])
+            cursor.execute('SELECT [a] FROM #legacy_datetime')
+            self.assertEqual(list(cursor.fetchall()), [(value.replace(microsecond=123000),)] * 2)
+
+
+class RawStoredProcedureResultSetsTestCase(TestCase):
+    def setUp(self):
+        with connection.cursor() as cur:
+            cur.execute("IF OBJECT_ID(N'[dbo].[sqlserver_ado_report]', N'P') IS NOT NULL "
+                "DROP PROCEDURE [dbo].[sqlserver_ado_report]")
+            cur.execute("""
+CREATE PROCEDURE [dbo].[sqlserver_ado_report] (@input int, @output int OUTPUT)
+AS
+BEGIN
+    UPDATE {table} SET [a] = [a] WHERE 1 = 0
+    SELECT [id], [a] FROM {table} WHERE [a] < @input ORDER BY [id]
+    SELECT COUNT(*) FROM {table}
+    SELECT [id], [a] FROM {table} WHERE [a] >= @input ORDER BY [id]
+    SET @output = @input + 1
+    RETURN 7
+END""".format(table=connection.ops.quote_name(ProcedureResult._meta.db_table)))
+        for i in range(5):
+            ProcedureResult.objects.create(a=i)
+
+    def test_result_sets(self):
+        results = ProcedureResult.objects.raw_callproc('sqlserver_ado_report', [2, None]).result_sets(
+            ProcedureResult, None, ProcedureResult)
+        sets = []
+        for rows in results:
+            self.assertIsNone(results.return_value)
+            sets.append(list(rows))
+        self.assertEqual([[o.a for o in sets[0]], sets[1], [o.a for o in sets[2]]],
+            [[0, 1], [(5,)], [2, 3, 4]])
+        self.assertEqual(results.return_value, 7)
+        self.assertEqual(results.output_parameters, [2, 3])
+
+    def test_outputs_after_iteration(self):
+        qs = ProcedureResult.objects.raw_callproc('sqlserver_ado_report', [2, None])
+        self.assertEqual([o.a for o in qs], [0, 1])
+        self.assertEqual(qs.return_value, 7)
+        self.assertEqual(qs.output_parameters, [2, 3])
+
+    def test_earlier_result_set_read_late(self):
+        results = iter(ProcedureResult.objects.raw_callproc('sqlserver_ado_report', [2, None]).result_sets(
+            ProcedureResult, None, ProcedureResult))
+        first = next(results)
+        self.assertEqual(next(first).a, 0)
+        second = next(results)
+        with self.assertRaises(InterfaceError):
+            next(first)
+        self.assertEqual(list(second), [(5,)])
+
+    def test_no_result_set(self):
+        with connection.cursor() as cur:
+            cur.execute("IF OBJECT_ID(N'[dbo].[sqlserver_ado_noop]', N'P') IS NOT NULL "
+                "DROP PROCEDURE [dbo].[sqlserver_ado_noop]")
+            cur.execute("CREATE PROCEDURE [dbo].[sqlserver_ado_noop] AS RETURN 3")
+        qs = ProcedureResult.objects.raw_callproc('sqlserver_ado_noop')
+        self.assertEqual(list(qs), [])
+        self.assertEqual(qs.return_value, 3)
+
+
+class PackedInListTestCase(TestCase):
+    def setUp(self):
+        AutoPkPlusOne.objects.bulk_create([AutoPkPlusOne(a=i) for i in range(3000)])
+        TextPkPlusOne.objects.bulk_create([TextPkPlusOne(id='t%d' % i, a=i) for i in range(10)])
+
+    def test_large_in_list(self):
+        values = list(range(2500))
+        qs = AutoPkPlusOne.objects.filter(a__in=values)
+        sql, params = qs.query.get_compiler(connection=connection).as_sql()
+        self.assertEqual(len(params), 1)
+        self.assertEqual(qs.count(), 2500)
+        self.assertEqual(AutoPkPlusOne.objects.exclude(a__in=values).count(), 500)
+
+    def test_strings(self):
+        ids = ['t%d' % i for i in range(2000)]
+        self.assertEqual(TextPkPlusOne.objects.filter(id__in=ids).count(), 10)
+        # Too long for the column, so not packed and not truncated to a match
+        self.assertEqual(TextPkPlusOne.objects.filter(id__in=['t1' + ' x' * 10] * 1001).count(), 0)
+
+    def test_bilateral_transform(self):
+        class Upper(models.Transform):
+            lookup_name = 'upper'
+            bilateral = True
+
+            def as_sql(self, compiler, connection):
+                lhs, params = compiler.compile(self.lhs)
+                return 'UPPER(%s)' % lhs, params
+
+        models.CharField.register_lookup(Upper)
+        try:
+            qs = TextPkPlusOne.objects.filter(id__upper__in=['T%d' % i for i in range(1500)])
+            sql, params = qs.query.get_compiler(connection=connection).as_sql()
+            self.assertEqual(len(params), 1500)
+            self.assertEqual(qs.count(), 10)
+        finally:
+            models.CharField._unregister_lookup(Upper)
+
+    def test_threshold(self):
+        qs = AutoPkPlusOne.objects.filter(a__in=range(connection.packed_in_list_threshold))
+        sql, params = qs.query.get_compiler(connection=connection).as_sql()
+        self.assertEqual(len(params), connection.packed_in_list_threshold)
+
+
+class IntrospectionTestCase(TestCase):
+    def test_table_description(self):
+        with self.assertNumQueries(1):
+            with connection.cursor() as cursor:
+                description = connection.introspection.get_table_description(
+                    cursor, IntrospectionChild._meta.db_table)
+        self.assertEqual([c.name for c in description], ['id', 'parent_id', 'code', 'notes', 'amount', 'count'])
+        columns = dict((c.name, c) for c in description)
+        self.assertEqual(columns['id'].type_code, AUTO_FIELD_MARKER)
+        self.assertEqual(columns['code'].internal_size, 10)
+        self.assertFalse(columns['code'].null_ok)
+        self.assertTrue(columns['notes'].null_ok)
+        self.assertEqual(connection.introspection.get_field_type(columns['notes'].type_code, columns['notes']),
+                         'TextField')
+        self.assertEqual((columns['amount'].precision, columns['amount'].scale), (10, 2))
+
+    def test_table_description_clr_and_alias_types(self):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE [introspection_types] ('
+                           '[id] int NOT NULL, [location] geography NULL, [tree] hierarchyid NULL, '
+                           '[owner] sysname NOT NULL)')
+            try:
+                description = connection.introspection.get_table_description(cursor, 'introspection_types')
+            finally:
+                cursor.execute('DROP TABLE [introspection_types]')
+        self.assertEqual([c.name for c in description], ['id', 'location', 'tree', 'owner'])
+        columns = dict((c.name, c) for c in description)
+        self.assertEqual(columns['owner'].type_code, ado_consts.adVarWChar)
+        self.assertEqual(columns['owner'].internal_size, 128)
+
+    def test_constraints(self):
+        with self.assertNumQueries(1):
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(
+                    cursor, IntrospectionChild._meta.db_table)
+        constraints = list(constraints.values())
+
+        self.assertEqual([c['columns'] for c in constraints if c['primary_key']], [['id']])
+        self.assertEqual([c['foreign_key'] for c in constraints if c['foreign_key']],
+                         [(IntrospectionParent._meta.db_table, 'id')])
+        self.assertIn(['parent_id', 'code'], [c['columns'] for c in constraints if c['unique']])
+        self.assertIn(['code'], [c['columns'] for c in constraints if c['index'] and not c['unique']])
+        self.assertEqual([c['columns'] for c in constraints if c['check']], [['count']])
+
+    def test_catalog_snapshot(self):
+        introspection = connection.introspection
+        table_name = IntrospectionChild._meta.db_table
+        with connection.cursor() as cursor:
+            description = introspection.get_table_description(cursor, table_name)
+            constraints = introspection.get_constraints(cursor, table_name)
+            relations = introspection.get_relations(cursor, table_name)
+
+        with introspection.catalog_snapshot():
+            with self.assertNumQueries(3):
+                with connection.cursor() as cursor:
+                    self.assertIn(table_name, introspection.table_names(cursor))
+            with self.assertNumQueries(0):
+                with connection.cursor() as cursor:
+                    self.assertEqual(introspection.get_table_description(cursor, table_name), description)
+                    self.assertEqual(introspection.get_constraints(cursor, table_name), constraints)
+                    self.assertEqual(introspection.get_relations(cursor, table_name), relations)
+                    self.assertEqual(introspection.get_table_description(cursor, 'no_such_table'), [])
+        self.assertIsNone(introspection._snapshot)
+
+    def test_catalog_snapshot_keys_and_indexes(self):
+        introspection = connection.introspection
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE [introspection_ref] ([id] int NOT NULL PRIMARY KEY, '
+                           '[code] int NOT NULL UNIQUE)')
+            cursor.execute('CREATE TABLE [introspection_fks] ([id] int NOT NULL PRIMARY KEY, '
+                           '[ref_id] int NULL REFERENCES [introspection_ref] ([id]), '
+                           '[ref_code] int NULL REFERENCES [introspection_ref] ([code]))')
+            cursor.execute('CREATE INDEX [introspection_fks_id] ON [introspection_fks] ([id])')
+            try:
+                key_columns = introspection.get_key_columns(cursor, 'introspection_fks')
+                indexes = introspection.get_indexes(cursor, 'introspection_fks')
+                with introspection.catalog_snapshot():
+                    self.assertEqual(introspection.get_key_columns(cursor, 'introspection_fks'), key_columns)
+                    self.assertEqual(introspection.get_indexes(cursor, 'introspection_fks'), indexes)
+            finally:
+                cursor.execute('DROP TABLE [introspection_fks]')
+                cursor.execute('DROP TABLE [introspection_ref]')
+        # Only foreign keys to a primary key are key columns
+        self.assertEqual(key_columns, [('ref_id', 'introspection_ref', 'id')])
+        self.assertEqual(indexes['id'], {'primary_key': True, 'unique': True})
+
+
+class SchemaEditorConstraintsTestCase(TestCase):
+    def test_constraints_introspected_once(self):
+        table_name = IntrospectionChild._meta.db_table
+        old_field = IntrospectionChild._meta.get_field('code')
+        new_field = models.CharField(max_length=10)
+        new_field.set_attributes_from_name('code')
+
+        with connection.schema_editor() as editor:
+            with self.assertNumQueries(1):
+                self.assertEqual(len(editor._constraint_names(IntrospectionChild, ['code'], index=True)), 1)
+                self.assertEqual(len(editor._constraint_names(IntrospectionChild, ['parent_id'], foreign_key=True)), 1)
+            # Drops the index without introspecting the table again
+            with self.assertNumQueries(1):
+                editor.alter_field(IntrospectionChild, old_field, new_field, strict=True)
+            self.assertEqual(editor._constraint_names(IntrospectionChild, ['code'], index=True), [])
+            with connection.cursor() as cursor:
+                self.assertEqual(editor._table_constraints(table_name),
+                                 connection.introspection.get_constraints(cursor, table_name))
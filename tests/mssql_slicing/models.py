@@ -1,5 +1,7 @@
 from django.db import models
 
+from sqlserver_ado.models import KeysetManager
+
 class DistinctTable(models.Model):
     s = models.CharField(max_length=10)
 
@@ -18,3 +20,12 @@ class Item(models.Model):
 
     class Meta:
         ordering = ('group__group_type', 'name')
+
+class KeysetItem(models.Model):
+    category = models.CharField(max_length=10)
+    position = models.IntegerField()
+
+    objects = KeysetManager()
+
+    class Meta:
+        ordering = ('category', '-position')
@@ -4,7 +4,7 @@ from django.core.paginator import Paginator
 from django.db.models import Q
 from django.test import TestCase
 
-from .models import DistinctTable, ItemGroup, Item
+from .models import DistinctTable, ItemGroup, Item, KeysetItem
 
 class DistinctTestCase(TestCase):
     def setUp(self):
@@ -85,3 +85,68 @@ class SlicingRegressionTests(TestCase):
         for item in qs:
             self.assertTrue(item.name.startswith('g3'))
 
+
+class TopTestCase(TestCase):
+    def test_head_slice_uses_top(self):
+        sql = str(DistinctTable.objects.order_by()[:3].query)
+        self.assertTrue(sql.startswith('SELECT TOP 3 '), sql)
+        self.assertNotIn('ORDER BY', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_distinct(self):
+        sql = str(DistinctTable.objects.values_list('s').distinct()[:2].query)
+        self.assertTrue(sql.startswith('SELECT DISTINCT TOP 2 '), sql)
+
+    def test_ordered(self):
+        sql = str(Item.objects.all()[:2].query)
+        self.assertTrue(sql.startswith('SELECT TOP 2 '), sql)
+        self.assertIn('ORDER BY', sql)
+
+    def test_offset(self):
+        sql = str(DistinctTable.objects.order_by()[1:3].query)
+        self.assertIn('ORDER BY 1 OFFSET 1 ROWS FETCH NEXT 2 ROWS ONLY', sql)
+        self.assertNotIn('TOP', sql)
+
+    def test_results(self):
+        for s in ('abc', 'def', 'ghi'):
+            DistinctTable.objects.create(s=s)
+        self.assertEqual(len(DistinctTable.objects.all()[:2]), 2)
+        self.assertEqual(DistinctTable.objects.order_by('-s').first().s, 'ghi')
+        self.assertTrue(DistinctTable.objects.filter(s='def').exists())
+        self.assertFalse(DistinctTable.objects.filter(s='xyz').exists())
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        for category in ('a', 'b', 'c'):
+            for position in range(5):
+                KeysetItem.objects.create(category=category, position=position)
+        # A duplicate of the ordering values, only told apart by the pk
+        KeysetItem.objects.create(category='b', position=2)
+
+    def test_pages_match_offset(self):
+        expected = list(KeysetItem.objects.order_by('category', '-position', 'pk'))
+        pages = []
+        page = list(KeysetItem.objects.seek(None)[:4])
+        while page:
+            pages.extend(page)
+            page = list(KeysetItem.objects.seek(page[-1])[:4])
+        self.assertEqual(pages, expected)
+
+    def test_values(self):
+        last = KeysetItem.objects.get(category='a', position=0)
+        qs = KeysetItem.objects.seek(['a', 0, last.pk])[:2]
+        self.assertEqual([(o.category, o.position) for o in qs], [('b', 4), ('b', 3)])
+
+    def test_sql(self):
+        sql = str(KeysetItem.objects.seek(['a', 0, 1])[:2].query)
+        self.assertNotIn('OFFSET', sql)
+        self.assertIn('SELECT TOP 2 ', sql)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            KeysetItem.objects.seek(['a', 0])
+        with self.assertRaises(ValueError):
+            KeysetItem.objects.seek(['a', None, 1])
+        with self.assertRaises(ValueError):
+            KeysetItem.objects.order_by('?').seek([1, 1])